@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class AiRecommendationConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ai_recommendation'
-    verbose_name = 'AI推荐'
\ No newline at end of file
+    verbose_name = 'AI推荐'
+
+    def ready(self):
+        from . import signals  # noqa: F401
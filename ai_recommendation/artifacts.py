@@ -0,0 +1,198 @@
+"""版本化的模型文件存储
+
+训练好的模型（价格模型、离线推荐用的车辆列等）按名称和版本保存为一组 .npy
+文件加一份 manifest.json：
+
+    <AI_ARTIFACT_ROOT>/<名称>/<版本>/<数组名>.npy
+    <AI_ARTIFACT_ROOT>/<名称>/<版本>/manifest.json
+    <AI_ARTIFACT_ROOT>/<名称>/CURRENT        当前版本号
+
+publish() 先把全部文件写进临时目录，整体 rename 成版本目录，再用 os.replace
+替换 CURRENT，读取方要么看到旧版本要么看到完整的新版本。各进程用
+np.load(mmap_mode='r') 打开数组，多个 gunicorn/uvicorn 工作进程共享同一份页
+缓存，而不是每个进程各自复制一份权重。
+
+Handle 在进程内缓存已打开的版本，每次 get() 只 stat 一次 CURRENT，发现版本
+变化时重新打开并整体替换引用，不用重启进程；正在使用旧版本的请求继续持有旧的
+映射。prune() 删除旧版本目录（Linux 下已映射的文件删除后仍可读取）。
+"""
+import json
+import os
+import shutil
+import threading
+import uuid
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+MANIFEST = 'manifest.json'
+CURRENT = 'CURRENT'
+KEEP_VERSIONS = 3
+
+
+class ArtifactNotFound(LookupError):
+    """没有发布过该名称的模型，或指定版本不存在"""
+
+
+def root():
+    return str(getattr(settings, 'AI_ARTIFACT_ROOT', os.path.join(settings.BASE_DIR, 'ai_models')))
+
+
+def _directory(name, base=None):
+    return os.path.join(base or root(), name)
+
+
+class Artifact:
+    """一个已发布版本：manifest 中的元数据和内存映射的数组"""
+
+    def __init__(self, name, version, manifest, arrays):
+        self.name = name
+        self.version = version
+        self.manifest = manifest
+        self.metadata = manifest.get('metadata', {})
+        self.arrays = arrays
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def __contains__(self, key):
+        return key in self.arrays
+
+
+def publish(name, arrays, metadata=None, base=None):
+    """保存一个新版本并设为当前版本，返回版本号
+
+    arrays 为 {数组名: ndarray}，不能包含 object 类型（无法内存映射）。
+    """
+    directory = _directory(name, base)
+    os.makedirs(directory, exist_ok=True)
+    # 版本号按时间排序，后缀避免同一秒内重复
+    version = f'{timezone.now():%Y%m%d%H%M%S}-{uuid.uuid4().hex[:6]}'
+    staging = os.path.join(directory, f'.{version}.tmp')
+    os.makedirs(staging)
+    try:
+        entries = {}
+        for key, value in arrays.items():
+            value = np.asarray(value)
+            if value.dtype.hasobject:
+                raise TypeError(f'{name}.{key} 是 object 数组，无法内存映射')
+            np.save(os.path.join(staging, f'{key}.npy'), value)
+            entries[key] = {'dtype': value.dtype.str, 'shape': list(value.shape)}
+        manifest = {
+            'name': name,
+            'version': version,
+            'created_at': timezone.now().isoformat(),
+            'arrays': entries,
+            'metadata': metadata or {},
+        }
+        with open(os.path.join(staging, MANIFEST), 'w', encoding='utf-8') as fh:
+            json.dump(manifest, fh, ensure_ascii=False, indent=2)
+        os.rename(staging, os.path.join(directory, version))
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _write_current(directory, version)
+    return version
+
+
+def _write_current(directory, version):
+    temporary = os.path.join(directory, f'.{CURRENT}.{uuid.uuid4().hex}')
+    with open(temporary, 'w') as fh:
+        fh.write(version)
+    os.replace(temporary, os.path.join(directory, CURRENT))
+
+
+def current_version(name, base=None):
+    try:
+        with open(os.path.join(_directory(name, base), CURRENT)) as fh:
+            return fh.read().strip()
+    except FileNotFoundError:
+        raise ArtifactNotFound(name)
+
+
+def versions(name, base=None):
+    """已发布的版本号，从旧到新"""
+    directory = _directory(name, base)
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        entry for entry in os.listdir(directory)
+        if not entry.startswith('.') and os.path.isfile(os.path.join(directory, entry, MANIFEST))
+    )
+
+
+def open_artifact(name, version=None, base=None):
+    """以只读内存映射打开指定版本（默认当前版本）"""
+    version = version or current_version(name, base)
+    path = os.path.join(_directory(name, base), version)
+    try:
+        with open(os.path.join(path, MANIFEST), encoding='utf-8') as fh:
+            manifest = json.load(fh)
+    except FileNotFoundError:
+        raise ArtifactNotFound(f'{name}/{version}')
+    arrays = {}
+    for key, entry in manifest['arrays'].items():
+        array = np.load(os.path.join(path, f'{key}.npy'), mmap_mode='r')
+        if array.dtype.str != entry['dtype'] or list(array.shape) != entry['shape']:
+            raise ValueError(f'{name}/{version} 的 {key}.npy 与 manifest 不一致')
+        arrays[key] = array
+    return Artifact(name, version, manifest, arrays)
+
+
+def activate(name, version, base=None):
+    """切换当前版本（回滚到旧版本时使用）"""
+    directory = _directory(name, base)
+    if not os.path.isfile(os.path.join(directory, version, MANIFEST)):
+        raise ArtifactNotFound(f'{name}/{version}')
+    _write_current(directory, version)
+
+
+def prune(name, keep=KEEP_VERSIONS, base=None):
+    """只保留最新的 keep 个版本和当前版本，返回删除的版本号"""
+    existing = versions(name, base)
+    try:
+        active = current_version(name, base)
+    except ArtifactNotFound:
+        active = None
+    removed = [version for version in existing[:max(len(existing) - keep, 0)] if version != active]
+    for version in removed:
+        shutil.rmtree(os.path.join(_directory(name, base), version), ignore_errors=True)
+    return removed
+
+
+class Handle:
+    """进程内的当前版本缓存；loader(Artifact) 把打开的版本转换为模型对象"""
+
+    def __init__(self, name, loader=None, base=None):
+        self.name = name
+        self.loader = loader or (lambda artifact: artifact)
+        self.base = base
+        self._lock = threading.Lock()
+        self._state = None  # (CURRENT 的 (inode, mtime), 版本号, 模型对象)
+
+    def get(self):
+        """当前版本的模型对象；还没有发布过时返回 None"""
+        path = os.path.join(_directory(self.name, self.base), CURRENT)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        # os.replace 每次换成新文件，inode 和 mtime 一起比较，同一时钟刻度内两次发布也能发现
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        state = self._state
+        if state is None or state[0] != stamp:
+            with self._lock:
+                state = self._state
+                if state is None or state[0] != stamp:
+                    version = current_version(self.name, self.base)
+                    if state is None or state[1] != version:
+                        state = (stamp, version, self.loader(open_artifact(self.name, version, self.base)))
+                    else:
+                        state = (stamp, version, state[2])
+                    self._state = state
+        return state[2]
+
+    @property
+    def version(self):
+        return self._state[1] if self._state else None
@@ -0,0 +1,17 @@
+"""build_recommendations 的工作进程入口
+
+进程池用 spawn 启动，子进程反序列化任务时会导入本模块，此时 Django 尚未初始化，
+所以这里不能在模块级导入模型，初始化完成后再导入 precomputed。
+"""
+import django
+
+
+def init(catalog_version, versions):
+    django.setup()
+    from . import precomputed
+    precomputed.init_worker(catalog_version, versions)
+
+
+def build_shard(bounds, stale_only=False):
+    from . import precomputed
+    return precomputed.build_shard(bounds, stale_only)
@@ -0,0 +1,462 @@
+"""基于物品的协同过滤
+
+用户行为（收藏、点击/评分过的推荐、以买家身份发起的车辆咨询）加权后构成稀疏的
+用户 × 车辆矩阵 X，两辆车的相似度是 X 中对应两列的余弦相似度。矩阵用两份 CSR
+数组保存（按车辆、按用户），相似度按车辆分块计算：
+
+    对一块车辆展开“车辆 -> 用户 -> 该用户的其他车辆”得到 (行, 列, 权重积)，
+    np.unique 合并同一 (行, 列) 得到点积，除以两列的范数即为余弦相似度。
+
+展开的元素数（每辆车的代价为其用户的行为数之和）按 PAIR_BUDGET 分块，临时数组
+大小有上限，100 万条行为时全量计算的峰值内存约 130 MB。每辆车保存最相似的 STORED_NEIGHBORS
+辆到 CollaborativeNeighbors；不区分是否在售，推荐时只对已审核车辆加分，多存几辆作为余量。
+
+- 全量：manage.py build_collaborative_neighbors；
+- 增量：行为变化时 ai_recommendation.signals 调用 schedule_refresh()，事务提交后
+  调用 refresh()（cars.debounce，Web 进程中由后台线程合并短时间内的变化）。某用户对车辆 c 的行为变化只改变 c 的范数以及 c 与其他车辆的点积，
+  需要重算的是 c、与 c 有共同用户的车辆，以及该用户的其他车辆（行为删除后它们与 c
+  不再有共同用户，但列表中可能还有 c）。只读取 c 的用户和该用户的行为
+  （InteractionMatrix.load_around），其他车辆的范数取 CollaborativeNeighbors 中保存的值，
+  不读取全部行为。c 的列表整体重算；其他车辆只有与 c 的相似度改变，在保存的列表上更新
+  这一项即可，只有 c 原在列表中、新相似度跌破第 k 名（可能有未保存的车辆补位）时，
+  才读取该车的用户的行为整体重算。
+
+推荐打分时（engine.score）用户对候选车辆的协同过滤分为
+sum(用户对车辆 i 的行为权重 × sim(i, 候选车辆))，按最高分归一化后折算为至多
+engine.CF_POINTS 分的加分。
+"""
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+
+from cars import debounce, versioning
+from chat.models import ChatRoom
+from users.models import FavoriteCar
+
+from .models import AIRecommendation, CollaborativeNeighbors
+
+# 行为权重
+FAVORITE_WEIGHT = 3.0
+CHAT_WEIGHT = 2.0
+CLICK_WEIGHT = 1.0
+# 用户对推荐的评分（1-5），低分不算正反馈
+RATING_WEIGHTS = {4: 1.0, 5: 2.0}
+
+STORED_NEIGHBORS = 30
+# 每块展开的 (车辆, 用户, 车辆) 元素数上限
+PAIR_BUDGET = 1_000_000
+WRITE_BATCH_SIZE = 1000
+LOAD_CHUNK_SIZE = 10000
+# 按用户、车辆读取行为时每条查询的 id 数
+FILTER_CHUNK_SIZE = 500
+# 保存的相似度保留 6 位小数，与第 k 名比较时留出误差
+SCORE_TOLERANCE = 1e-6
+
+# 增量刷新的合并等待时间（秒）
+REFRESH_DELAY = 5.0
+
+
+def _ranges(starts, counts):
+    """拼接 arange(starts[i], starts[i] + counts[i])"""
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(counts.sum())
+
+
+def load_interactions(user_ids=None, car_ids=None):
+    """读取行为，返回 (用户 id, 车辆 id, 权重) 三个数组，同一用户、车辆的权重已合并
+
+    给出 user_ids 或 car_ids 时只读取这些用户或车辆的行为，id 按 FILTER_CHUNK_SIZE 分批查询。
+    """
+    if user_ids is None and car_ids is None:
+        return _merge(*_read_interactions())
+    field, ids = ('user', user_ids) if user_ids is not None else ('car', car_ids)
+    ids = sorted({int(value) for value in ids})
+    users, cars, weights = [], [], []
+    for start in range(0, len(ids), FILTER_CHUNK_SIZE):
+        chunk = _read_interactions(**{f'{field}_ids': ids[start:start + FILTER_CHUNK_SIZE]})
+        for values, part in zip((users, cars, weights), chunk):
+            values.extend(part)
+    return _merge(users, cars, weights)
+
+
+def load_users_of(car_ids, user_ids=()):
+    """读取 car_ids 的用户以及 user_ids 的全部行为
+
+    car_ids 的用户由子查询在数据库中求出，不把用户 id 读回再逐批查询；car_ids 按
+    FILTER_CHUNK_SIZE 的三分之一分批（每条查询三个子查询）。
+    """
+    car_ids = sorted({int(value) for value in car_ids})
+    size = FILTER_CHUNK_SIZE // 3
+    users, cars, weights = [], [], []
+    seen = set()
+    for start in range(0, len(car_ids), size):
+        part = _read_interactions(users_of=car_ids[start:start + size])
+        # 同一用户会出现在多批中，只取第一次读到的行为
+        found = set(part[0]) - seen
+        for user_id, car_id, weight in zip(*part):
+            if user_id in found:
+                users.append(user_id)
+                cars.append(car_id)
+                weights.append(weight)
+        seen |= found
+    rest = sorted({int(value) for value in user_ids} - seen)
+    for start in range(0, len(rest), FILTER_CHUNK_SIZE):
+        part = _read_interactions(user_ids=rest[start:start + FILTER_CHUNK_SIZE])
+        for values, column in zip((users, cars, weights), part):
+            values.extend(column)
+    return _merge(users, cars, weights)
+
+
+def _sources():
+    """三类行为的查询集：收藏、有反馈的推荐、关联了交易的聊天室"""
+    return (
+        FavoriteCar.objects.all(),
+        AIRecommendation.objects.filter(Q(is_clicked=True) | Q(user_rating__in=list(RATING_WEIGHTS))),
+        ChatRoom.objects.filter(room_type='transaction', transaction__isnull=False),
+    )
+
+
+def _users_of(field, car_ids):
+    """field 是 car_ids 中任一车辆的用户"""
+    favorites, recommendations, chats = _sources()
+    return (
+        Q(**{f'{field}__in': favorites.filter(car_id__in=car_ids).values('user_id')})
+        | Q(**{f'{field}__in': recommendations.filter(car_id__in=car_ids).values('user_id')})
+        | Q(**{f'{field}__in': chats.filter(transaction__car_id__in=car_ids).values('transaction__buyer_id')})
+    )
+
+
+def _read_interactions(user_ids=None, car_ids=None, users_of=None):
+    favorites, recommendations, chats = _sources()
+    if users_of is not None:
+        favorites = favorites.filter(_users_of('user_id', users_of))
+        recommendations = recommendations.filter(_users_of('user_id', users_of))
+        chats = chats.filter(_users_of('transaction__buyer_id', users_of))
+    if user_ids is not None:
+        favorites = favorites.filter(user_id__in=user_ids)
+        recommendations = recommendations.filter(user_id__in=user_ids)
+        chats = chats.filter(transaction__buyer_id__in=user_ids)
+    if car_ids is not None:
+        favorites = favorites.filter(car_id__in=car_ids)
+        recommendations = recommendations.filter(car_id__in=car_ids)
+        chats = chats.filter(transaction__car_id__in=car_ids)
+
+    users, cars, weights = [], [], []
+    for user_id, car_id in favorites.values_list('user_id', 'car_id').iterator(chunk_size=LOAD_CHUNK_SIZE):
+        users.append(user_id)
+        cars.append(car_id)
+        weights.append(FAVORITE_WEIGHT)
+    rows = recommendations.values_list('user_id', 'car_id', 'is_clicked', 'user_rating')
+    for user_id, car_id, is_clicked, rating in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        users.append(user_id)
+        cars.append(car_id)
+        weights.append(CLICK_WEIGHT * is_clicked + RATING_WEIGHTS.get(rating, 0.0))
+    rows = chats.values_list('transaction__buyer_id', 'transaction__car_id').distinct()
+    for user_id, car_id in rows.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        users.append(user_id)
+        cars.append(car_id)
+        weights.append(CHAT_WEIGHT)
+    return users, cars, weights
+
+
+def _merge(users, cars, weights):
+    """合并同一用户、车辆的多条行为"""
+    if not users:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float64)
+    pairs, inverse = np.unique(np.array([users, cars], dtype=np.int64).T, axis=0, return_inverse=True)
+    return pairs[:, 0], pairs[:, 1], np.bincount(inverse.ravel(), weights=weights)
+
+
+def _norms(cars, weights):
+    """{车辆 id: 范数}，cars、weights 为 load_interactions 的结果"""
+    ids, inverse = np.unique(cars, return_inverse=True)
+    return dict(zip(ids.tolist(), np.sqrt(np.bincount(inverse.ravel(), weights=weights ** 2)).tolist()))
+
+
+class InteractionMatrix:
+    """用户 × 车辆稀疏矩阵，按车辆、按用户各一份 CSR"""
+
+    def __init__(self, users, cars, weights):
+        self.user_ids, user_positions = np.unique(users, return_inverse=True)
+        self.car_ids, car_positions = np.unique(cars, return_inverse=True)
+        self.positions = {car_id: position for position, car_id in enumerate(self.car_ids.tolist())}
+
+        order = np.lexsort((user_positions, car_positions))
+        self.item_ptr = self._pointers(car_positions, len(self.car_ids))
+        self.item_users = user_positions[order]
+        self.item_weights = weights[order]
+
+        order = np.lexsort((car_positions, user_positions))
+        self.user_ptr = self._pointers(user_positions, len(self.user_ids))
+        self.user_items = car_positions[order]
+        self.user_weights = weights[order]
+
+        self.norms = np.sqrt(np.bincount(car_positions, weights=weights ** 2, minlength=len(self.car_ids)))
+        # 每辆车展开的元素数：其所有用户的行为数之和
+        user_degrees = np.diff(self.user_ptr)
+        self.costs = np.bincount(
+            np.repeat(np.arange(len(self.car_ids)), np.diff(self.item_ptr)),
+            weights=user_degrees[self.item_users], minlength=len(self.car_ids),
+        )
+
+    @staticmethod
+    def _pointers(positions, size):
+        return np.concatenate([[0], np.cumsum(np.bincount(positions, minlength=size))])
+
+    @classmethod
+    def load(cls):
+        return cls(*load_interactions())
+
+    @classmethod
+    def load_around(cls, car_ids, user_ids=()):
+        """只加载 car_ids 的全部用户以及 user_ids 的全部行为
+
+        car_ids 的列是完整的，展开 车辆 -> 用户 -> 车辆 所需的元素都在其中；其他车辆只读到
+        部分用户，计算相似度前用 use_norms() 换成完整的范数。
+        """
+        return cls(*load_users_of(car_ids, user_ids))
+
+    def use_norms(self, complete_ids, norms):
+        """complete_ids 以外的车辆改用 norms 中的范数（保存的值），缺失的按其全部行为计算"""
+        partial = ~np.isin(self.car_ids, np.asarray(list(complete_ids), dtype=np.int64))
+        ids = self.car_ids[partial].tolist()
+        missing = [car_id for car_id in ids if not norms.get(car_id)]
+        if missing:
+            _, cars, weights = load_interactions(car_ids=missing)
+            norms = {**norms, **_norms(cars, weights)}
+        self.norms[partial] = [norms[car_id] for car_id in ids]
+
+    def chunks(self, items, budget=PAIR_BUDGET):
+        """把车辆行号切块，每块展开的元素数不超过 budget（单辆超出的自成一块）"""
+        items = np.asarray(items, dtype=np.int64)
+        start, total = 0, 0.0
+        for index, cost in enumerate(self.costs[items].tolist()):
+            if index > start and total + cost > budget:
+                yield items[start:index]
+                start, total = index, 0.0
+            total += cost
+        if start < len(items):
+            yield items[start:]
+
+    def _expand(self, items):
+        """展开 车辆 -> 用户 -> 车辆，返回 (块内行号, 车辆行号, 权重积)"""
+        starts = self.item_ptr[items]
+        counts = self.item_ptr[items + 1] - starts
+        entries = _ranges(starts, counts)
+        rows = np.repeat(np.arange(len(items)), counts)
+        users = self.item_users[entries]
+        weights = self.item_weights[entries]
+
+        starts = self.user_ptr[users]
+        counts = self.user_ptr[users + 1] - starts
+        entries = _ranges(starts, counts)
+        return np.repeat(rows, counts), self.user_items[entries], np.repeat(weights, counts) * self.user_weights[entries]
+
+    def similarities(self, items):
+        """逐块产生 (块, 块内行号, 车辆行号, 相似度)：块内每辆车与其他车辆的全部非零相似度"""
+        size = len(self.car_ids)
+        for chunk in self.chunks(items):
+            rows, columns, products = self._expand(chunk)
+            keys, inverse = np.unique(rows * size + columns, return_inverse=True)
+            dots = np.bincount(inverse.ravel(), weights=products)
+            rows, columns = keys // size, keys % size
+            keep = columns != chunk[rows]
+            rows, columns, dots = rows[keep], columns[keep], dots[keep]
+            yield chunk, rows, columns, dots / (self.norms[chunk[rows]] * self.norms[columns])
+
+    def top(self, chunk, rows, columns, sims, k=STORED_NEIGHBORS):
+        """similarities() 的一块 -> 每辆车的 (车辆 id, 相似车辆 id 列表, 相似度列表)"""
+        # 每行按（保存精度的）相似度降序，同分按车辆 id 升序，取前 k 个
+        sims = np.round(sims, 6)
+        order = np.lexsort((columns, -sims, rows))
+        rows, columns, sims = rows[order], columns[order], sims[order]
+        bounds = np.searchsorted(rows, np.arange(len(chunk) + 1))
+        for index, item in enumerate(chunk.tolist()):
+            start = bounds[index]
+            end = min(bounds[index + 1], start + k)
+            yield (
+                int(self.car_ids[item]),
+                self.car_ids[columns[start:end]].tolist(),
+                sims[start:end].tolist(),
+            )
+
+    def neighbors(self, items, k=STORED_NEIGHBORS):
+        """对 items 中每辆车返回 (车辆 id, 相似车辆 id 列表, 相似度列表)，相似度降序"""
+        for chunk, rows, columns, sims in self.similarities(items):
+            yield from self.top(chunk, rows, columns, sims, k)
+
+    def norm_map(self):
+        return dict(zip(self.car_ids.tolist(), self.norms.tolist()))
+
+
+def _save(rows, norms):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        CollaborativeNeighbors.objects.bulk_create(
+            [CollaborativeNeighbors(car_id=car_id, car_ids=ids, scores=scores, norm=norms[car_id])
+             for car_id, ids, scores in rows[start:start + WRITE_BATCH_SIZE]],
+            update_conflicts=True,
+            unique_fields=['car'],
+            update_fields=['car_ids', 'scores', 'norm', 'updated_at'],
+        )
+
+
+def _stored(car_ids):
+    """{车辆 id: (相似车辆 id 列表, 相似度列表, 范数)}"""
+    car_ids = list(car_ids)
+    stored = {}
+    for start in range(0, len(car_ids), FILTER_CHUNK_SIZE):
+        rows = CollaborativeNeighbors.objects.filter(car_id__in=car_ids[start:start + FILTER_CHUNK_SIZE])
+        for car_id, ids, scores, norm in rows.values_list('car_id', 'car_ids', 'scores', 'norm'):
+            stored[car_id] = (ids, scores, norm)
+    return stored
+
+
+def _patch(ids, scores, changes, k=STORED_NEIGHBORS):
+    """在保存的列表上更新与变化车辆的相似度（changes 为 {车辆 id: 新相似度}，0 表示不再相似）
+
+    列表未满时保存了全部相似度为正的车辆；列表已满时未保存的车辆都不高于第 k 名，
+    新相似度高于第 k 名的可以直接放入，原在列表中而新相似度不高于第 k 名的可能被
+    未保存的车辆补位，返回 None 表示需要整体重算。
+    """
+    full = len(ids) >= k
+    floor = scores[-1] if full else 0.0
+    entries = dict(zip(ids, scores))
+    for car_id, sim in changes.items():
+        if not full:
+            if sim > 0:
+                entries[car_id] = round(sim, 6)
+            else:
+                entries.pop(car_id, None)
+        elif sim > floor + SCORE_TOLERANCE:
+            entries[car_id] = round(sim, 6)
+        elif car_id in entries or sim >= floor - SCORE_TOLERANCE:
+            return None
+    top = sorted(entries.items(), key=lambda item: (-item[1], item[0]))[:k]
+    return [car_id for car_id, _ in top], [sim for _, sim in top]
+
+
+def rebuild(progress=None):
+    """全量重建，删除已没有行为的车辆的列表，返回计算的车辆数"""
+    matrix = InteractionMatrix.load()
+    total = len(matrix.car_ids)
+    norms = matrix.norm_map()
+    batch, done = [], 0
+    for row in matrix.neighbors(np.arange(total)):
+        batch.append(row)
+        if len(batch) >= WRITE_BATCH_SIZE:
+            _save(batch, norms)
+            done += len(batch)
+            batch = []
+            if progress:
+                progress(done, total)
+    _save(batch, norms)
+    CollaborativeNeighbors.objects.exclude(car_id__in=matrix.car_ids.tolist()).delete()
+    versioning.bump_version(versioning.COLLABORATIVE)
+    return total
+
+
+def refresh(user_ids, car_ids):
+    """增量刷新：user_ids、car_ids 为行为发生变化的用户和车辆，返回更新的列表数"""
+    car_ids = sorted(set(car_ids))
+    # 矩阵中的车辆即受影响的车辆：与变化车辆有共同用户的车辆和变化用户的其他车辆
+    matrix = InteractionMatrix.load_around(car_ids, sorted(set(user_ids)))
+    stored = _stored(matrix.car_ids.tolist())
+    matrix.use_norms(car_ids, {car_id: norm for car_id, (_, _, norm) in stored.items()})
+    norms = matrix.norm_map()
+    changed = np.flatnonzero(np.isin(matrix.car_ids, car_ids))
+    left = sorted(set(car_ids) - set(matrix.car_ids[changed].tolist()))
+
+    # 变化车辆整体重算，同时记下其他车辆与它们的新相似度
+    rows, changes = {}, {}
+    for chunk, pair_rows, columns, sims in matrix.similarities(changed):
+        for car_id, ids, scores in matrix.top(chunk, pair_rows, columns, sims):
+            rows[car_id] = (ids, scores)
+        sources = matrix.car_ids[chunk[pair_rows]].tolist()
+        for source, target, sim in zip(sources, matrix.car_ids[columns].tolist(), sims.tolist()):
+            changes.setdefault(target, {})[source] = sim
+    for car_id in changed.tolist():
+        rows.setdefault(int(matrix.car_ids[car_id]), ([], []))
+
+    recompute = []
+    for car_id in matrix.car_ids.tolist():
+        if car_id in rows:
+            continue
+        if car_id not in stored:
+            recompute.append(car_id)
+            continue
+        ids, scores, _ = stored[car_id]
+        patched = _patch(ids, scores, {other: changes.get(car_id, {}).get(other, 0.0) for other in car_ids})
+        if patched is None:
+            recompute.append(car_id)
+        elif patched != (ids, scores):
+            rows[car_id] = patched
+    if recompute:
+        around = InteractionMatrix.load_around(recompute)
+        around.use_norms(recompute, norms)
+        positions = np.searchsorted(around.car_ids, recompute)
+        for car_id, ids, scores in around.neighbors(positions):
+            rows[car_id] = (ids, scores)
+
+    with transaction.atomic():
+        _save([(car_id, ids, scores) for car_id, (ids, scores) in rows.items()], norms)
+        CollaborativeNeighbors.objects.filter(car_id__in=left).delete()
+    for car_id in list(rows) + left:
+        versioning.bump_object_version(versioning.COLLABORATIVE, car_id)
+    return len(rows)
+
+
+class Profile:
+    """用户的协同过滤分：items 为有行为的车辆，ids/scores 为候选车辆（ids 升序）及归一化分数"""
+
+    def __init__(self, items, ids, scores):
+        self.items = items
+        self.ids = ids
+        self.scores = scores
+
+
+def version_keys(items):
+    """用户协同过滤分依赖的版本号键：全量重建版本号和其行为车辆的列表版本号"""
+    return [
+        versioning.version_key(versioning.COLLABORATIVE),
+        *(versioning.object_version_key(versioning.COLLABORATIVE, car_id) for car_id in items),
+    ]
+
+
+def profiles(user_ids):
+    """批量计算用户的协同过滤分，返回 ({用户 id: Profile}, 版本号)
+
+    版本号在读取相似列表之前读取，之后列表的变化会使基于这次结果的缓存失效。没有行为的用户不在返回结果中。
+    """
+    users, cars, weights = load_interactions(user_ids)
+    if not len(users):
+        return {}, {}
+    items = sorted(set(cars.tolist()))
+    versions = versioning.read_versions(version_keys(items))
+    neighbors = {
+        car_id: (ids, scores) for car_id, ids, scores in
+        CollaborativeNeighbors.objects.filter(car_id__in=items).values_list('car_id', 'car_ids', 'scores')
+    }
+
+    result = {}
+    bounds = np.flatnonzero(np.diff(users)) + 1
+    for start, end in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(users)]])):
+        user_id = int(users[start])
+        ids, values = [], []
+        for car_id, weight in zip(cars[start:end].tolist(), weights[start:end].tolist()):
+            neighbor_ids, neighbor_scores = neighbors.get(car_id, ((), ()))
+            ids.extend(neighbor_ids)
+            values.extend(weight * score for score in neighbor_scores)
+        ids, inverse = np.unique(np.array(ids, dtype=np.int64), return_inverse=True)
+        values = np.bincount(inverse.ravel(), weights=values) if len(ids) else np.empty(0)
+        if len(values) and values.max() > 0:
+            values = values / values.max()
+        result[user_id] = Profile(cars[start:end].tolist(), ids, values)
+    return result, versions
+
+
+_refresher = debounce.Debounced(refresh, REFRESH_DELAY, '刷新协同过滤相似车辆', groups=2)
+
+
+def schedule_refresh(user_id, car_id):
+    """事务提交后记录发生变化的行为，Web 进程中 REFRESH_DELAY 秒内的变化合并为一次刷新"""
+    _refresher.schedule([user_id], [car_id])
@@ -0,0 +1,153 @@
+"""推荐打分引擎
+
+get_recommendations 原先逐辆遍历已审核车辆，每辆车执行两次 exists() 查询并
+延迟加载品牌、车型，一次请求上千条查询。这里直接使用进程内列式索引
+（cars.catalog_index）中已审核车辆的品牌、车型、年份、里程、价格数组，
+按原有规则向量化计算得分，再用 argpartition 取前 k 辆，整个过程不访问数据库。
+
+打分规则与原实现一致：
+
+    品牌在偏好中            +30  符合您的品牌偏好
+    车型在偏好中            +25  符合您的车型偏好
+    min_year <= 年份 <= 2024 +20  年份符合要求
+    里程(万公里) <= 最大里程  +15  里程数在可接受范围内
+    价格(万元) 在预算内      +10  价格在预算范围内
+
+用户有收藏、点击、咨询等行为时，再加上协同过滤分（ai_recommendation.collaborative）
+折算的至多 CF_POINTS 分，命中时推荐理由为“与您关注过的车辆相似”。没有设置偏好
+品牌（车型）的用户，以浏览、收藏最多的几个品牌（车型）作为偏好
+（ai_recommendation.events 的行为汇总，见 Preference.use_history）。
+
+得分低于 MIN_SCORE 的车辆不推荐（原实现中 0 分车辆记 10 分基础分，同样低于
+MIN_SCORE，不会出现在结果中）。同分时按发布时间倒序，与原查询集的默认排序一致。
+"""
+import numpy as np
+
+from cars.catalog_index import catalog_index
+
+TOP_K = 6
+MIN_SCORE = 20
+MAX_YEAR = 2024
+
+# (规则名, 分值, 推荐理由)，顺序即推荐理由的拼接顺序
+RULES = (
+    ('brand', 30, '符合您的品牌偏好'),
+    ('type', 25, '符合您的车型偏好'),
+    ('year', 20, '年份符合要求'),
+    ('mileage', 15, '里程数在可接受范围内'),
+    ('budget', 10, '价格在预算范围内'),
+)
+
+# 协同过滤加分上限及推荐理由（位掩码中位于 RULES 之后）
+CF_POINTS = 20
+CF_REASON = '与您关注过的车辆相似'
+
+FIELDS = ('id', 'brand_id', 'car_type_id', 'year', 'mileage', 'current_price', 'created_at')
+
+
+def parse_budget(budget_range):
+    """'10-20' -> (10.0, 20.0)，'50+' -> (50.0, inf)，单位万元"""
+    if budget_range.endswith('+'):
+        return float(budget_range[:-1]), float('inf')
+    low, high = budget_range.split('-')
+    return float(low), float(high)
+
+
+class Preference:
+    """打分所需的用户偏好（偏好品牌、车型各一次查询）"""
+
+    def __init__(self, brand_ids, type_ids, min_year, max_mileage, budget_range, cf=None):
+        self.brand_ids = np.array(sorted(brand_ids), dtype=np.int64)
+        self.type_ids = np.array(sorted(type_ids), dtype=np.int64)
+        self.min_year = min_year
+        self.max_mileage = float(max_mileage)
+        self.budget_range = budget_range
+        self.budget = parse_budget(budget_range)
+        # collaborative.Profile，没有行为的用户为 None
+        self.cf = cf
+
+    @classmethod
+    def from_user_preference(cls, user_preference):
+        return cls(
+            user_preference.preferred_brands.values_list('id', flat=True),
+            user_preference.preferred_types.values_list('id', flat=True),
+            user_preference.min_year,
+            user_preference.max_mileage,
+            user_preference.budget_range,
+        )
+
+    def use_history(self, history):
+        """没有偏好品牌、车型时用行为汇总中的品牌、车型代替，history 为 events.summary() 的结果"""
+        if history is None:
+            return
+        if not len(self.brand_ids):
+            self.brand_ids = np.array(sorted(history['brands']), dtype=np.int64)
+        if not len(self.type_ids):
+            self.type_ids = np.array(sorted(history['types']), dtype=np.int64)
+
+
+def score(columns, preference):
+    """返回 (得分数组, 命中规则的位掩码数组)"""
+    # 与原实现相同的浮点换算：公里 -> 万公里，元 -> 万元
+    mileage_wan = columns['mileage'] / 10000
+    price_wan = columns['current_price'] / 10000
+    low, high = preference.budget
+    matches = {
+        'brand': np.isin(columns['brand_id'], preference.brand_ids),
+        'type': np.isin(columns['car_type_id'], preference.type_ids),
+        'year': (columns['year'] >= preference.min_year) & (columns['year'] <= MAX_YEAR),
+        'mileage': mileage_wan <= preference.max_mileage,
+        'budget': (low <= price_wan) & (price_wan <= high),
+    }
+    scores = np.zeros(len(columns), dtype=np.int32)
+    flags = np.zeros(len(columns), dtype=np.uint8)
+    for bit, (name, points, _) in enumerate(RULES):
+        scores += matches[name] * np.int32(points)
+        flags |= matches[name].astype(np.uint8) << bit
+    if preference.cf is not None and len(preference.cf.ids):
+        bonus = cf_bonus(columns['id'], preference.cf)
+        scores += bonus
+        flags |= (bonus > 0).astype(np.uint8) << len(RULES)
+    return scores, flags
+
+
+def cf_bonus(car_ids, profile):
+    """协同过滤加分：profile.ids 升序，不在其中的车辆为 0"""
+    positions = np.minimum(np.searchsorted(profile.ids, car_ids), len(profile.ids) - 1)
+    found = profile.ids[positions] == car_ids
+    return np.where(found, np.rint(profile.scores[positions] * CF_POINTS), 0).astype(np.int32)
+
+
+def reasons(flags):
+    found = [reason for bit, (_, _, reason) in enumerate(RULES) if flags >> bit & 1]
+    if flags >> len(RULES) & 1:
+        found.append(CF_REASON)
+    return found
+
+
+def top_k(columns, scores, k=TOP_K):
+    """得分不低于 MIN_SCORE 的前 k 行的行号：得分降序，同分按 (发布时间, id) 倒序"""
+    rows = np.flatnonzero(scores >= MIN_SCORE)
+    if len(rows) > k:
+        # argpartition 找出第 k 高的得分作为门槛，只对达到门槛的行（含同分）排序
+        candidates = np.argpartition(-scores[rows], k - 1)[:k]
+        threshold = scores[rows][candidates].min()
+        rows = rows[scores[rows] >= threshold]
+    order = np.lexsort((-columns['id'][rows], -columns['created_at'][rows], -scores[rows]))
+    return rows[order][:k]
+
+
+def recommend(preference, k=TOP_K, snapshot=None):
+    """返回 [(车辆 id, 得分, 推荐理由列表), ...]，最多 k 条"""
+    snapshot = snapshot or catalog_index.snapshot()
+    return rank(snapshot.select(fields=FIELDS), preference, k)
+
+
+def rank(columns, preference, k=TOP_K):
+    """在给定的已审核车辆列上计算推荐（离线批量任务直接传入内存映射的列）"""
+    scores, flags = score(columns, preference)
+    rows = top_k(columns, scores, k)
+    return [
+        (int(columns['id'][row]), int(scores[row]), reasons(int(flags[row])))
+        for row in rows
+    ]
@@ -0,0 +1,319 @@
+"""用户行为日志
+
+搜索、浏览车辆、收藏原先设计为 UserPreference 上的 JSON 列表，每追加一条都要
+读出、改写整个字段，并发请求会互相覆盖，长度也没有上限。现在每个行为是
+UserEvent 中的一行：record() 只把记录放进进程内队列，由唯一的后台写入线程
+攒够 FLUSH_SIZE 条或距第一条超过 FLUSH_INTERVAL 秒时用 bulk_create 一次写入，
+请求线程不访问数据库，突发流量下也只有这一个写入线程。数据库写入跟不上、
+队列积压超过 MAX_PENDING 条时丢弃新记录并记日志，不阻塞请求。
+
+写入同时增量更新 UserEventSummary：品牌、车型权重（浏览 1、收藏 3，按
+HALF_LIFE 半衰期衰减，只保留前 MAX_SCORES 项）和最近 RECENT_SEARCHES 条搜索
+关键词。推荐时用 summary()（批量时 summaries()）按主键一次读取：用户没有设置
+偏好品牌、车型时，以权重最高的 PREFERENCE_SIZE 个品牌、车型代替
+（engine.Preference.use_history）。某用户的这几项变化时递增其偏好版本号，缓存的
+推荐结果随之失效；只是权重变化、排名不变时不失效。多个进程同时更新同一用户时按
+user_id 顺序加行锁，不会丢失更新。
+
+进程正常退出时队列中的记录会写入；进程被强制终止时最多丢失一个缓冲周期的行为，
+对推荐用的统计数据可以接受。调整权重或半衰期后用 rebuild_event_summaries
+命令从日志重新计算汇总。
+"""
+import atexit
+import logging
+import queue
+import threading
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from cars import versioning
+from cars.models import Car
+
+from .models import UserEvent, UserEventSummary
+
+logger = logging.getLogger(__name__)
+
+FLUSH_SIZE = 200
+FLUSH_INTERVAL = 0.5
+WRITE_BATCH_SIZE = 1000
+MAX_PENDING = 50000
+
+# 汇总参数
+WEIGHTS = {'click': 1, 'favorite': 3}
+HALF_LIFE = timedelta(days=30)
+MAX_SCORES = 20
+RECENT_SEARCHES = 10
+MAX_QUERY_LENGTH = 200
+# 没有设置偏好品牌、车型的用户，推荐时以行为汇总中权重最高的几项代替
+PREFERENCE_SIZE = 3
+
+
+_queue = queue.Queue(maxsize=MAX_PENDING)
+_writer = None
+_writer_lock = threading.Lock()
+_STOP = object()
+
+
+def record(user_id, event_type, car_id=None, query=''):
+    """记录一次行为（只放入队列）"""
+    event = UserEvent(
+        user_id=user_id, event_type=event_type, car_id=car_id,
+        query=(query or '').strip()[:MAX_QUERY_LENGTH], created_at=timezone.now(),
+    )
+    _start_writer()
+    try:
+        _queue.put_nowait(event)
+    except queue.Full:
+        logger.warning('用户行为积压超过 %s 条，丢弃一条 %s', MAX_PENDING, event_type)
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            # 守护线程，不阻止进程退出；退出时由 flush() 停止并写完剩余记录
+            _writer = threading.Thread(target=_run_writer, name='user-events-writer', daemon=True)
+            _writer.start()
+
+
+def _run_writer():
+    """逐批取出队列中的记录写入，收到 _STOP 时写完手上的一批后退出"""
+    while True:
+        event = _queue.get()
+        if event is _STOP:
+            return
+        events = [event]
+        deadline = time.monotonic() + FLUSH_INTERVAL
+        stop = False
+        while len(events) < FLUSH_SIZE:
+            try:
+                event = _queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if event is _STOP:
+                stop = True
+                break
+            events.append(event)
+        _write_logged(events)
+        if stop:
+            return
+
+
+def _drain():
+    events = []
+    while True:
+        try:
+            event = _queue.get_nowait()
+        except queue.Empty:
+            return events
+        if event is not _STOP:
+            events.append(event)
+
+
+def flush():
+    """停止写入线程并写入队列中剩余的全部记录，返回这里写入的条数（进程退出时调用）
+
+    之后再有 record() 会重新启动写入线程。
+    """
+    global _writer
+    with _writer_lock:
+        writer, _writer = _writer, None
+        if writer is not None:
+            _queue.put(_STOP)
+            writer.join()
+        return _write_logged(_drain())
+
+
+def _write_logged(events):
+    if not events:
+        return 0
+    try:
+        write(events)
+    except Exception:
+        logger.exception('写入用户行为失败，丢弃 %s 条', len(events))
+        return 0
+    finally:
+        close_old_connections()
+    return len(events)
+
+
+atexit.register(flush)
+
+
+def write(events, now=None):
+    """写入一批 UserEvent 并更新汇总"""
+    now = now or timezone.now()
+    with transaction.atomic():
+        UserEvent.objects.bulk_create(events, batch_size=WRITE_BATCH_SIZE)
+        _merge(events, now)
+
+
+def _car_segments(events):
+    """{车辆 id: (品牌 id, 车型 id)}，一次查询"""
+    car_ids = {event.car_id for event in events if event.car_id is not None and event.event_type in WEIGHTS}
+    if not car_ids:
+        return {}
+    return {
+        car_id: (brand_id, car_type_id)
+        for car_id, brand_id, car_type_id in
+        Car.objects.filter(id__in=car_ids).values_list('id', 'brand_id', 'car_type_id')
+    }
+
+
+def _decay(scores, since, now):
+    if since is None or not scores:
+        return scores
+    factor = 0.5 ** ((now - since) / HALF_LIFE)
+    return {key: value * factor for key, value in scores.items()}
+
+
+def _top(scores):
+    top = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:MAX_SCORES]
+    return {key: round(value, 4) for key, value in top}
+
+
+def _leaders(scores, k):
+    """权重最高的 k 项（int id），同分按 id 升序；同一用户的各项按同一因子衰减，排序不受衰减影响"""
+    return [int(key) for key, _ in sorted(scores.items(), key=lambda item: (-item[1], int(item[0])))[:k]]
+
+
+def _preferred(summary):
+    """汇总中可能代替偏好品牌、车型的几项（打分时不分先后），变化时推荐结果需要重算"""
+    return (
+        set(_leaders(summary.brand_scores, PREFERENCE_SIZE)),
+        set(_leaders(summary.type_scores, PREFERENCE_SIZE)),
+    )
+
+
+def _apply(summary, events, segments, now):
+    """把按时间排序的一批行为合并进汇总（原地修改）"""
+    brand_scores = _decay(summary.brand_scores, summary.decayed_at, now)
+    type_scores = _decay(summary.type_scores, summary.decayed_at, now)
+    searches = list(summary.recent_searches)
+    for event in events:
+        if event.event_type == 'search':
+            if event.query:
+                searches = [event.query] + [query for query in searches if query != event.query]
+            continue
+        segment = segments.get(event.car_id)
+        if segment is None:
+            continue
+        # 与 now 的时间差在一个缓冲周期内时衰减可以忽略；重建汇总时按各自的时间衰减
+        weight = WEIGHTS[event.event_type] * 0.5 ** ((now - event.created_at) / HALF_LIFE)
+        brand_id, car_type_id = (str(value) for value in segment)
+        brand_scores[brand_id] = brand_scores.get(brand_id, 0) + weight
+        type_scores[car_type_id] = type_scores.get(car_type_id, 0) + weight
+    summary.brand_scores = _top(brand_scores)
+    summary.type_scores = _top(type_scores)
+    summary.recent_searches = searches[:RECENT_SEARCHES]
+    summary.event_count += len(events)
+    summary.decayed_at = now
+    summary.updated_at = now
+
+
+def _merge(events, now):
+    by_user = {}
+    for event in sorted(events, key=lambda event: event.created_at):
+        by_user.setdefault(event.user_id, []).append(event)
+    # 缓冲期间被删除的用户不再建汇总
+    existing = set(get_user_model().objects.filter(id__in=list(by_user)).values_list('id', flat=True))
+    by_user = {user_id: user_events for user_id, user_events in by_user.items() if user_id in existing}
+    segments = _car_segments(events)
+    UserEventSummary.objects.bulk_create(
+        [UserEventSummary(user_id=user_id) for user_id in by_user], ignore_conflicts=True)
+    summaries = list(
+        UserEventSummary.objects.select_for_update().filter(user_id__in=list(by_user)).order_by('user_id'))
+    changed = []
+    for row in summaries:
+        before = _preferred(row)
+        _apply(row, by_user[row.user_id], segments, now)
+        if _preferred(row) != before:
+            changed.append(row.user_id)
+    UserEventSummary.objects.bulk_update(
+        summaries, ['brand_scores', 'type_scores', 'recent_searches', 'event_count', 'decayed_at', 'updated_at'],
+        batch_size=WRITE_BATCH_SIZE,
+    )
+    _invalidate_on_commit(changed)
+
+
+def _invalidate_on_commit(user_ids):
+    def invalidate():
+        for user_id in user_ids:
+            versioning.bump_object_version(versioning.USER_PREFERENCE, user_id)
+    if user_ids:
+        transaction.on_commit(invalidate)
+
+
+def summary(user_id, k=PREFERENCE_SIZE):
+    """{'brands': [品牌 id], 'types': [车型 id], 'recent_searches': [关键词]}，按权重降序"""
+    return summaries([user_id], k).get(user_id, {'brands': [], 'types': [], 'recent_searches': []})
+
+
+def summaries(user_ids, k=PREFERENCE_SIZE):
+    """一批用户的 summary()，一次查询；没有汇总的用户不在结果中"""
+    rows = UserEventSummary.objects.filter(user_id__in=list(user_ids)).values_list(
+        'user_id', 'brand_scores', 'type_scores', 'recent_searches')
+    return {
+        user_id: {
+            'brands': _leaders(brand_scores, k),
+            'types': _leaders(type_scores, k),
+            'recent_searches': recent_searches,
+        }
+        for user_id, brand_scores, type_scores, recent_searches in rows
+    }
+
+
+def rebuild(user_ids=None, batch_size=WRITE_BATCH_SIZE):
+    """从日志重新计算汇总（默认全部用户），返回处理的用户数"""
+    now = timezone.now()
+    events = UserEvent.objects.order_by('user_id', 'created_at', 'id')
+    if user_ids is not None:
+        events = events.filter(user_id__in=user_ids)
+    users = 0
+    current, pending, batch = None, [], []
+    for event in events.iterator(chunk_size=batch_size):
+        if event.user_id != current and pending:
+            batch.append(pending)
+            pending = []
+        current = event.user_id
+        pending.append(event)
+        if len(batch) >= batch_size:
+            users += _replace(batch, now)
+            batch = []
+    if pending:
+        batch.append(pending)
+    users += _replace(batch, now)
+    return users
+
+
+def _replace(groups, now):
+    """用各用户的完整日志替换其汇总"""
+    if not groups:
+        return 0
+    segments = _car_segments([event for group in groups for event in group])
+    summaries = []
+    for group in groups:
+        row = UserEventSummary(user_id=group[0].user_id)
+        _apply(row, group, segments, now)
+        summaries.append(row)
+    with transaction.atomic():
+        UserEventSummary.objects.bulk_create(
+            summaries,
+            update_conflicts=True,
+            unique_fields=['user'],
+            update_fields=['brand_scores', 'type_scores', 'recent_searches', 'event_count', 'decayed_at', 'updated_at'],
+        )
+        # 重建可能改变排名，这些用户的推荐结果全部重算
+        _invalidate_on_commit([row.user_id for row in summaries])
+    return len(groups)
+
+
+def prune(days):
+    """删除 days 天之前的行为记录（汇总不受影响），返回删除条数"""
+    return UserEvent.objects.filter(created_at__lt=timezone.now() - timedelta(days=days)).delete()[0]
@@ -0,0 +1,113 @@
+"""模型存储的多进程内存对比
+
+模拟 N 个 Web 工作进程同时加载同一份模型权重：copy 模式每个进程用 np.load
+读入自己的副本，mmap 模式通过 artifacts.open_artifact 以 mmap_mode='r' 打开。
+各进程加载并读遍全部数据后，从 /proc/self/smaps_rollup 读取 RSS 和 PSS（共享页
+按进程数平摊，更能反映实际占用），全部进程同时在线时统计。mmap 模式随后由主
+进程发布一个新版本，记录各进程通过 Handle 切换到新版本的耗时。
+
+    python manage.py benchmark_artifacts --workers 8 --size-mb 256
+"""
+import multiprocessing
+import tempfile
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from ai_recommendation import artifacts
+
+ARTIFACT_NAME = 'benchmark'
+RELOAD_TIMEOUT = 10
+
+
+def _memory():
+    """(RSS, PSS)，单位 MB；不支持 smaps_rollup 的系统上 PSS 为 None"""
+    try:
+        with open('/proc/self/smaps_rollup') as fh:
+            values = {line.split(':')[0]: int(line.split()[1]) for line in fh if line.split(':')[0] in ('Rss', 'Pss')}
+        return values['Rss'] / 1024, values['Pss'] / 1024
+    except (OSError, KeyError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, None
+
+
+def _worker(mode, base, loaded, measured, published, results):
+    """工作进程：加载、读遍数据、报告内存；mmap 模式再等待新版本并报告切换耗时"""
+    before = _memory()
+    handle = artifacts.Handle(ARTIFACT_NAME, base=base)
+    if mode == 'copy':
+        version = artifacts.current_version(ARTIFACT_NAME, base)
+        weights = np.load(f'{base}/{ARTIFACT_NAME}/{version}/weights.npy')
+    else:
+        weights = handle.get()['weights']
+    checksum = float(weights.sum(dtype=np.float64))
+    loaded.wait()
+    after = _memory()
+    measured.wait()
+
+    reload_seconds = None
+    initial = handle.version
+    published.wait()
+    if mode == 'mmap':
+        deadline = time.time() + RELOAD_TIMEOUT
+        while time.time() < deadline:
+            artifact = handle.get()
+            if handle.version != initial:
+                reload_seconds = time.time() - float(artifact.metadata['published_at'])
+                break
+            time.sleep(0.001)
+    results.put((before, after, checksum, reload_seconds))
+
+
+class Command(BaseCommand):
+    help = '对比多个工作进程各自加载模型副本与共享内存映射的内存占用'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--size-mb', type=int, default=256, help='模拟模型权重的大小')
+        parser.add_argument('--modes', default='copy,mmap')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        weights = np.random.default_rng(0).random(options['size_mb'] * 2 ** 20 // 4, dtype=np.float32)
+        with tempfile.TemporaryDirectory(prefix='artifacts-') as base:
+            artifacts.publish(ARTIFACT_NAME, {'weights': weights}, base=base)
+            self.stdout.write(f'{workers} 个工作进程，模型 {weights.nbytes / 2 ** 20:.0f} MB')
+            for mode in options['modes'].split(','):
+                self._run(mode, base, workers, weights)
+
+    def _run(self, mode, base, workers, weights):
+        context = multiprocessing.get_context('spawn')
+        loaded, measured, published = (context.Barrier(workers + 1) for _ in range(3))
+        results = context.Queue()
+        processes = [
+            context.Process(target=_worker, args=(mode, base, loaded, measured, published, results))
+            for _ in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        loaded.wait()
+        measured.wait()
+        if mode == 'mmap':
+            artifacts.publish(ARTIFACT_NAME, {'weights': weights}, metadata={'published_at': time.time()}, base=base)
+        published.wait()
+        rows = [results.get() for _ in processes]
+        for process in processes:
+            process.join()
+        artifacts.prune(ARTIFACT_NAME, keep=1, base=base)
+
+        rss = sum(after[0] - before[0] for before, after, _, _ in rows)
+        line = f'{mode:>4}: RSS 增量合计 {rss:8.0f} MB'
+        if all(after[1] is not None for _, after, _, _ in rows):
+            pss = sum(after[1] - before[1] for before, after, _, _ in rows)
+            line += f'，PSS 增量合计 {pss:8.0f} MB（每进程 {pss / workers:.0f} MB）'
+        self.stdout.write(line)
+        if len({checksum for _, _, checksum, _ in rows}) != 1:
+            self.stderr.write('各进程读到的数据不一致')
+        reloads = [seconds for _, _, _, seconds in rows if seconds is not None]
+        if mode == 'mmap':
+            if len(reloads) == workers:
+                self.stdout.write(f'      发布新版本后全部进程切换完成，从开始发布起最慢 {max(reloads) * 1000:.1f} ms')
+            else:
+                self.stderr.write(f'      {workers - len(reloads)} 个进程未在 {RELOAD_TIMEOUT}s 内切换到新版本')
@@ -0,0 +1,138 @@
+"""推荐打分引擎与原逐辆打分实现的性能对比
+
+在事务中批量生成指定数量的已审核车辆和一份用户偏好，分别用原实现（逐辆遍历、
+每辆车两次 exists() 查询）和向量化引擎计算前 6 条推荐，核对结果一致后输出单次
+请求的耗时，结束后回滚，不会留下数据：
+
+    python manage.py benchmark_recommendations --sizes 10000 100000
+
+原实现在大数据量下耗时过长，只在不超过 --legacy-limit 辆车时运行。
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from ai_recommendation import engine
+from ai_recommendation.models import UserPreference
+from cars.catalog_index import CatalogIndex
+from cars.models import Brand, Car, CarType
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _timed(func, repeat):
+    """返回多次执行耗时的中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def _legacy(user_preference):
+    """原 get_recommendations 的打分循环（预算 '50+' 按 50 万以上处理）"""
+    budget_min, budget_max = engine.parse_budget(user_preference.budget_range)
+    filtered_cars = []
+    for car in Car.objects.filter(status='approved'):
+        match_score = 0
+        reasons = []
+        if user_preference.preferred_brands.filter(id=car.brand.id).exists():
+            match_score += 30
+            reasons.append('符合您的品牌偏好')
+        if user_preference.preferred_types.filter(id=car.car_type.id).exists():
+            match_score += 25
+            reasons.append('符合您的车型偏好')
+        if car.year >= user_preference.min_year and car.year <= 2024:
+            match_score += 20
+            reasons.append('年份符合要求')
+        if float(car.mileage) / 10000 <= float(user_preference.max_mileage):
+            match_score += 15
+            reasons.append('里程数在可接受范围内')
+        if budget_min <= float(car.current_price) / 10000 <= budget_max:
+            match_score += 10
+            reasons.append('价格在预算范围内')
+        if match_score >= 20:
+            filtered_cars.append((car.id, match_score, reasons))
+    filtered_cars.sort(key=lambda item: item[1], reverse=True)
+    return filtered_cars[:engine.TOP_K]
+
+
+class Command(BaseCommand):
+    help = '对比推荐打分引擎与原实现在不同数据量下的单次请求耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000])
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--legacy-limit', type=int, default=10000,
+                            help='车辆数不超过该值时才运行原实现')
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            with transaction.atomic():
+                self._run(size, options['repeat'], options['legacy_limit'])
+                transaction.set_rollback(True)
+
+    def _populate(self, size):
+        user_model = get_user_model()
+        seller = user_model.objects.create(username='benchmark_seller', email='benchmark@example.com')
+        buyer = user_model.objects.create(username='benchmark_buyer', email='benchmark_buyer@example.com')
+        brands = [Brand.objects.create(name=f'基准品牌{i}') for i in range(30)]
+        car_types = [CarType.objects.create(name=f'基准车型{i}', category='sedan') for i in range(7)]
+        rng = random.Random(size)
+        created = 0
+        while created < size:
+            batch = []
+            for _ in range(min(INSERT_BATCH_SIZE, size - created)):
+                price = rng.randint(20000, 800000)
+                batch.append(Car(
+                    brand=rng.choice(brands), car_type=rng.choice(car_types), model='基准车',
+                    year=rng.randint(2005, 2024), mileage=Decimal(rng.randint(0, 300000)),
+                    color='白色', transmission=rng.choice(['manual', 'automatic', 'semi_auto']),
+                    fuel_type=rng.choice(['gasoline', 'diesel', 'electric', 'hybrid']),
+                    engine_capacity=Decimal('2.0'), original_price=Decimal(price * 1.3),
+                    current_price=Decimal(price), status='approved', seller=seller, description='',
+                ))
+            Car.objects.bulk_create(batch)
+            created += len(batch)
+
+        user_preference = UserPreference.objects.create(
+            user=buyer, budget_range='10-20', min_year=2018, max_mileage=Decimal('8'))
+        user_preference.preferred_brands.set(brands[:3])
+        user_preference.preferred_types.set(car_types[:2])
+        return user_preference
+
+    def _run(self, size, repeat, legacy_limit):
+        self.stdout.write(f'生成 {size} 辆车...')
+        user_preference = self._populate(size)
+
+        start = time.perf_counter()
+        index = CatalogIndex()
+        index.load()
+        snapshot = index.snapshot()
+        build_ms = (time.perf_counter() - start) * 1000
+        self.stdout.write(f'索引构建耗时 {build_ms:.0f} ms')
+
+        def vectorized():
+            preference = engine.Preference.from_user_preference(user_preference)
+            return engine.recommend(preference, snapshot=snapshot)
+
+        engine_ms = _timed(vectorized, repeat)
+        if size > legacy_limit:
+            self.stdout.write(f'  引擎 {engine_ms:8.3f} ms   （原实现已跳过）')
+            return
+
+        # 同分车辆的先后顺序原实现取决于查询集顺序，这里只核对得分和推荐理由
+        expected = [(score, reasons) for _, score, reasons in _legacy(user_preference)]
+        actual = [(score, reasons) for _, score, reasons in vectorized()]
+        if actual != expected:
+            raise CommandError(f'推荐结果与原实现不一致: {actual} != {expected}')
+        legacy_ms = _timed(lambda: _legacy(user_preference), max(1, repeat // 10))
+        self.stdout.write(
+            f'  原实现 {legacy_ms:10.3f} ms   引擎 {engine_ms:8.3f} ms   {legacy_ms / engine_ms:8.1f}x'
+        )
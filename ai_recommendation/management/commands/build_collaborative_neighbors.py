@@ -0,0 +1,28 @@
+"""全量重建协同过滤相似车辆
+
+首次部署、调整行为权重后运行；日常的收藏、点击、咨询由信号增量刷新：
+
+    python manage.py build_collaborative_neighbors
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ai_recommendation import collaborative
+from cars import versioning
+
+
+class Command(BaseCommand):
+    help = '根据收藏、点击和咨询行为重新计算协同过滤相似车辆'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total}')
+
+        total = collaborative.rebuild(progress=progress)
+        if not versioning.is_shared():
+            self.stderr.write('默认缓存是进程内缓存，其他进程中已缓存的推荐结果不会因本次重建失效；请设置 REDIS_URL')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'已为 {total} 辆车计算协同过滤相似车辆，用时 {elapsed:.1f}s'))
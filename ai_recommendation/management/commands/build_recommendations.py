@@ -0,0 +1,97 @@
+"""离线批量计算所有用户的推荐结果
+
+每晚或批量上架后运行，结果写入 AIRecommendation，接口在版本号仍然有效时直接
+读取（见 ai_recommendation.precomputed）：
+
+    python manage.py build_recommendations                     # 全部用户
+    python manage.py build_recommendations --stale-only        # 只算结果已失效的用户
+    python manage.py build_recommendations --start-id 50001    # 从中断处继续
+
+用户按 id 区间分片，进度输出中的“已完成至 user_id”之前的分片都已写入，中断后
+用 --start-id 从下一个 id 继续即可。
+
+结果是否有效由保存的版本号判断，版本号必须来自 Web 进程共用的缓存（REDIS_URL）；
+默认缓存是进程内缓存时命令直接报错退出。
+"""
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ai_recommendation import build_worker, precomputed, result_cache
+from ai_recommendation.models import UserPreference
+from cars import versioning
+from cars.models import Brand, CarType
+
+
+class Command(BaseCommand):
+    help = '用进程池为所有设置了偏好的用户预先计算推荐结果'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--shard-size', type=int, default=500, help='每个分片的用户数')
+        parser.add_argument('--start-id', type=int, default=None, help='从该 user_id 开始（含）')
+        parser.add_argument('--end-id', type=int, default=None, help='到该 user_id 结束（含）')
+        parser.add_argument('--stale-only', action='store_true', help='跳过结果仍然有效的用户')
+
+    def handle(self, *args, **options):
+        if not versioning.is_shared():
+            # 本进程读到的版本号与 Web 进程的不同，写入的结果永远不会被读取，--stale-only 也会每次全部重算
+            raise CommandError('默认缓存是进程内缓存，离线结果无法与 Web 进程共享版本号；请设置 REDIS_URL 配置共享缓存')
+        started = time.perf_counter()
+        shards = self._shards(options['start_id'], options['end_id'], options['shard_size'])
+        if not shards:
+            self.stdout.write('没有需要计算的用户')
+            return
+
+        # 先读分桶版本号再加载车辆：加载之后上架的车辆会使相关结果失效
+        versions = versioning.read_versions([
+            versioning.version_key(versioning.BRAND),
+            *result_cache.all_bucket_keys(
+                Brand.objects.values_list('id', flat=True), CarType.objects.values_list('id', flat=True)),
+        ])
+        catalog_version, cars = precomputed.publish_catalog()
+        self.stdout.write(f'{cars} 辆已审核车辆（版本 {catalog_version}），{len(shards)} 个分片')
+        if options['workers'] <= 1:
+            build_worker.init(catalog_version, versions)
+            results = (build_worker.build_shard(bounds, options['stale_only']) for bounds in shards)
+            users = self._collect(results, shards)
+        else:
+            # 子进程各自建立数据库连接
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=build_worker.init,
+                initargs=(catalog_version, versions),
+            ) as executor:
+                results = executor.map(
+                    build_worker.build_shard, shards, [options['stale_only']] * len(shards))
+                users = self._collect(results, shards)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'已为 {users} 个用户计算推荐，用时 {elapsed:.1f}s'))
+
+    def _shards(self, start_id, end_id, shard_size):
+        """按 user_id 切成每段 shard_size 个用户的闭区间"""
+        user_ids = UserPreference.objects.order_by('user_id').values_list('user_id', flat=True)
+        if start_id is not None:
+            user_ids = user_ids.filter(user_id__gte=start_id)
+        if end_id is not None:
+            user_ids = user_ids.filter(user_id__lte=end_id)
+        user_ids = list(user_ids)
+        return [
+            (user_ids[i], user_ids[min(i + shard_size, len(user_ids)) - 1])
+            for i in range(0, len(user_ids), shard_size)
+        ]
+
+    def _collect(self, results, shards):
+        """按分片顺序汇总结果并输出进度，返回计算的用户数"""
+        users = 0
+        for done, (_, last, count) in enumerate(results, 1):
+            users += count
+            self.stdout.write(f'[{done}/{len(shards)}] 已完成至 user_id {last}（本片 {count} 个用户）')
+        return users
@@ -0,0 +1,43 @@
+"""训练价格模型并批量写入全部车辆的价格预测
+
+    python manage.py predict_prices                  # 训练、保存模型并预测全部车辆
+    python manage.py predict_prices --skip-training  # 使用已保存的模型重新预测
+    python manage.py predict_prices --holdout 0.2    # 同时报告留出集误差
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from ai_recommendation import artifacts, pricing
+
+
+class Command(BaseCommand):
+    help = '训练车辆价格模型，批量写入 AI 建议价格和价格预测'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-training', action='store_true', help='不重新训练，使用已保存的模型')
+        parser.add_argument('--holdout', type=float, default=0, help='留出评估的样本比例，0 表示不评估')
+        parser.add_argument('--batch-size', type=int, default=pricing.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['skip_training']:
+                model = pricing.PriceModel.load()
+            else:
+                if options['holdout']:
+                    mean_error, median_error = pricing.evaluate(*pricing.training_data(), holdout=options['holdout'])
+                    self.stdout.write(f'留出集误差：平均 {mean_error:.1%}，中位数 {median_error:.1%}')
+                model, version = pricing.train()
+                self.stdout.write(f'已用 {int(model.training_rows)} 辆车训练模型，版本 {version}')
+        except artifacts.ArtifactNotFound:
+            raise CommandError('没有已发布的模型，请先不带 --skip-training 运行')
+        except pricing.ModelNotTrained as exc:
+            raise CommandError(str(exc))
+
+        def progress(done):
+            self.stdout.write(f'已预测 {done} 辆')
+
+        total = pricing.predict_all(model, options['batch_size'], progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'已为 {total} 辆车写入价格预测，用时 {elapsed:.1f}s'))
@@ -0,0 +1,79 @@
+"""处理积压的 AI 训练数据
+
+按 id 分块读取未处理的 AITrainingData，按数据类型生成特征写成 .npz 文件，
+并把处理过的记录标记为已处理（见 ai_recommendation.training_data）：
+
+    python manage.py process_training_data                       # 全部类型
+    python manage.py process_training_data --types user_behavior --workers 4
+
+中断后直接重新运行，已处理的块会跳过。
+"""
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from ai_recommendation import training_data, training_worker
+
+
+class Command(BaseCommand):
+    help = '分块处理未处理的 AI 训练数据，生成特征文件'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=training_data.CHUNK_SIZE, help='每块的记录数')
+        parser.add_argument('--types', default=','.join(training_data.HANDLERS), help='逗号分隔的数据类型')
+        parser.add_argument('--output', default=None, help='特征文件目录，默认在模型存储目录下')
+
+    def handle(self, *args, **options):
+        data_types = [data_type for data_type in options['types'].split(',') if data_type]
+        unknown = [data_type for data_type in data_types if data_type not in training_data.HANDLERS]
+        if unknown:
+            raise CommandError(f'没有处理函数的数据类型：{", ".join(unknown)}')
+        output = options['output'] or training_data.default_output()
+        started = time.perf_counter()
+        discarded = training_data.discard_unprocessed(output, data_types)
+        if discarded:
+            self.stdout.write(f'已从 {discarded} 个文件中去掉未标记的记录，将重新处理')
+        chunks = training_data.chunks(data_types, options['chunk_size'])
+
+        if options['workers'] <= 1:
+            training_worker.init()
+            results = (training_worker.process_chunk(bounds, data_types, output) for bounds in chunks)
+            totals = self._collect(results)
+        else:
+            # 子进程各自建立数据库连接
+            connections.close_all()
+            with ProcessPoolExecutor(
+                max_workers=options['workers'],
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=training_worker.init,
+            ) as executor:
+                totals = self._collect(self._submit(executor, chunks, data_types, output, options['workers'] * 2))
+
+        elapsed = time.perf_counter() - started
+        summary = '，'.join(f'{data_type} {count}' for data_type, count in sorted(totals.items())) or '没有未处理的记录'
+        self.stdout.write(self.style.SUCCESS(f'处理完成：{summary}，用时 {elapsed:.1f}s，输出目录 {output}'))
+
+    def _submit(self, executor, chunks, data_types, output, window):
+        """按顺序产出各块结果，进行中的块不超过 window 个，主进程内存占用不随积压量增长"""
+        pending = deque()
+        for bounds in chunks:
+            pending.append(executor.submit(training_worker.process_chunk, bounds, data_types, output))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def _collect(self, results):
+        """汇总各类型的记录数并输出进度，进度中的 id 之前的记录都已处理"""
+        totals = {}
+        for done, (_, last, counts) in enumerate(results, 1):
+            for data_type, count in counts.items():
+                totals[data_type] = totals.get(data_type, 0) + count
+            self.stdout.write(f'[{done}] 已处理至 id {last}（本块 {sum(counts.values())} 条）')
+        return totals
@@ -0,0 +1,29 @@
+"""从行为日志重新计算用户行为汇总
+
+调整权重、半衰期或保留条数后，以及从旧的 JSON 历史迁移后运行：
+
+    python manage.py rebuild_event_summaries
+    python manage.py rebuild_event_summaries --prune-days 180   # 同时删除 180 天前的日志
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from ai_recommendation import events
+
+
+class Command(BaseCommand):
+    help = '根据用户行为日志重新计算品牌、车型偏好和最近搜索'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--prune-days', type=int, default=None, help='重建后删除该天数之前的行为记录')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        users = events.rebuild()
+        self.stdout.write(f'已重新计算 {users} 个用户的行为汇总')
+        if options['prune_days']:
+            removed = events.prune(options['prune_days'])
+            self.stdout.write(f'已删除 {options["prune_days"]} 天前的 {removed} 条行为记录')
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'完成，用时 {elapsed:.1f}s'))
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:35
+
+from django.db import migrations, models
+from django.db.models import Min
+
+
+def remove_duplicates(apps, schema_editor):
+    """同一用户、同一车辆只保留最早的一条推荐记录"""
+    AIRecommendation = apps.get_model('ai_recommendation', 'AIRecommendation')
+    keep = AIRecommendation.objects.values('user', 'car').annotate(keep_id=Min('id')).values('keep_id')
+    AIRecommendation.objects.exclude(id__in=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_recommendation', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='airecommendation',
+            name='rank',
+            field=models.PositiveSmallIntegerField(blank=True, null=True, verbose_name='名次'),
+        ),
+        migrations.AddField(
+            model_name='userpreference',
+            name='recommendation_versions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='推荐结果版本'),
+        ),
+        migrations.AddField(
+            model_name='userpreference',
+            name='recommendations_built_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='推荐生成时间'),
+        ),
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='airecommendation',
+            constraint=models.UniqueConstraint(fields=('user', 'car'), name='ai_recommendation_user_car_unique'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_moderation_lease'),
+        ('ai_recommendation', '0002_precomputed_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollaborativeNeighbors',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='collaborative_neighbors', serialize=False, to='cars.car', verbose_name='车辆')),
+                ('car_ids', models.JSONField(default=list, verbose_name='相似车辆')),
+                ('scores', models.JSONField(default=list, verbose_name='相似度')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '协同过滤相似车辆',
+                'verbose_name_plural': '协同过滤相似车辆',
+            },
+        ),
+    ]
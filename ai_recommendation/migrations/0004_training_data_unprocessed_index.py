@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_recommendation', '0003_collaborative_neighbors'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='aitrainingdata',
+            index=models.Index(condition=models.Q(('is_processed', False)), fields=['id'], name='ai_training_unprocessed_idx'),
+        ),
+    ]
@@ -0,0 +1,105 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def _search_query(item):
+    if isinstance(item, dict):
+        item = item.get('query') or item.get('q') or item.get('keyword')
+    return item.strip()[:200] if isinstance(item, str) else ''
+
+
+def _car_id(item):
+    if isinstance(item, dict):
+        item = item.get('car_id') or item.get('car')
+    try:
+        return int(item)
+    except (TypeError, ValueError):
+        return None
+
+
+def copy_histories(apps, schema_editor):
+    """把偏好上的搜索、点击历史转为行为记录，时间取偏好的更新时间
+
+    收藏类别没有对应的车辆，不转换；收藏行为以后由 FavoriteCar 记录。迁移后运行
+    rebuild_event_summaries 生成汇总。
+    """
+    UserPreference = apps.get_model('ai_recommendation', 'UserPreference')
+    UserEvent = apps.get_model('ai_recommendation', 'UserEvent')
+    batch = []
+    preferences = UserPreference.objects.exclude(search_history=[], click_history=[]).values_list(
+        'user_id', 'search_history', 'click_history', 'updated_at')
+    for user_id, search_history, click_history, updated_at in preferences.iterator():
+        for item in search_history or []:
+            query = _search_query(item)
+            if query:
+                batch.append(UserEvent(user_id=user_id, event_type='search', query=query, created_at=updated_at))
+        for item in click_history or []:
+            car_id = _car_id(item)
+            if car_id is not None:
+                batch.append(UserEvent(user_id=user_id, event_type='click', car_id=car_id, created_at=updated_at))
+        if len(batch) >= 1000:
+            UserEvent.objects.bulk_create(batch)
+            batch = []
+    UserEvent.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0003_saved_searches'),
+        ('cars', '0012_moderation_lease'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('ai_recommendation', '0004_training_data_unprocessed_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserEventSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='event_summary', serialize=False, to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+                ('brand_scores', models.JSONField(default=dict, verbose_name='品牌权重')),
+                ('type_scores', models.JSONField(default=dict, verbose_name='车型权重')),
+                ('recent_searches', models.JSONField(default=list, verbose_name='最近搜索')),
+                ('event_count', models.IntegerField(default=0, verbose_name='行为数')),
+                ('decayed_at', models.DateTimeField(blank=True, null=True, verbose_name='权重计算时间')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '用户行为汇总',
+                'verbose_name_plural': '用户行为汇总',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('search', '搜索'), ('click', '浏览车辆'), ('favorite', '收藏')], max_length=20, verbose_name='行为类型')),
+                ('query', models.CharField(blank=True, max_length=200, verbose_name='搜索关键词')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='发生时间')),
+                ('car', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='cars.car', verbose_name='车辆')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='events', to=settings.AUTH_USER_MODEL, verbose_name='用户')),
+            ],
+            options={
+                'verbose_name': '用户行为',
+                'verbose_name_plural': '用户行为',
+                'indexes': [models.Index(fields=['user', 'created_at'], name='ai_user_event_user_idx'), models.Index(fields=['created_at'], name='ai_user_event_created_idx')],
+            },
+        ),
+        migrations.RunPython(copy_histories, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='userpreference',
+            name='click_history',
+        ),
+        migrations.RemoveField(
+            model_name='userpreference',
+            name='favorite_categories',
+        ),
+        migrations.RemoveField(
+            model_name='userpreference',
+            name='search_history',
+        ),
+    ]
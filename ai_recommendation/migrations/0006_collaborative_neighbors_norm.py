@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ai_recommendation', '0005_user_events'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='collaborativeneighbors',
+            name='norm',
+            field=models.FloatField(default=0, verbose_name='范数'),
+        ),
+    ]
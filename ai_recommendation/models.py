@@ -1,6 +1,7 @@
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 class UserPreference(models.Model):
     """用户偏好设置"""
@@ -26,10 +27,12 @@ class UserPreference(models.Model):
     preferred_fuel_types = models.JSONField(_('偏好燃料类型'), default=list)
     preferred_transmissions = models.JSONField(_('偏好变速箱'), default=list)
     
-    # AI学习数据
-    search_history = models.JSONField(_('搜索历史'), default=list)
-    click_history = models.JSONField(_('点击历史'), default=list)
-    favorite_categories = models.JSONField(_('收藏类别'), default=list)
+    # 搜索、浏览、收藏行为记录在 UserEvent 中，汇总见 UserEventSummary
+    
+    # 当前推荐结果（AIRecommendation 中 rank 非空的记录）计算时读到的版本号，
+    # 全部仍然有效时接口直接读取这些记录，见 ai_recommendation.precomputed
+    recommendation_versions = models.JSONField(_('推荐结果版本'), default=dict, blank=True)
+    recommendations_built_at = models.DateTimeField(_('推荐生成时间'), null=True, blank=True)
     
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
@@ -49,6 +52,8 @@ class AIRecommendation(models.Model):
     # 推荐参数
     recommendation_reason = models.TextField(_('推荐理由'))
     match_score = models.DecimalField(_('匹配度'), max_digits=5, decimal_places=2, default=0)
+    # 在当前推荐结果中的名次，不在当前结果中的历史记录为空
+    rank = models.PositiveSmallIntegerField(_('名次'), null=True, blank=True)
     
     # 用户反馈
     is_viewed = models.BooleanField(_('是否查看'), default=False)
@@ -61,6 +66,9 @@ class AIRecommendation(models.Model):
         verbose_name = _('AI推荐')
         verbose_name_plural = _('AI推荐')
         ordering = ['-match_score']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'car'], name='ai_recommendation_user_car_unique'),
+        ]
     
     def __str__(self):
         return f"{self.user.username}的推荐: {self.car.brand.name} {self.car.model}"
@@ -111,6 +119,81 @@ class AITrainingData(models.Model):
     class Meta:
         verbose_name = _('AI训练数据')
         verbose_name_plural = _('AI训练数据')
+        indexes = [
+            # 只覆盖未处理记录的部分索引，process_training_data 按 id 分块读取
+            models.Index(fields=['id'], condition=models.Q(is_processed=False),
+                         name='ai_training_unprocessed_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.data_type} - {self.data_source}"
+
+class CollaborativeNeighbors(models.Model):
+    """协同过滤的相似车辆（由 ai_recommendation.collaborative 批量生成、增量刷新）"""
+    car = models.OneToOneField('cars.Car', on_delete=models.CASCADE, primary_key=True,
+                               related_name='collaborative_neighbors', verbose_name=_('车辆'))
+    car_ids = models.JSONField(_('相似车辆'), default=list)
+    scores = models.JSONField(_('相似度'), default=list)
+    # 车辆行为向量的范数，增量刷新时不必读取该车的全部行为
+    norm = models.FloatField(_('范数'), default=0)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('协同过滤相似车辆')
+        verbose_name_plural = _('协同过滤相似车辆')
+    
+    def __str__(self):
+        return f"车辆 {self.car_id} 的协同过滤相似车辆"
+
+class UserEvent(models.Model):
+    """用户行为日志（只追加），由 ai_recommendation.events 缓冲后批量写入
+
+    不建外键约束：缓冲期间车辆或用户被删除也不影响整批写入。
+    """
+    EVENT_TYPES = [
+        ('search', '搜索'),
+        ('click', '浏览车辆'),
+        ('favorite', '收藏'),
+    ]
+    
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False,
+                             related_name='events', verbose_name=_('用户'))
+    event_type = models.CharField(_('行为类型'), max_length=20, choices=EVENT_TYPES)
+    car = models.ForeignKey('cars.Car', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True,
+                            related_name='+', verbose_name=_('车辆'))
+    query = models.CharField(_('搜索关键词'), max_length=200, blank=True)
+    created_at = models.DateTimeField(_('发生时间'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('用户行为')
+        verbose_name_plural = _('用户行为')
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='ai_user_event_user_idx'),
+            # 按时间清理过期记录
+            models.Index(fields=['created_at'], name='ai_user_event_created_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} {self.get_event_type_display()}"
+
+class UserEventSummary(models.Model):
+    """用户行为的滚动汇总，推荐时按用户主键一次读取
+
+    品牌、车型权重按半衰期衰减后累加，只保留权重最高的若干项；最近搜索去重后
+    最新在前，条数有上限。
+    """
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True,
+                                related_name='event_summary', verbose_name=_('用户'))
+    brand_scores = models.JSONField(_('品牌权重'), default=dict)
+    type_scores = models.JSONField(_('车型权重'), default=dict)
+    recent_searches = models.JSONField(_('最近搜索'), default=list)
+    event_count = models.IntegerField(_('行为数'), default=0)
+    decayed_at = models.DateTimeField(_('权重计算时间'), null=True, blank=True)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('用户行为汇总')
+        verbose_name_plural = _('用户行为汇总')
     
     def __str__(self):
-        return f"{self.data_type} - {self.data_source}"
\ No newline at end of file
+        return f"{self.user_id}的行为汇总"
@@ -0,0 +1,167 @@
+"""预先计算的推荐结果
+
+推荐结果保存在 AIRecommendation 中：当前结果的记录 rank 为 1..k，其余为历史
+记录（rank 为空）。UserPreference.recommendation_versions 保存这组结果计算时读到
+的版本号（见 ai_recommendation.result_cache），版本号全部有效时接口直接读取这些
+记录，否则在线计算并写回，离线任务和在线计算写入的是同一份数据。
+
+build_recommendations 命令把用户按 id 区间分片交给进程池：主进程先读取全部分桶
+的版本号，再加载一次已审核车辆并把各列作为新版本发布到模型存储
+（ai_recommendation.artifacts），工作进程以 mmap_mode='r' 打开同一版本，多个
+进程共享同一份页缓存；每个分片的结果在一个事务里批量写入。
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from cars import versioning
+from cars.catalog_index import CatalogIndex, Columns
+
+from . import artifacts, collaborative, engine, events, result_cache
+from .models import AIRecommendation, UserPreference
+
+UPSERT_BATCH_SIZE = 1000
+
+CATALOG_ARTIFACT = 'recommendation_catalog'
+
+PREFERENCE_FIELDS = ('id', 'user_id', 'min_year', 'max_mileage', 'budget_range')
+
+
+def save(entries):
+    """写入一批用户的推荐结果；entries 为 [(偏好 id, 用户 id, 结果, 版本号), ...]"""
+    if not entries:
+        return
+    now = timezone.now()
+    with transaction.atomic():
+        AIRecommendation.objects.filter(
+            user_id__in=[user_id for _, user_id, _, _ in entries], rank__isnull=False
+        ).update(rank=None)
+        AIRecommendation.objects.bulk_create(
+            [
+                AIRecommendation(
+                    user_id=user_id,
+                    car_id=car_id,
+                    recommendation_reason='，'.join(reasons),
+                    match_score=score,
+                    rank=position,
+                )
+                for _, user_id, results, _ in entries
+                for position, (car_id, score, reasons) in enumerate(results, 1)
+            ],
+            batch_size=UPSERT_BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['user', 'car'],
+            update_fields=['recommendation_reason', 'match_score', 'rank'],
+        )
+        # bulk_update 不触发信号，不会递增偏好版本号使刚写入的结果失效
+        UserPreference.objects.bulk_update(
+            [
+                UserPreference(id=preference_id, recommendation_versions=versions, recommendations_built_at=now)
+                for preference_id, _, _, versions in entries
+            ],
+            ['recommendation_versions', 'recommendations_built_at'],
+            batch_size=UPSERT_BATCH_SIZE,
+        )
+
+
+def load(user_preference):
+    """版本号仍然有效时返回保存的 [(车辆, 得分, 推荐理由列表), ...]，否则返回 None"""
+    if not result_cache.is_current(user_preference.recommendation_versions):
+        return None
+    recommendations = (
+        AIRecommendation.objects.filter(user_id=user_preference.user_id, rank__isnull=False)
+        .select_related('car__brand').order_by('rank')
+    )
+    return [
+        (recommendation.car, int(recommendation.match_score), recommendation.recommendation_reason.split('，'))
+        for recommendation in recommendations
+    ]
+
+
+def publish_catalog():
+    """加载已审核车辆，把打分所需的列作为新版本发布到模型存储，返回 (版本号, 车辆数)"""
+    index = CatalogIndex()
+    index.load()
+    snapshot = index.snapshot()
+    columns = snapshot.select(fields=engine.FIELDS)
+    version = artifacts.publish(
+        CATALOG_ARTIFACT, {field: columns[field] for field in engine.FIELDS},
+        metadata={'catalog_version': snapshot.version, 'cars': len(columns)},
+    )
+    artifacts.prune(CATALOG_ARTIFACT)
+    return version, len(columns)
+
+
+def open_catalog(version=None):
+    artifact = artifacts.open_artifact(CATALOG_ARTIFACT, version)
+    return Columns({field: artifact[field] for field in engine.FIELDS})
+
+
+# 工作进程状态，由 init_worker 设置（单进程运行时在主进程内设置）
+_columns = None
+_versions = None
+
+
+def init_worker(catalog_version, versions):
+    """工作进程初始化：打开内存映射的车辆列，记下主进程读到的分桶版本号"""
+    global _columns, _versions
+    _columns = open_catalog(catalog_version)
+    _versions = versions
+
+
+def _preferences(user_ids):
+    """一批用户的偏好，偏好品牌、车型各一次查询"""
+    rows = list(UserPreference.objects.filter(user_id__in=user_ids).order_by('user_id').values_list(*PREFERENCE_FIELDS))
+    brands, types = {}, {}
+    through = UserPreference.preferred_brands.through.objects.filter(userpreference_id__in=[row[0] for row in rows])
+    for preference_id, brand_id in through.values_list('userpreference_id', 'brand_id'):
+        brands.setdefault(preference_id, []).append(brand_id)
+    through = UserPreference.preferred_types.through.objects.filter(userpreference_id__in=[row[0] for row in rows])
+    for preference_id, type_id in through.values_list('userpreference_id', 'cartype_id'):
+        types.setdefault(preference_id, []).append(type_id)
+    return [
+        (preference_id, user_id, engine.Preference(
+            brands.get(preference_id, ()), types.get(preference_id, ()), min_year, max_mileage, budget_range))
+        for preference_id, user_id, min_year, max_mileage, budget_range in rows
+    ]
+
+
+def build_shard(bounds, stale_only=False):
+    """计算并写入 user_id 在 [first, last] 内的用户的推荐，返回 (first, last, 计算的用户数)"""
+    first, last = bounds
+    preferences = UserPreference.objects.filter(user_id__gte=first, user_id__lte=last)
+    if stale_only:
+        stored = list(preferences.values_list('user_id', 'recommendation_versions'))
+        current = versioning.read_versions(sorted({key for _, versions in stored for key in versions}))
+        user_ids = [
+            user_id for user_id, versions in stored
+            if not versions or any(current.get(key) != version for key, version in versions.items())
+        ]
+    else:
+        user_ids = list(preferences.values_list('user_id', flat=True))
+    if not user_ids:
+        return first, last, 0
+
+    # 先读偏好版本号再读偏好，读取之后的修改会使这次的结果失效
+    versions = dict(_versions)
+    versions.update(versioning.read_versions(
+        [result_cache.preference_key(user_id) for user_id in user_ids]
+    ))
+    preferences = _preferences(user_ids)
+    histories = events.summaries(user_ids)
+    profiles, cf_versions = collaborative.profiles(user_ids)
+    versions.update(cf_versions)
+    computed = []
+    for preference_id, user_id, preference in preferences:
+        preference.use_history(histories.get(user_id))
+        preference.cf = profiles.get(user_id)
+        computed.append((preference_id, user_id, preference, engine.rank(_columns, preference)))
+    # 结果中车辆的版本号一次读取
+    versions.update(versioning.read_versions(sorted({
+        versioning.object_version_key(versioning.CAR, car_id)
+        for _, _, _, results in computed for car_id, _, _ in results
+    })))
+    save([
+        (preference_id, user_id, results, result_cache.stamp(user_id, preference, results, versions))
+        for preference_id, user_id, preference, results in computed
+    ])
+    return first, last, len(computed)
@@ -0,0 +1,381 @@
+"""车辆价格预测
+
+用已审核、已售车辆训练一个对数价格的岭回归（NumPy 最小二乘）：
+
+    log(当前价格) ~ 品牌 + 车型 + 燃料类型（独热） + 车龄 + 车龄² + log(1+里程) + 排量 + log(原价)
+
+数值特征先标准化，正则项不作用于截距，训练集中没出现过的品牌、车型取全零独热
+（即按平均水平估计）。predict_prices 命令训练后把模型作为新版本发布到模型存储
+（ai_recommendation.artifacts），再按批读取全部车辆的列、向量化预测，用
+bulk_update / 批量 upsert 写回 Car.ai_suggested_price 和 PricePrediction；
+车辆上架时 suggest() 在进程内对单辆车推理（内存映射当前版本，发布新版本后
+自动切换），耗时在毫秒以内。
+
+置信度由该品牌训练残差的标准差和样本数折算为 0-100；市场趋势取同品牌同车型
+最近 4 周与之前 4 周的周均价（cars.WeeklyPriceRollup）之比，变动超过 3% 为
+上涨或下跌；影响因素为对数空间中偏离训练平均水平最大的 3 组特征。
+"""
+from datetime import date
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+
+from cars.models import Car, WeeklyPriceRollup
+
+from . import artifacts
+from .models import PricePrediction
+
+ARTIFACT_NAME = 'pricing'
+
+RIDGE = 1.0
+MIN_TRAINING_ROWS = 20
+BATCH_SIZE = 5000
+TRAINING_STATUSES = ('approved', 'sold')
+
+FUEL_TYPES = tuple(value for value, _ in Car.FUEL_TYPE_CHOICES)
+FIELDS = ('id', 'brand_id', 'car_type_id', 'fuel_type', 'year', 'mileage', 'engine_capacity', 'original_price')
+
+# 置信度：100 * exp(-CONFIDENCE_DECAY * 残差标准差) * n / (n + CONFIDENCE_PRIOR)
+CONFIDENCE_DECAY = 1.5
+CONFIDENCE_PRIOR = 5
+
+TREND_WEEKS = 4
+TREND_THRESHOLD = 0.03
+TRENDS = ('stable', 'rising', 'declining')
+
+TOP_FACTORS = 3
+FACTOR_NAMES = {
+    'brand': '品牌',
+    'car_type': '车型',
+    'fuel_type': '燃料类型',
+    'age': '车龄',
+    'mileage': '里程',
+    'engine_capacity': '排量',
+    'original_price': '原价',
+}
+
+
+class ModelNotTrained(RuntimeError):
+    """还没有训练价格模型"""
+
+
+def _numeric(columns, reference_year):
+    age = np.maximum(reference_year - columns['year'].astype(np.float64), 0)
+    return np.column_stack([
+        age,
+        age * age,
+        np.log1p(np.maximum(columns['mileage'].astype(np.float64), 0)),
+        columns['engine_capacity'].astype(np.float64),
+        np.log(np.maximum(columns['original_price'].astype(np.float64), 1)),
+    ])
+
+
+# 数值矩阵各列所属的特征组
+NUMERIC_COLUMN_GROUPS = ('age', 'age', 'mileage', 'engine_capacity', 'original_price')
+
+
+def _lookup(values, categories):
+    """values 在有序数组 categories 中的 (位置, 是否存在)"""
+    if not len(categories):
+        return np.zeros(len(values), dtype=np.int64), np.zeros(len(values), dtype=bool)
+    positions = np.minimum(np.searchsorted(categories, values), len(categories) - 1)
+    return positions, categories[positions] == values
+
+
+def _one_hot(values, categories):
+    """独热编码，categories 中不存在的值为全零行"""
+    matrix = np.zeros((len(values), len(categories)))
+    positions, found = _lookup(values, categories)
+    matrix[np.flatnonzero(found), positions[found]] = 1
+    return matrix
+
+
+class PriceModel:
+    """训练好的价格模型，全部参数为 NumPy 数组，可原样写入 .npz"""
+
+    ARRAYS = (
+        'brand_ids', 'type_ids', 'fuel_types', 'mean', 'std', 'coef', 'intercept', 'baseline',
+        'confidence_brand_ids', 'confidence_values', 'default_confidence',
+        'trend_brand_ids', 'trend_type_ids', 'trend_codes', 'reference_year', 'training_rows',
+    )
+
+    def __init__(self, **arrays):
+        for name in self.ARRAYS:
+            setattr(self, name, arrays[name])
+        self.groups = self._groups()
+        self._trends = {
+            (int(brand_id), int(type_id)): TRENDS[code]
+            for brand_id, type_id, code in zip(self.trend_brand_ids, self.trend_type_ids, self.trend_codes)
+        }
+
+    def _groups(self):
+        """[(特征组, 设计矩阵中的列下标数组), ...]，顺序与 baseline 一致"""
+        sizes = [('brand', len(self.brand_ids)), ('car_type', len(self.type_ids)), ('fuel_type', len(self.fuel_types))]
+        sizes += [(group, 1) for group in NUMERIC_COLUMN_GROUPS]
+        groups = {}
+        start = 0
+        for group, size in sizes:
+            groups.setdefault(group, []).extend(range(start, start + size))
+            start += size
+        return [(group, np.array(columns, dtype=np.int64)) for group, columns in groups.items()]
+
+    @classmethod
+    def fit(cls, columns, prices, trends=None, reference_year=None, ridge=RIDGE):
+        """columns 为 FIELDS 各列的数组字典，prices 为当前价格数组"""
+        if len(prices) < MIN_TRAINING_ROWS:
+            raise ModelNotTrained(f'训练样本不足 {MIN_TRAINING_ROWS} 条')
+        reference_year = reference_year or date.today().year
+        numeric = _numeric(columns, reference_year)
+        mean = numeric.mean(axis=0)
+        std = numeric.std(axis=0)
+        std[std == 0] = 1
+        arrays = {
+            'brand_ids': np.unique(columns['brand_id']).astype(np.int64),
+            'type_ids': np.unique(columns['car_type_id']).astype(np.int64),
+            'fuel_types': np.array(sorted(FUEL_TYPES)),
+            'mean': mean,
+            'std': std,
+            'reference_year': np.array(reference_year),
+            'training_rows': np.array(len(prices)),
+        }
+        design = cls._design(arrays, columns, numeric)
+        target = np.log(prices.astype(np.float64))
+
+        # 岭回归：在最小二乘问题下方追加 sqrt(ridge) * I，截距列不加惩罚
+        centered = target.mean()
+        width = design.shape[1]
+        augmented = np.vstack([np.column_stack([design, np.ones(len(design))]),
+                               np.column_stack([np.sqrt(ridge) * np.eye(width), np.zeros(width)])])
+        solution = np.linalg.lstsq(augmented, np.concatenate([target - centered, np.zeros(width)]), rcond=None)[0]
+        arrays['coef'] = solution[:width]
+        arrays['intercept'] = np.array(solution[width] + centered)
+
+        residuals = target - (design @ arrays['coef'] + arrays['intercept'])
+        confidence_brand_ids, inverse, counts = np.unique(columns['brand_id'], return_inverse=True, return_counts=True)
+        sigma = np.sqrt(np.bincount(inverse, weights=residuals ** 2) / counts)
+        arrays['confidence_brand_ids'] = confidence_brand_ids.astype(np.int64)
+        arrays['confidence_values'] = _confidence(sigma, counts)
+        arrays['default_confidence'] = np.array(_confidence(np.sqrt(np.mean(residuals ** 2)), 0))
+
+        trends = trends or {}
+        keys = sorted(trends)
+        arrays['trend_brand_ids'] = np.array([brand_id for brand_id, _ in keys], dtype=np.int64)
+        arrays['trend_type_ids'] = np.array([type_id for _, type_id in keys], dtype=np.int64)
+        arrays['trend_codes'] = np.array([TRENDS.index(trends[key]) for key in keys], dtype=np.int8)
+
+        # 各特征组在训练集上的平均贡献，影响因素按偏离它的程度排序
+        arrays['baseline'] = np.zeros(0)
+        model = cls(**arrays)
+        model.baseline = np.array([
+            (design[:, group_columns] @ model.coef[group_columns]).mean() for _, group_columns in model.groups
+        ])
+        return model
+
+    @staticmethod
+    def _design(arrays, columns, numeric):
+        return np.hstack([
+            _one_hot(columns['brand_id'], arrays['brand_ids']),
+            _one_hot(columns['car_type_id'], arrays['type_ids']),
+            _one_hot(columns['fuel_type'], arrays['fuel_types']),
+            (numeric - arrays['mean']) / arrays['std'],
+        ])
+
+    def design(self, columns):
+        arrays = {name: getattr(self, name) for name in ('brand_ids', 'type_ids', 'fuel_types', 'mean', 'std')}
+        return self._design(arrays, columns, _numeric(columns, int(self.reference_year)))
+
+    def predict(self, columns):
+        """返回 (预测价格数组, 各特征组相对平均水平的对数贡献矩阵)"""
+        design = self.design(columns)
+        contributions = np.column_stack([
+            design[:, group_columns] @ self.coef[group_columns] for _, group_columns in self.groups
+        ]) - self.baseline
+        log_price = design @ self.coef + self.intercept
+        return np.exp(log_price), contributions
+
+    def confidence(self, brand_ids):
+        positions, found = _lookup(brand_ids, self.confidence_brand_ids)
+        values = self.confidence_values[positions] if len(self.confidence_values) else 0
+        return np.where(found, values, float(self.default_confidence))
+
+    def trend(self, brand_id, car_type_id):
+        return self._trends.get((int(brand_id), int(car_type_id)), 'stable')
+
+    def factors(self, contributions):
+        """单辆车的影响因素：[{'factor': 名称, 'impact': 百分比}, ...]，按影响大小排序"""
+        order = np.argsort(-np.abs(contributions), kind='stable')[:TOP_FACTORS]
+        return [
+            {'factor': FACTOR_NAMES[self.groups[index][0]],
+             'impact': round(float(np.expm1(contributions[index])) * 100, 1)}
+            for index in order
+        ]
+
+    def publish(self):
+        """作为新版本发布到模型存储（ai_recommendation.artifacts），返回版本号"""
+        version = artifacts.publish(
+            ARTIFACT_NAME,
+            {name: getattr(self, name) for name in self.ARRAYS},
+            metadata={'training_rows': int(self.training_rows), 'reference_year': int(self.reference_year)},
+        )
+        artifacts.prune(ARTIFACT_NAME)
+        return version
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        return cls(**{name: artifact[name] for name in cls.ARRAYS})
+
+    @classmethod
+    def load(cls, version=None):
+        return cls.from_artifact(artifacts.open_artifact(ARTIFACT_NAME, version))
+
+
+def _confidence(sigma, counts):
+    return np.round(100 * np.exp(-CONFIDENCE_DECAY * np.asarray(sigma)) * counts / (counts + CONFIDENCE_PRIOR), 2)
+
+
+def _columns(rows):
+    """values_list(*FIELDS) 的结果转为列数组"""
+    ids, brand_ids, type_ids, fuel_types, years, mileages, capacities, original_prices = zip(*rows)
+    return {
+        'id': np.array(ids, dtype=np.int64),
+        'brand_id': np.array(brand_ids, dtype=np.int64),
+        'car_type_id': np.array(type_ids, dtype=np.int64),
+        'fuel_type': np.array(fuel_types),
+        'year': np.array(years, dtype=np.int64),
+        'mileage': np.array(mileages, dtype=np.float64),
+        'engine_capacity': np.array(capacities, dtype=np.float64),
+        'original_price': np.array(original_prices, dtype=np.float64),
+    }
+
+
+def market_trends(weeks=TREND_WEEKS, threshold=TREND_THRESHOLD):
+    """{(品牌 id, 车型 id): 'rising' / 'stable' / 'declining'}，只包含有足够周数据的组合"""
+    latest = WeeklyPriceRollup.objects.order_by('-period_start').values_list('period_start', flat=True).first()
+    if latest is None:
+        return {}
+    recent_start = latest.toordinal() - 7 * (weeks - 1)
+    previous_start = recent_start - 7 * weeks
+    totals = {}
+    rows = WeeklyPriceRollup.objects.filter(
+        period_start__gte=date.fromordinal(previous_start),
+    ).values_list('brand_id', 'car_type_id', 'period_start', 'price_total', 'sample_count')
+    for brand_id, type_id, period_start, price_total, sample_count in rows.iterator():
+        recent = period_start.toordinal() >= recent_start
+        entry = totals.setdefault((brand_id, type_id), [0.0, 0, 0.0, 0])
+        offset = 0 if recent else 2
+        entry[offset] += float(price_total)
+        entry[offset + 1] += sample_count
+    trends = {}
+    for key, (recent_total, recent_count, previous_total, previous_count) in totals.items():
+        if not recent_count or not previous_count:
+            continue
+        change = (recent_total / recent_count) / (previous_total / previous_count) - 1
+        trends[key] = 'rising' if change > threshold else 'declining' if change < -threshold else 'stable'
+    return trends
+
+
+def training_data():
+    """(列数组字典, 当前价格数组)：已审核、已售且价格有效的车辆"""
+    rows = list(
+        Car.objects.filter(status__in=TRAINING_STATUSES, current_price__gt=0, original_price__gt=0)
+        .values_list(*FIELDS, 'current_price')
+    )
+    if len(rows) < MIN_TRAINING_ROWS:
+        raise ModelNotTrained(f'训练样本不足 {MIN_TRAINING_ROWS} 条')
+    return _columns([row[:-1] for row in rows]), np.array([row[-1] for row in rows], dtype=np.float64)
+
+
+def evaluate(columns, prices, holdout=0.2, seed=0):
+    """随机留出 holdout 比例的样本，返回留出集上的 (平均绝对百分比误差, 中位数)"""
+    rng = np.random.default_rng(seed)
+    test = rng.random(len(prices)) < holdout
+    model = PriceModel.fit({name: values[~test] for name, values in columns.items()}, prices[~test])
+    predicted, _ = model.predict({name: values[test] for name, values in columns.items()})
+    errors = np.abs(predicted / prices[test] - 1)
+    return float(errors.mean()), float(np.median(errors))
+
+
+def train(reference_year=None):
+    """用已审核、已售车辆训练并发布模型，返回 (模型, 版本号)"""
+    columns, prices = training_data()
+    model = PriceModel.fit(columns, prices, market_trends(), reference_year)
+    return model, model.publish()
+
+
+def _money(value):
+    return Decimal(int(round(value / 100)) * 100).quantize(Decimal('0.01'))
+
+
+def _results(model, columns):
+    """[(车辆 id, 建议价格, 置信度, 市场趋势, 影响因素), ...]"""
+    prices, contributions = model.predict(columns)
+    confidence = model.confidence(columns['brand_id'])
+    return [
+        (int(car_id), _money(price), Decimal(str(round(float(score), 2))),
+         model.trend(brand_id, type_id), model.factors(row))
+        for car_id, brand_id, type_id, price, score, row in zip(
+            columns['id'], columns['brand_id'], columns['car_type_id'], prices, confidence, contributions)
+    ]
+
+
+def _write(results):
+    with transaction.atomic():
+        # bulk_update 不触发 Car 信号；建议价格不在列表、详情缓存和列式索引中，无需递增版本号
+        Car.objects.bulk_update(
+            [Car(id=car_id, ai_suggested_price=price) for car_id, price, _, _, _ in results],
+            ['ai_suggested_price'], batch_size=BATCH_SIZE,
+        )
+        PricePrediction.objects.bulk_create(
+            [
+                PricePrediction(car_id=car_id, predicted_price=price, confidence_score=score,
+                                market_trend=trend, influencing_factors=factors)
+                for car_id, price, score, trend, factors in results
+            ],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['car'],
+            update_fields=['predicted_price', 'confidence_score', 'market_trend', 'influencing_factors', 'updated_at'],
+        )
+
+
+def predict_all(model, batch_size=BATCH_SIZE, progress=None):
+    """按 id 分批预测全部车辆并写回，返回处理的车辆数"""
+    last_id = 0
+    total = 0
+    while True:
+        rows = list(Car.objects.filter(id__gt=last_id).order_by('id').values_list(*FIELDS)[:batch_size])
+        if not rows:
+            return total
+        _write(_results(model, _columns(rows)))
+        last_id = rows[-1][0]
+        total += len(rows)
+        if progress:
+            progress(total)
+
+
+# 各工作进程共享内存映射的模型文件，发布新版本后下次调用时切换
+_model = artifacts.Handle(ARTIFACT_NAME, PriceModel.from_artifact)
+
+
+def suggest(car):
+    """单辆车的价格预测，未训练模型时返回 None；返回 (建议价格, 置信度, 市场趋势, 影响因素)"""
+    model = _model.get()
+    if model is None:
+        return None
+    columns = _columns([tuple(getattr(car, field) for field in FIELDS)])
+    return _results(model, columns)[0][1:]
+
+
+def record(car):
+    """车辆上架时写入建议价格和预测记录"""
+    suggestion = suggest(car)
+    if suggestion is None:
+        return None
+    price, score, trend, factors = suggestion
+    Car.objects.filter(id=car.id).update(ai_suggested_price=price)
+    car.ai_suggested_price = price
+    PricePrediction.objects.update_or_create(car=car, defaults={
+        'predicted_price': price, 'confidence_score': score, 'market_trend': trend, 'influencing_factors': factors,
+    })
+    return suggestion
@@ -0,0 +1,175 @@
+"""按用户缓存推荐结果
+
+推荐结果只在用户偏好或已审核车辆变化时才会改变。每个用户缓存一份完整的接口
+返回数据，连同计算时读到的一组版本号；命中时一次 get_many 核对版本号，全部
+一致即直接返回，不访问数据库。版本号包括：
+
+- 用户偏好的版本号（偏好保存、偏好品牌/车型变化以及收藏、咨询等行为变化时
+  由 ai_recommendation.signals 递增，行为汇总中代替偏好的品牌、车型变化时由
+  ai_recommendation.events 递增）；
+- 结果中每辆车的版本号（车辆修改、下架、删除时由 cars.signals 递增）；
+- 品牌表版本号（结果中显示品牌名称）；
+- 有行为的用户：协同过滤全量重建的版本号及其行为车辆的相似列表版本号；
+- 若干失效分桶的版本号，用于发现可能挤进结果的新车。
+
+新车上架（或在售车辆修改）时不清空所有人的缓存，只递增它所属的分桶：
+all、brand:<品牌>、type:<车型>、budget:<预算档位>。新车对某个用户的得分只有
+不低于其结果中第 k 名的得分（floor）才会改变结果，因此按 floor 选择订阅的分桶：
+
+    不命中品牌偏好的车最多 可达分 - 30 分；floor 更高时只订阅偏好品牌的分桶
+    不命中车型偏好的车最多 可达分 - 25 分；floor 更高时只订阅偏好车型的分桶
+    不在预算内的车最多     可达分 - 10 分；floor 更高时只订阅预算档位的分桶
+
+以上都不满足（floor 较低或结果不足 k 条）时订阅 all，任何新车都会使其失效。
+"""
+from django.core.cache import cache
+from django.db import transaction
+
+from cars import versioning
+from cars.catalog_index import catalog_index
+
+from . import collaborative, engine, events
+from .models import UserPreference
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+BUDGET_RANGES = {
+    value: engine.parse_budget(value) for value, _ in UserPreference.BUDGET_CHOICES
+}
+POINTS = {name: points for name, points, _ in engine.RULES}
+
+
+def _cache_key(user_id):
+    return f'recommendations:{user_id}'
+
+
+def _bucket_key(bucket):
+    return versioning.object_version_key(versioning.RECOMMENDATION_BUCKET, bucket)
+
+
+def car_buckets(brand_id, car_type_id, price):
+    """车辆所属的失效分桶"""
+    price_wan = float(price) / 10000
+    buckets = ['all', f'brand:{brand_id}', f'type:{car_type_id}']
+    buckets.extend(
+        f'budget:{value}' for value, (low, high) in BUDGET_RANGES.items() if low <= price_wan <= high
+    )
+    return buckets
+
+
+def _preference_buckets(preference):
+    return {
+        'brand': [f'brand:{brand_id}' for brand_id in preference.brand_ids.tolist()],
+        'type': [f'type:{type_id}' for type_id in preference.type_ids.tolist()],
+        'budget': [f'budget:{preference.budget_range}'],
+    }
+
+
+def all_bucket_keys(brand_ids, type_ids):
+    """全部分桶的版本号键（离线批量任务开始前一次读取）"""
+    buckets = ['all', *(f'brand:{brand_id}' for brand_id in brand_ids), *(f'type:{type_id}' for type_id in type_ids)]
+    buckets.extend(f'budget:{value}' for value in BUDGET_RANGES)
+    return [_bucket_key(bucket) for bucket in buckets]
+
+
+def _subscribed_buckets(preference, floor):
+    """能挤进结果的新车必然落入的分桶（取最少的一组）"""
+    groups = _preference_buckets(preference)
+    reachable = sum(POINTS.values())
+    reachable -= POINTS['brand'] * (not groups['brand']) + POINTS['type'] * (not groups['type'])
+    # 已有协同过滤分的在售车辆修改后也可能挤进结果，可达分加上协同过滤加分上限
+    if preference.cf is not None:
+        reachable += engine.CF_POINTS
+    options = [
+        buckets for name, buckets in groups.items()
+        if buckets and reachable - POINTS[name] < floor
+    ]
+    return min(options, key=len) if options else ['all']
+
+
+def is_current(versions):
+    """版本号是否全部仍然有效（一次缓存往返）"""
+    if not versions:
+        return False
+    found = cache.get_many(list(versions))
+    return all(found.get(key) == version for key, version in versions.items())
+
+
+def lookup(user_id):
+    """返回缓存的接口数据；未缓存或任一版本号变化时返回 None"""
+    entry = cache.get(_cache_key(user_id))
+    if entry is None or not is_current(entry['versions']):
+        return None
+    return entry['data']
+
+
+def preference_key(user_id):
+    return versioning.object_version_key(versioning.USER_PREFERENCE, user_id)
+
+
+def candidate_keys(user_id, preference):
+    """计算前需要读取的版本号键：用户偏好、品牌表以及所有可能订阅的分桶"""
+    return [
+        preference_key(user_id),
+        versioning.version_key(versioning.BRAND),
+        _bucket_key('all'),
+        *(_bucket_key(bucket) for buckets in _preference_buckets(preference).values() for bucket in buckets),
+    ]
+
+
+def stamp(user_id, preference, results, versions, k=engine.TOP_K):
+    """从计算前读到的 versions 中挑出结果依赖的版本号，结果中车辆的版本号未读取时补读"""
+    floor = results[-1][1] if len(results) == k else engine.MIN_SCORE
+    keys = [
+        preference_key(user_id),
+        versioning.version_key(versioning.BRAND),
+    ]
+    keys.extend(_bucket_key(bucket) for bucket in _subscribed_buckets(preference, floor))
+    if preference.cf is not None:
+        keys.extend(collaborative.version_keys(preference.cf.items))
+    keys.extend(versioning.object_version_key(versioning.CAR, car_id) for car_id, _, _ in results)
+    missing = [key for key in keys if key not in versions]
+    if missing:
+        versions = {**versions, **versioning.read_versions(missing)}
+    return {key: versions[key] for key in keys}
+
+
+def recommend(user_preference, k=engine.TOP_K):
+    """计算推荐并返回 (结果, 版本号)，版本号交给 store() 与接口数据一起缓存"""
+    preference = engine.Preference.from_user_preference(user_preference)
+    preference.use_history(events.summary(user_preference.user_id))
+    # 先读版本号再计算：计算期间发生的变化会使这次缓存的结果在下次请求时失效
+    versions = versioning.read_versions(candidate_keys(user_preference.user_id, preference))
+    profiles, cf_versions = collaborative.profiles([user_preference.user_id])
+    preference.cf = profiles.get(user_preference.user_id)
+    versions.update(cf_versions)
+
+    snapshot = catalog_index.snapshot()
+    if snapshot.version != versioning.get_version(versioning.CAR):
+        catalog_index.refresh()
+        snapshot = catalog_index.snapshot()
+    results = engine.recommend(preference, k, snapshot)
+    return results, stamp(user_preference.user_id, preference, results, versions, k)
+
+
+def store(user_id, versions, data):
+    cache.set(_cache_key(user_id), {'versions': versions, 'data': data}, CACHE_TIMEOUT)
+
+
+def invalidate_preference(user_id):
+    versioning.bump_object_version(versioning.USER_PREFERENCE, user_id)
+
+
+def invalidate_for_cars(rows):
+    """已审核车辆上架或修改后（事务提交时）递增其所属分桶；rows 为 (品牌, 车型, 价格)"""
+    buckets = set()
+    for brand_id, car_type_id, price in rows:
+        buckets.update(car_buckets(brand_id, car_type_id, price))
+    if not buckets:
+        return
+
+    def bump():
+        for bucket in buckets:
+            versioning.bump_object_version(versioning.RECOMMENDATION_BUCKET, bucket)
+
+    transaction.on_commit(bump)
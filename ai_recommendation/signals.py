@@ -0,0 +1,85 @@
+"""推荐相关模型信号"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from cars.models import Car
+from transactions.models import Transaction
+from users.models import FavoriteCar
+
+from . import collaborative, events, result_cache
+from .models import AIRecommendation, UserPreference
+
+
+@receiver(post_save, sender=UserPreference)
+@receiver(post_delete, sender=UserPreference)
+def invalidate_user_recommendations(sender, instance, **kwargs):
+    result_cache.invalidate_preference(instance.user_id)
+
+
+@receiver(m2m_changed, sender=UserPreference.preferred_brands.through)
+@receiver(m2m_changed, sender=UserPreference.preferred_types.through)
+def invalidate_preferred_items(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    """偏好品牌/车型变化（含后台编辑）；从品牌、车型一侧修改时 instance 是品牌或车型"""
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        result_cache.invalidate_preference(instance.user_id)
+    elif pk_set:
+        for user_id in UserPreference.objects.filter(pk__in=pk_set).values_list('user_id', flat=True):
+            result_cache.invalidate_preference(user_id)
+
+
+@receiver(post_save, sender=Car)
+def invalidate_for_approved_car(sender, instance, raw=False, **kwargs):
+    """已审核车辆上架或修改后，使可能被它挤进结果的用户缓存失效"""
+    if not raw and instance.status == 'approved':
+        result_cache.invalidate_for_cars([(instance.brand_id, instance.car_type_id, instance.current_price)])
+
+
+def _interaction_changed(user_id, car_id):
+    """用户行为变化：该用户的推荐缓存失效，后台增量刷新协同过滤相似车辆"""
+    result_cache.invalidate_preference(user_id)
+    collaborative.schedule_refresh(user_id, car_id)
+
+
+@receiver(post_save, sender=FavoriteCar)
+@receiver(post_delete, sender=FavoriteCar)
+def favorite_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _interaction_changed(instance.user_id, instance.car_id)
+
+
+@receiver(post_save, sender=FavoriteCar)
+def favorite_added(sender, instance, created=False, raw=False, **kwargs):
+    """收藏记入行为日志（事务提交后）"""
+    if created and not raw:
+        user_id, car_id = instance.user_id, instance.car_id
+        transaction.on_commit(lambda: events.record(user_id, 'favorite', car_id=car_id))
+
+
+def _feedback(instance):
+    return instance.is_clicked, instance.user_rating
+
+
+@receiver(pre_save, sender=AIRecommendation)
+def remember_previous_feedback(sender, instance, raw=False, **kwargs):
+    if not raw:
+        previous = None
+        if instance.pk is not None:
+            previous = sender.objects.filter(pk=instance.pk).values_list('is_clicked', 'user_rating').first()
+        instance._previous_feedback = previous or (False, None)
+
+
+@receiver(post_save, sender=AIRecommendation)
+def recommendation_feedback_changed(sender, instance, raw=False, **kwargs):
+    """推荐记录的点击、评分变化（推荐结果本身用 bulk_create 写入，不经过这里；其他字段的修改不触发刷新）"""
+    if not raw and _feedback(instance) != getattr(instance, '_previous_feedback', (False, None)):
+        _interaction_changed(instance.user_id, instance.car_id)
+
+
+@receiver(post_save, sender=Transaction)
+def car_chat_started(sender, instance, created=False, raw=False, **kwargs):
+    """买家发起车辆咨询时创建交易并关联到交易聊天室（聊天室每条消息都会保存，不监听聊天室）"""
+    if created and not raw:
+        _interaction_changed(instance.buyer_id, instance.car_id)
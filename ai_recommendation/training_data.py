@@ -0,0 +1,272 @@
+"""AI 训练数据的分块处理
+
+AITrainingData 中未处理的记录按 id 做键集分块（id > 上一块的最大 id，走
+ai_training_unprocessed_idx 部分索引），主进程只读取每块的 id 边界，交给工作
+进程：工作进程读取该区间内未处理的记录，按 data_type 分组交给注册的处理函数，
+把得到的特征列写成压缩的 .npz 文件，最后用一条 UPDATE 把本块记录标记为已处理。
+文件按本块该类型记录的 id 范围命名：
+
+    <输出目录>/<data_type>/<最小 id>-<最大 id>.npz
+
+处理函数用 @handler('类型') 注册，接收本块该类型记录的 data_content 列表，
+返回 {列名: 等长数组}；写文件时会加上 id 列。字段缺失或无法解析时浮点列记为
+NaN、整数列记为 -1，不会中断整块。
+
+任务中断后重新运行即可：已标记的块不会再读到；写完文件但未标记的块会重新处理。
+开始处理前 discard_unprocessed() 从已有文件中去掉仍未标记的记录（整个文件都是这种
+记录时删除），换了 --chunk-size 或 --types 重新运行也不会产生重复的行。内存占用只与
+块大小和进行中的块数有关。
+"""
+import os
+from datetime import date, datetime, time
+
+import numpy as np
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import artifacts
+from .models import AITrainingData
+from .pricing import FUEL_TYPES
+
+CHUNK_SIZE = 1000
+OUTPUT_NAME = 'training_data'
+
+# user_behavior 的行为类型，输出为下标
+ACTIONS = ('view', 'click', 'favorite', 'chat', 'purchase')
+
+HANDLERS = {}
+
+
+def handler(data_type):
+    """注册 data_type 的处理函数"""
+    def register(function):
+        HANDLERS[data_type] = function
+        return function
+    return register
+
+
+def default_output():
+    return os.path.join(artifacts.root(), OUTPUT_NAME)
+
+
+def chunks(data_types, chunk_size=CHUNK_SIZE, start_id=0):
+    """逐块产生未处理记录的 id 闭区间 (first, last)"""
+    last_id = start_id
+    while True:
+        ids = list(
+            AITrainingData.objects.filter(is_processed=False, data_type__in=data_types, id__gt=last_id)
+            .order_by('id').values_list('id', flat=True)[:chunk_size]
+        )
+        if not ids:
+            return
+        last_id = ids[-1]
+        yield ids[0], last_id
+
+
+def process_chunk(bounds, data_types, output):
+    """处理 [first, last] 内未处理的记录，返回 (first, last, {类型: 记录数})"""
+    first, last = bounds
+    rows = AITrainingData.objects.filter(
+        id__gte=first, id__lte=last, is_processed=False, data_type__in=data_types,
+    ).order_by('id').values_list('id', 'data_type', 'data_content')
+    grouped = {}
+    for row_id, data_type, content in rows:
+        ids, contents = grouped.setdefault(data_type, ([], []))
+        ids.append(row_id)
+        contents.append(content if isinstance(content, dict) else {})
+
+    for data_type, (ids, contents) in grouped.items():
+        columns = HANDLERS[data_type](contents)
+        _write(_path(output, data_type, ids), ids, columns)
+
+    processed = [row_id for ids, _ in grouped.values() for row_id in ids]
+    if processed:
+        AITrainingData.objects.filter(id__in=processed).update(is_processed=True)
+    return first, last, {data_type: len(ids) for data_type, (ids, _) in grouped.items()}
+
+
+def _path(output, data_type, ids):
+    return os.path.join(output, data_type, f'{ids[0]:012d}-{ids[-1]:012d}.npz')
+
+
+def _id_range(path):
+    """文件中记录的 id 范围；旧版文件名只有最小 id，读取 id 列"""
+    name = os.path.basename(path)[:-len('.npz')]
+    first, _, last = name.partition('-')
+    if last:
+        return int(first), int(last)
+    with np.load(path) as data:
+        ids = data['id']
+    return (int(ids.min()), int(ids.max())) if len(ids) else (int(first), int(first))
+
+
+def discard_unprocessed(output, data_types):
+    """从已有文件中去掉仍未标记为已处理的记录（它们会重新处理、写入新文件），返回受影响的文件数
+
+    在分发各块之前由主进程调用，工作进程只写新文件，不会同时改写同一个旧文件。
+    """
+    changed = 0
+    for data_type in data_types:
+        directory = os.path.join(output, data_type)
+        start = AITrainingData.objects.filter(
+            is_processed=False, data_type=data_type).order_by('id').values_list('id', flat=True).first()
+        if start is None or not os.path.isdir(directory):
+            continue
+        for name in sorted(os.listdir(directory)):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(directory, name)
+            first, last = _id_range(path)
+            if last < start:
+                continue
+            stale = AITrainingData.objects.filter(
+                is_processed=False, data_type=data_type, id__gte=first, id__lte=last,
+            ).values_list('id', flat=True)
+            stale = np.fromiter(stale.iterator(), dtype=np.int64)
+            if not len(stale):
+                continue
+            with np.load(path) as data:
+                columns = {key: data[key] for key in data.files}
+            ids = columns.pop('id')
+            keep = ~np.isin(ids, stale)
+            ids = ids[keep].tolist()
+            if ids:
+                _write(_path(output, data_type, ids), ids, {key: values[keep] for key, values in columns.items()})
+            if not ids or _path(output, data_type, ids) != path:
+                os.remove(path)
+            changed += 1
+    return changed
+
+
+def _write(path, ids, columns):
+    """先写临时文件再替换，重新处理同一块时覆盖旧文件"""
+    for name, values in columns.items():
+        if len(values) != len(ids):
+            raise ValueError(f'{os.path.basename(os.path.dirname(path))} 处理结果的 {name} 列长度不一致')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as fh:
+        np.savez_compressed(fh, id=np.array(ids, dtype=np.int64), **columns)
+    os.replace(temporary, path)
+
+
+def _value(content, key):
+    value = content.get(key)
+    return None if value is None or value == '' else value
+
+
+def _floats(contents, key):
+    values = np.full(len(contents), np.nan)
+    for i, content in enumerate(contents):
+        try:
+            values[i] = float(_value(content, key))
+        except (TypeError, ValueError):
+            pass
+    return values
+
+
+def _ints(contents, key):
+    values = np.full(len(contents), -1, dtype=np.int64)
+    for i, content in enumerate(contents):
+        try:
+            values[i] = int(_value(content, key))
+        except (TypeError, ValueError, OverflowError):
+            pass
+    return values
+
+
+def _codes(contents, key, choices):
+    """取值在 choices 中的下标，其他为 -1"""
+    positions = {choice: code for code, choice in enumerate(choices)}
+    values = (content.get(key) for content in contents)
+    return np.array([positions.get(value, -1) if isinstance(value, str) else -1 for value in values], dtype=np.int8)
+
+
+def _timestamps(contents, key):
+    """ISO 日期或时间转为 Unix 秒，无法解析为 -1"""
+    values = np.full(len(contents), -1, dtype=np.int64)
+    for i, content in enumerate(contents):
+        value = _value(content, key)
+        if not isinstance(value, str):
+            continue
+        try:
+            moment = parse_datetime(value)
+            if moment is None:
+                day = parse_date(value)
+                moment = datetime.combine(day, time()) if isinstance(day, date) else None
+        except ValueError:
+            moment = None
+        if moment is None:
+            continue
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        values[i] = int(moment.timestamp())
+    return values
+
+
+def _ratio(numerator, denominator):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator > 0, numerator / denominator, np.nan)
+
+
+def _log(values):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values >= 0, np.log1p(values), np.nan)
+
+
+@handler('car_features')
+def car_features(contents):
+    """车辆特征：与价格模型相同的数值特征，外加折旧率"""
+    year = _floats(contents, 'year')
+    original_price = _floats(contents, 'original_price')
+    current_price = _floats(contents, 'current_price')
+    mileage = _floats(contents, 'mileage')
+    return {
+        'car_id': _ints(contents, 'car_id'),
+        'brand_id': _ints(contents, 'brand_id'),
+        'car_type_id': _ints(contents, 'car_type_id'),
+        'fuel_type': _codes(contents, 'fuel_type', FUEL_TYPES),
+        'age': np.maximum(date.today().year - year, 0),
+        'log_mileage': _log(mileage),
+        'engine_capacity': _floats(contents, 'engine_capacity'),
+        'log_original_price': _log(original_price),
+        'log_current_price': _log(current_price),
+        'retained_value': _ratio(current_price, original_price),
+    }
+
+
+@handler('price_history')
+def price_history(contents):
+    """价格历史：单次调价及相对上一次价格的变动比例"""
+    price = _floats(contents, 'price')
+    return {
+        'car_id': _ints(contents, 'car_id'),
+        'recorded_at': _timestamps(contents, 'recorded_at'),
+        'price': price,
+        'change': _ratio(price, _floats(contents, 'previous_price')) - 1,
+    }
+
+
+@handler('user_behavior')
+def user_behavior(contents):
+    """用户行为：用户、车辆、行为类型和时间"""
+    return {
+        'user_id': _ints(contents, 'user_id'),
+        'car_id': _ints(contents, 'car_id'),
+        'action': _codes(contents, 'action', ACTIONS),
+        'occurred_at': _timestamps(contents, 'timestamp'),
+        'duration': _floats(contents, 'duration'),
+    }
+
+
+@handler('market_data')
+def market_data(contents):
+    """市场数据：品牌、车型在某一周期的均价和成交量"""
+    volume = _floats(contents, 'volume')
+    return {
+        'brand_id': _ints(contents, 'brand_id'),
+        'car_type_id': _ints(contents, 'car_type_id'),
+        'period_start': _timestamps(contents, 'period'),
+        'avg_price': _floats(contents, 'avg_price'),
+        'log_volume': _log(volume),
+    }
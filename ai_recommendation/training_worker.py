@@ -0,0 +1,14 @@
+"""process_training_data 的工作进程入口
+
+与 build_worker 相同，进程池用 spawn 启动，Django 初始化之后再导入 training_data。
+"""
+import django
+
+
+def init():
+    django.setup()
+
+
+def process_chunk(bounds, data_types, output):
+    from . import training_data
+    return training_data.process_chunk(bounds, data_types, output)
@@ -5,6 +5,7 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from cars.models import Car, Brand, CarType
 from .models import UserPreference, AIRecommendation
+from . import precomputed, result_cache
 import json
 
 @login_required
@@ -75,87 +76,31 @@ def save_preferences(request):
 def get_recommendations(request):
     """获取AI推荐结果"""
     try:
+        # 偏好和在售车辆都没有变化时直接返回缓存的结果
+        data = result_cache.lookup(request.user.id)
+        if data is not None:
+            return JsonResponse(data)
+        
         # 获取用户偏好
         try:
             user_preference = UserPreference.objects.get(user=request.user)
         except UserPreference.DoesNotExist:
             return JsonResponse({'status': 'error', 'message': '请先设置偏好'})
         
-        # 获取所有已审核的车辆
-        cars = Car.objects.filter(status='approved')
-        
-        # 根据偏好筛选车辆
-        filtered_cars = []
-        
-        for car in cars:
-            # 计算匹配度
-            match_score = 0
-            reasons = []
-            
-            # 品牌匹配
-            if user_preference.preferred_brands.filter(id=car.brand.id).exists():
-                match_score += 30
-                reasons.append('符合您的品牌偏好')
-            
-            # 车型匹配
-            if user_preference.preferred_types.filter(id=car.car_type.id).exists():
-                match_score += 25
-                reasons.append('符合您的车型偏好')
-            
-            # 年份匹配（过滤掉不合理的年份）
-            if car.year >= user_preference.min_year and car.year <= 2024:
-                match_score += 20
-                reasons.append('年份符合要求')
-            
-            # 里程匹配（将公里转换为万公里进行比较）
-            car_mileage_wan = float(car.mileage) / 10000  # 转换为万公里
-            if car_mileage_wan <= float(user_preference.max_mileage):
-                match_score += 15
-                reasons.append('里程数在可接受范围内')
-            
-            # 预算匹配（处理价格范围）
-            budget_min, budget_max = user_preference.budget_range.split('-')
-            budget_min = float(budget_min) if budget_min != '50+' else 50
-            budget_max = float(budget_max) if budget_max != '+' else float('inf')
-            
-            # 将价格转换为万元进行比较
-            car_price_wan = float(car.current_price) / 10000
-            
-            if budget_min <= car_price_wan <= budget_max:
-                match_score += 10
-                reasons.append('价格在预算范围内')
-            
-            # 如果没有任何匹配，给予基础分
-            if match_score == 0:
-                match_score = 10  # 基础推荐分
-                reasons.append('为您推荐的热门车辆')
-            
-            # 降低匹配度要求，显示更多车辆
-            if match_score >= 20:  # 降低到20分就显示
-                filtered_cars.append({
-                    'car': car,
-                    'match_score': match_score,
-                    'reasons': reasons
-                })
-        
-        # 按匹配度排序
-        filtered_cars.sort(key=lambda x: x['match_score'], reverse=True)
+        # 优先读取预先计算的结果（build_recommendations 或之前的在线计算写入）
+        results = precomputed.load(user_preference)
+        if results is None:
+            # 在已审核车辆的列式索引上向量化打分，取匹配度最高的 6 辆，并写回推荐记录
+            scored, versions = result_cache.recommend(user_preference)
+            precomputed.save([(user_preference.id, request.user.id, scored, versions)])
+            cars = Car.objects.select_related('brand').in_bulk([car_id for car_id, _, _ in scored])
+            results = [(cars[car_id], score, reasons) for car_id, score, reasons in scored if car_id in cars]
+        else:
+            versions = user_preference.recommendation_versions
         
         # 准备推荐结果
         recommendations = []
-        for item in filtered_cars[:6]:  # 最多显示6个推荐
-            car = item['car']
-            
-            # 创建推荐记录
-            recommendation, created = AIRecommendation.objects.get_or_create(
-                user=request.user,
-                car=car,
-                defaults={
-                    'recommendation_reason': '，'.join(item['reasons']),
-                    'match_score': item['match_score']
-                }
-            )
-            
+        for car, score, reasons in results:
             # 将价格转换为万元显示
             car_price_wan = float(car.current_price) / 10000
             
@@ -166,16 +111,18 @@ def get_recommendations(request):
                 'year': car.year,
                 'mileage': f"{float(car.mileage) / 10000:.1f}",  # 显示为万公里
                 'price': f"{car_price_wan:.1f}",  # 显示为万元
-                'matchScore': item['match_score'],
-                'reason': '，'.join(item['reasons']),
+                'matchScore': score,
+                'reason': '，'.join(reasons),
                 'main_image': car.main_image.url if car.main_image else '/static/images/default-car.svg'
             })
         
-        return JsonResponse({
+        data = {
             'status': 'success',
             'recommendations': recommendations,
             'total_count': len(recommendations)
-        })
+        }
+        result_cache.store(request.user.id, versions, data)
+        return JsonResponse(data)
         
     except Exception as e:
         return JsonResponse({'status': 'error', 'message': str(e)})
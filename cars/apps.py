@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CarsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cars'
-    verbose_name = '车辆管理'
\ No newline at end of file
+    verbose_name = '车辆管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,103 @@
+"""车辆卡片缓存
+
+车辆列表、我的收藏、车辆管理三个页面都会渲染车辆摘要（图片、品牌车型、
+年份里程、价格）。这里把摘要按 (样式, 车辆) 缓存，整页的卡片与所需版本号
+用一次 cache.get_many 取回，只渲染未命中的卡片，再用一次 set_many 写回。
+
+缓存项中记录生成时的版本号（单车版本、品牌表、车型表），读取时与当前版本
+比对，不一致即视为未命中，因此不需要先单独查询版本号。
+
+各页面不同的按钮等内容不进缓存，由模板标签 car_card 填入卡片中的占位标记。
+"""
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+
+from . import versioning
+
+CACHE_TIMEOUT = 60 * 60 * 24
+
+# 样式 -> 模板
+TEMPLATES = {
+    'card': 'cars/car_card.html',
+    'row': 'cars/car_card_row.html',
+}
+
+# 卡片中页面自定义内容的占位标记
+SLOT_MARKER = '<!-- car-card-slot -->'
+
+
+class Cards(dict):
+    """{车辆 id: html}，记录样式以便补渲染不在其中的车辆"""
+
+    def __init__(self, variant):
+        super().__init__()
+        self.variant = variant
+
+    def get_card(self, car):
+        if car.pk not in self:
+            self.update(render_cards([car], self.variant))
+        return self[car.pk]
+
+
+def _cache_key(variant, car_id):
+    return f'car_card:{variant}:{car_id}'
+
+
+def _first_image(car):
+    """图片按主键取第一张，使用预取结果，不再单独查询"""
+    return min(car.images.all(), key=lambda image: image.pk, default=None)
+
+
+def _render(car, variant):
+    return render_to_string(TEMPLATES[variant], {
+        'car': car,
+        'image': _first_image(car),
+        'slot_marker': SLOT_MARKER,
+    })
+
+
+def render_cards(cars, variant='card'):
+    """批量取卡片片段，返回 {车辆 id: html}
+
+    cars 需 select_related brand、car_type；未命中的卡片渲染前统一预取图片。
+    """
+    cars = list(cars)
+    cards = Cards(variant)
+    if not cars:
+        return cards
+    table_keys = [versioning.version_key(versioning.BRAND), versioning.version_key(versioning.CAR_TYPE)]
+    version_keys = {car.pk: versioning.object_version_key(versioning.CAR, car.pk) for car in cars}
+    card_keys = {car.pk: _cache_key(variant, car.pk) for car in cars}
+    found = cache.get_many([*table_keys, *version_keys.values(), *card_keys.values()])
+
+    brand_version, type_version = (
+        found.get(key) if key in found else versioning.get_version(name)
+        for key, name in zip(table_keys, (versioning.BRAND, versioning.CAR_TYPE))
+    )
+
+    misses = []
+    for car in cars:
+        car_version = found.get(version_keys[car.pk])
+        if car_version is None:
+            car_version = versioning.get_object_version(versioning.CAR, car.pk)
+        version = (car_version, brand_version, type_version)
+        entry = found.get(card_keys[car.pk])
+        if entry is not None and entry['version'] == version:
+            cards[car.pk] = entry['html']
+        else:
+            misses.append((car, version))
+
+    if misses:
+        prefetch_related_objects([car for car, _ in misses], 'images')
+        fresh = {}
+        for car, version in misses:
+            html = _render(car, variant)
+            cards[car.pk] = html
+            fresh[card_keys[car.pk]] = {'version': version, 'html': html}
+        cache.set_many(fresh, CACHE_TIMEOUT)
+    return cards
+
+
+def fill_slot(html, content):
+    return html.replace(SLOT_MARKER, content, 1)
@@ -0,0 +1,342 @@
+"""已审核车辆的进程内列式索引
+
+把已审核车辆的数值/分类字段保存为 NumPy 数组，筛选、排序、取前 K 条
+全部用向量化掩码完成，不访问数据库。
+
+一致性：
+- 查询拿到的 CatalogSnapshot 不可变，更新时生成新快照并原子替换引用，
+  同一请求内始终看到一致的数据；
+- 本进程内的保存/删除通过 cars.signals 在事务提交后增量应用；
+- 其他进程的修改通过车辆版本号（cars.versioning）发现，按 updated_at
+  增量拉取；删除以及 QuerySet.update() 这类不触发信号、不更新 updated_at
+  的修改，由定期全量重建兜底。
+
+增量更新写入一个小的 delta 区，并在基础数组上用 alive 掩码标记旧行，
+delta 超过阈值时再合并成新的基础数组，避免每次更新都复制全部列。
+
+    from cars.catalog_index import catalog_index
+
+    snapshot = catalog_index.snapshot()
+    ids = snapshot.query(brand_id=3, current_price__lte=100000, order_by='-created_at', limit=24)
+"""
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.db import transaction
+
+from . import versioning
+from .models import Car
+
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+FIELDS = (
+    'id', 'brand_id', 'car_type_id', 'year', 'mileage', 'current_price',
+    'fuel_type', 'transmission', 'created_at',
+)
+DTYPES = {
+    'id': np.int64,
+    'brand_id': np.int64,
+    'car_type_id': np.int64,
+    'year': np.int32,
+    'mileage': np.float64,
+    'current_price': np.float64,
+    'fuel_type': np.int8,
+    'transmission': np.int8,
+    'created_at': np.int64,  # 自 1970 年起的微秒数
+}
+
+# 分类字段编码为 choices 中的下标
+CODES = {
+    'fuel_type': {value: code for code, (value, _) in enumerate(Car.FUEL_TYPE_CHOICES)},
+    'transmission': {value: code for code, (value, _) in enumerate(Car.TRANSMISSION_CHOICES)},
+}
+
+LOAD_CHUNK_SIZE = 5000
+# 检查其他进程修改的最小间隔（秒）
+REFRESH_INTERVAL = 1.0
+# 全量重建间隔（秒），用于兜底删除和批量 UPDATE
+FULL_RELOAD_INTERVAL = 600
+# delta 区行数超过 max(该值, 基础行数的 1%) 时合并
+MIN_COMPACT_ROWS = 1024
+
+_OPERATORS = {
+    'exact': np.equal,
+    'gt': np.greater,
+    'gte': np.greater_equal,
+    'lt': np.less,
+    'lte': np.less_equal,
+}
+
+
+def encode_datetime(value):
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def encode_value(field, value):
+    """把查询值转换为列中的存储形式"""
+    if field in CODES:
+        return CODES[field].get(value, -1)
+    if field == 'created_at' and isinstance(value, datetime):
+        return encode_datetime(value)
+    return value
+
+
+def encode_row(values):
+    """values 为按 FIELDS 顺序的原始字段值"""
+    row = dict(zip(FIELDS, values))
+    for field in CODES:
+        row[field] = encode_value(field, row[field])
+    row['created_at'] = encode_datetime(row['created_at'])
+    row['mileage'] = float(row['mileage'])
+    row['current_price'] = float(row['current_price'])
+    return tuple(row[field] for field in FIELDS)
+
+
+class Columns:
+    """一组等长列"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+        self._recent_order = None
+
+    @classmethod
+    def empty(cls):
+        return cls({field: np.empty(0, dtype=DTYPES[field]) for field in FIELDS})
+
+    @classmethod
+    def from_rows(cls, rows):
+        if not rows:
+            return cls.empty()
+        transposed = list(zip(*rows))
+        return cls({
+            field: np.asarray(transposed[i], dtype=DTYPES[field]) for i, field in enumerate(FIELDS)
+        })
+
+    def __len__(self):
+        return len(self.arrays['id'])
+
+    def __getitem__(self, field):
+        return self.arrays[field]
+
+    def take(self, selector):
+        return Columns({field: array[selector] for field, array in self.arrays.items()})
+
+    def concat(self, other):
+        return Columns({
+            field: np.concatenate([array, other.arrays[field]]) for field, array in self.arrays.items()
+        })
+
+    def sorted_by_id(self):
+        return self.take(np.argsort(self.arrays['id'], kind='stable'))
+
+    def recent_order(self):
+        """按 (created_at, id) 倒序的行号，首次使用时计算并缓存"""
+        if self._recent_order is None:
+            self._recent_order = np.lexsort((-self.arrays['id'], -self.arrays['created_at']))
+        return self._recent_order
+
+
+def _parse_lookup(lookup):
+    field, _, op = lookup.partition('__')
+    op = op or 'exact'
+    if field not in DTYPES or (op not in _OPERATORS and op != 'in'):
+        raise ValueError(f'不支持的查询条件: {lookup}')
+    return field, op
+
+
+def _mask(columns, filters):
+    mask = np.ones(len(columns), dtype=bool)
+    for lookup, value in filters.items():
+        field, op = _parse_lookup(lookup)
+        if op == 'in':
+            codes = [encode_value(field, v) for v in value]
+            mask &= np.isin(columns[field], codes)
+        else:
+            mask &= _OPERATORS[op](columns[field], encode_value(field, value))
+    return mask
+
+
+class CatalogSnapshot:
+    """不可变的索引快照：基础列 + alive 掩码 + delta 列"""
+
+    def __init__(self, base, alive=None, delta=None, version=None):
+        self.base = base
+        self.alive = alive if alive is not None else np.ones(len(base), dtype=bool)
+        self.delta = delta if delta is not None else Columns.empty()
+        self.version = version
+
+    def __len__(self):
+        return self.count()
+
+    def _masks(self, filters):
+        """(列, 掩码) 列表；掩码为 None 表示整组列都满足条件"""
+        if filters:
+            parts = [(self.base, self.alive & _mask(self.base, filters))]
+        else:
+            parts = [(self.base, None if self.alive.all() else self.alive)]
+        if len(self.delta):
+            parts.append((self.delta, _mask(self.delta, filters) if filters else None))
+        return parts
+
+    def select(self, fields=FIELDS, **filters):
+        """返回满足条件的行，只取 fields 中的列"""
+        parts = self._masks(filters)
+        return Columns({
+            field: np.concatenate([
+                columns[field] if mask is None else columns[field][mask] for columns, mask in parts
+            ])
+            for field in fields
+        })
+
+    def count(self, **filters):
+        return sum(
+            len(columns) if mask is None else int(np.count_nonzero(mask))
+            for columns, mask in self._masks(filters)
+        )
+
+    def query(self, order_by='-created_at', limit=None, **filters):
+        """按条件筛选、排序并取前 limit 条，返回车辆 id 数组
+
+        条件写法同 Django：brand_id=3、current_price__lte=100000、
+        fuel_type__in=['gasoline', 'hybrid']。排序相同时按 id 同向排序。
+        """
+        descending = order_by.startswith('-')
+        field = order_by.lstrip('-')
+        if not filters and order_by == '-created_at' and limit is not None:
+            return self._latest(limit)
+        selected = self.select(fields=('id', field) if field != 'id' else ('id',), **filters)
+        keys = selected[field]
+        ids = selected['id']
+        if descending:
+            keys, ids = -keys, -ids
+        if limit is not None and limit < len(keys):
+            # 先用 argpartition 取出前 limit 条，再只对这部分排序
+            candidates = np.argpartition(keys, limit - 1)[:limit]
+            order = candidates[np.lexsort((ids[candidates], keys[candidates]))]
+        else:
+            order = np.lexsort((ids, keys))
+        return selected['id'][order]
+
+    def _latest(self, limit):
+        """无筛选条件的最新 limit 条：沿预排序的行号跳过已失效行，无需全量排序"""
+        dead = len(self.alive) - int(np.count_nonzero(self.alive))
+        order = self.base.recent_order()[:limit + dead]
+        order = order[self.alive[order]][:limit]
+        ids = self.base['id'][order]
+        if not len(self.delta):
+            return ids
+        keys = np.concatenate([self.base['created_at'][order], self.delta['created_at']])
+        ids = np.concatenate([ids, self.delta['id']])
+        return ids[np.lexsort((-ids, -keys))][:limit]
+
+    def with_rows(self, rows, removed_ids=()):
+        """返回应用了新增/更新行与删除的新快照"""
+        rows = list(rows)
+        touched = np.asarray([row[0] for row in rows] + list(removed_ids), dtype=np.int64)
+        alive = self.alive
+        delta = self.delta
+        if len(touched):
+            # 基础列按 id 有序，二分定位被更新或删除的旧行
+            base_ids = self.base['id']
+            positions = np.searchsorted(base_ids, touched)
+            in_range = positions < len(base_ids)
+            positions = positions[in_range]
+            hits = positions[base_ids[positions] == touched[in_range]]
+            if len(hits):
+                alive = alive.copy()
+                alive[hits] = False
+            if len(delta):
+                delta = delta.take(~np.isin(delta['id'], touched))
+        if rows:
+            delta = delta.concat(Columns.from_rows(rows))
+        snapshot = CatalogSnapshot(self.base, alive, delta, self.version)
+        if len(delta) > max(MIN_COMPACT_ROWS, len(self.base) // 100):
+            snapshot = snapshot.compacted()
+        return snapshot
+
+    def compacted(self):
+        """把 delta 合并进基础列"""
+        base = self.base.take(self.alive).concat(self.delta).sorted_by_id()
+        return CatalogSnapshot(base, version=self.version)
+
+
+class CatalogIndex:
+    """每个工作进程一份的索引，负责加载、增量更新和原子替换快照"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._high_water = None
+        self._checked_at = 0.0
+        self._loaded_at = 0.0
+
+    def snapshot(self):
+        """当前快照，必要时先加载或增量刷新"""
+        now = time.monotonic()
+        if self._snapshot is None or now - self._loaded_at > FULL_RELOAD_INTERVAL:
+            self.load()
+        elif now - self._checked_at > REFRESH_INTERVAL:
+            self._checked_at = now
+            if versioning.get_version(versioning.CAR) != self._snapshot.version:
+                self.refresh()
+        return self._snapshot
+
+    def load(self):
+        """从数据库全量构建"""
+        version = versioning.get_version(versioning.CAR)
+        queryset = Car.objects.filter(status='approved').order_by('id').values_list(*FIELDS)
+        rows = [encode_row(values) for values in queryset.iterator(chunk_size=LOAD_CHUNK_SIZE)]
+        high_water = Car.objects.order_by('-updated_at').values_list('updated_at', flat=True).first()
+        snapshot = CatalogSnapshot(Columns.from_rows(rows), version=version)
+        with self._lock:
+            self._snapshot = snapshot
+            self._high_water = high_water
+            self._loaded_at = self._checked_at = time.monotonic()
+
+    def refresh(self):
+        """拉取 updated_at 之后变化的车辆（包括离开已审核状态的）"""
+        if self._snapshot is None:
+            return
+        version = versioning.get_version(versioning.CAR)
+        changed = Car.objects.order_by('updated_at').values_list('status', 'updated_at', *FIELDS)
+        if self._high_water is not None:
+            changed = changed.filter(updated_at__gte=self._high_water)
+        rows, removed, high_water = [], [], self._high_water
+        for status, updated_at, *values in changed.iterator(chunk_size=LOAD_CHUNK_SIZE):
+            if status == 'approved':
+                rows.append(encode_row(values))
+            else:
+                removed.append(values[0])
+            high_water = updated_at
+        with self._lock:
+            snapshot = self._snapshot.with_rows(rows, removed)
+            snapshot.version = version
+            self._snapshot = snapshot
+            self._high_water = high_water
+
+    def apply(self, car):
+        """应用本进程内的车辆保存（信号调用），事务提交后生效，回滚的修改不可见"""
+        if car.status == 'approved':
+            rows, removed = [encode_row(tuple(getattr(car, field) for field in FIELDS))], []
+        else:
+            rows, removed = [], [car.pk]
+        transaction.on_commit(lambda: self._apply_rows(rows, removed))
+
+    def remove(self, car_id):
+        """应用本进程内的车辆删除（信号调用），事务提交后生效"""
+        transaction.on_commit(lambda: self._apply_rows([], [car_id]))
+
+    def _apply_rows(self, rows, removed):
+        if self._snapshot is None:
+            return
+        with self._lock:
+            self._snapshot = self._snapshot.with_rows(rows, removed)
+
+    def clear(self):
+        with self._lock:
+            self._snapshot = None
+
+
+catalog_index = CatalogIndex()
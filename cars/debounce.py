@@ -0,0 +1,82 @@
+"""事务提交后合并执行的批量任务
+
+相似车辆、协同过滤的增量刷新和保存的搜索匹配都由信号触发，短时间内的多次变化
+合并成一次批量调用：
+
+    refresher = Debounced(refresh, delay=2.0, description='刷新相似车辆')
+    refresher.schedule([car_id])          # 事务提交后加入待执行集合
+
+Web 进程（used_car_system.wsgi / asgi 调用 run_in_background()）把 delay 秒内的
+变化合并后在后台定时器线程中执行，请求不等待；进程正常退出时执行尚未到期的批次。
+其他进程（管理命令、测试）在事务提交后直接执行，命令退出前全部完成，不依赖
+随进程结束的后台线程。
+"""
+import atexit
+import logging
+import threading
+
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+_background = False
+
+
+def run_in_background():
+    """Web 进程入口调用：此后的批次延迟合并，在后台线程执行"""
+    global _background
+    _background = True
+
+
+class Debounced:
+    """function 的参数为若干 id 列表，schedule() 的参数与之一一对应"""
+
+    def __init__(self, function, delay, description, groups=1):
+        self.function = function
+        self.delay = delay
+        self.description = description
+        self._pending = [set() for _ in range(groups)]
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def schedule(self, *groups):
+        """事务提交后把各组 id 加入待执行集合"""
+        groups = [list(group) for group in groups]
+        transaction.on_commit(lambda: self._enqueue(groups))
+
+    def _enqueue(self, groups):
+        if not _background:
+            self._call(groups)
+            return
+        with self._lock:
+            for pending, group in zip(self._pending, groups):
+                pending.update(group)
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self._run_timer)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _run_timer(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def flush(self):
+        """立即执行已合并的批次"""
+        with self._lock:
+            groups = [list(pending) for pending in self._pending]
+            for pending in self._pending:
+                pending.clear()
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if any(groups):
+            self._call(groups)
+
+    def _call(self, groups):
+        try:
+            self.function(*groups)
+        except Exception:
+            logger.exception('%s失败: %s', self.description, groups[-1])
@@ -0,0 +1,84 @@
+"""车辆详情缓存
+
+每辆车缓存一份序列化数据和渲染好的详情片段，两者存在同一个缓存项里，
+键中带该车的版本号及品牌、车型表的版本号。车辆本身、图片、特性或卖家资料
+变化时由 cars.signals 递增单车版本号，旧缓存自然失效。
+
+片段中与访问者相关的部分（收藏状态、联系卖家按钮）不进缓存：片段里留一个
+占位标记，视图按当前用户单独渲染后替换进去，缓存内容对所有访客通用。
+"""
+from django.core.cache import cache
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from . import thumbnails, versioning
+from .models import Car
+
+CACHE_TIMEOUT = 60 * 60
+
+# 片段中访问者操作区的占位标记
+ACTIONS_MARKER = '<!-- car-detail-actions -->'
+
+
+def _cache_key(car_id):
+    car_version = versioning.get_object_version(versioning.CAR, car_id)
+    brand_version, type_version = versioning.get_versions(versioning.BRAND, versioning.CAR_TYPE)
+    return f'car_detail:{car_id}:{car_version}:{brand_version}:{type_version}'
+
+
+def serialize_car(car):
+    """详情数据；car 需预取 brand、car_type、seller、images、features"""
+    return {
+        'id': car.id,
+        'brand': car.brand.name,
+        'car_type': car.car_type.name,
+        'model': car.model,
+        'year': car.year,
+        'mileage': car.mileage,
+        'color': car.color,
+        'transmission': car.get_transmission_display(),
+        'fuel_type': car.get_fuel_type_display(),
+        'engine_capacity': car.engine_capacity,
+        'original_price': car.original_price,
+        'current_price': car.current_price,
+        'status': car.status,
+        'description': car.description,
+        'main_image': thumbnails.image_url(car.main_image, car.main_image_variants, 1024),
+        'images': [
+            thumbnails.image_urls(image.image, image.image_variants, 1024)
+            for image in car.images.all()
+        ],
+        'features': [
+            {'name': feature.feature_name, 'value': feature.feature_value}
+            for feature in car.features.all()
+        ],
+        'seller': {
+            'id': car.seller_id,
+            'username': car.seller.username,
+        },
+        'created_at': car.created_at.isoformat(),
+    }
+
+
+def _build(car_id):
+    car = get_object_or_404(
+        Car.objects.select_related('brand', 'car_type', 'seller').prefetch_related('images', 'features'),
+        id=car_id,
+    )
+    html = render_to_string('cars/car_detail_body.html', {'car': car, 'actions_marker': ACTIONS_MARKER})
+    return {'data': serialize_car(car), 'html': html}
+
+
+def get_car_detail(car_id):
+    """返回 {'data': 序列化数据, 'html': 详情片段}；车辆不存在时抛出 Http404"""
+    key = _cache_key(car_id)
+    entry = cache.get(key)
+    if entry is None:
+        entry = _build(car_id)
+        cache.set(key, entry, CACHE_TIMEOUT)
+    return entry
+
+
+def stitch(html, actions_html):
+    """把访问者相关的操作区填入缓存的片段"""
+    return html.replace(ACTIONS_MARKER, actions_html, 1)
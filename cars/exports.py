@@ -0,0 +1,210 @@
+"""车辆、订单数据流式导出
+
+查询集通过 iterator(chunk_size=...) 分块读取，逐行编码成 CSV 或 JSON Lines
+后交给 StreamingHttpResponse 或写入文件，内存占用与总行数无关。导出视图和
+管理命令（export_cars、export_transactions）共用这里的筛选、编码逻辑和
+ExportCommand；列定义随模型放在各自应用中（订单见 transactions.exports）。
+"""
+import csv
+import datetime
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+CHUNK_SIZE = 2000
+
+# 每次输出的行数
+BATCH_LINES = 200
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+# (列名, 查询字段)，关联字段用 __ 访问，导出时以 JOIN 一并取出
+CAR_COLUMNS = (
+    ('id', 'id'),
+    ('brand', 'brand__name'),
+    ('car_type', 'car_type__name'),
+    ('model', 'model'),
+    ('year', 'year'),
+    ('mileage', 'mileage'),
+    ('color', 'color'),
+    ('transmission', 'transmission'),
+    ('fuel_type', 'fuel_type'),
+    ('engine_capacity', 'engine_capacity'),
+    ('original_price', 'original_price'),
+    ('current_price', 'current_price'),
+    ('ai_suggested_price', 'ai_suggested_price'),
+    ('status', 'status'),
+    ('seller', 'seller__username'),
+    ('created_at', 'created_at'),
+    ('updated_at', 'updated_at'),
+    ('approved_at', 'approved_at'),
+)
+
+class ExportError(ValueError):
+    """导出参数不合法"""
+
+
+def can_export(user):
+    return user.is_authenticated and (user.is_staff or user.user_type == 'admin')
+
+
+def _day_start(value, name):
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ExportError(f'{name} 格式应为 YYYY-MM-DD')
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def filter_queryset(queryset, status=None, date_from=None, date_to=None, statuses=()):
+    """按状态和创建日期区间（含两端）过滤
+
+    日期转换为时间范围比较，不对 created_at 套函数，可以使用索引。
+    """
+    if status:
+        if status not in statuses:
+            raise ExportError(f'未知状态: {status}')
+        queryset = queryset.filter(status=status)
+    start = _day_start(date_from, 'date_from')
+    end = _day_start(date_to, 'date_to')
+    if start is not None:
+        queryset = queryset.filter(created_at__gte=start)
+    if end is not None:
+        queryset = queryset.filter(created_at__lt=end + datetime.timedelta(days=1))
+    return queryset
+
+
+def _jsonable(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if value is None or isinstance(value, (int, str)):
+        return value
+    # Decimal 等转为字符串，避免浮点误差
+    return str(value)
+
+
+class _Echo:
+    """csv.writer 的伪文件，write() 直接返回写入的内容"""
+
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, columns, chunk_size=CHUNK_SIZE):
+    """分块遍历查询集，按列定义逐行取值
+
+    用 values_list 只取导出列，关联表通过 JOIN 在同一条查询中取出，
+    不构造模型实例。
+    """
+    rows = queryset.values_list(*(lookup for _, lookup in columns))
+    for row in rows.iterator(chunk_size=chunk_size):
+        yield [_jsonable(value) for value in row]
+
+
+def _batched(lines, size=BATCH_LINES):
+    """把多行拼成一块输出，减少响应分块和写入次数"""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= size:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+def iter_csv(queryset, columns, chunk_size=CHUNK_SIZE):
+    # 表头单独先输出，客户端立即收到首字节；带 BOM，Excel 打开中文不乱码
+    writer = csv.writer(_Echo())
+    yield '\ufeff' + writer.writerow([name for name, _ in columns])
+    yield from _batched(writer.writerow(row) for row in iter_rows(queryset, columns, chunk_size))
+
+
+def iter_jsonl(queryset, columns, chunk_size=CHUNK_SIZE):
+    names = [name for name, _ in columns]
+    yield from _batched(
+        json.dumps(dict(zip(names, row)), ensure_ascii=False) + '\n'
+        for row in iter_rows(queryset, columns, chunk_size)
+    )
+
+
+def iter_export(queryset, columns, fmt, chunk_size=CHUNK_SIZE):
+    if fmt not in FORMATS:
+        raise ExportError(f'不支持的导出格式: {fmt}')
+    encoder = iter_csv if fmt == 'csv' else iter_jsonl
+    return encoder(queryset, columns, chunk_size)
+
+
+def streaming_response(queryset, columns, fmt, filename):
+    """以附件形式流式返回导出内容"""
+    response = StreamingHttpResponse(iter_export(queryset, columns, fmt), content_type=FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    # 禁止反向代理缓冲，首字节尽快到达客户端
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def export_response(request, queryset, columns, statuses, filename):
+    """导出视图的公共处理：权限、筛选参数（status、date_from、date_to、format）"""
+    if not can_export(request.user):
+        return JsonResponse({'error': '仅管理员可以导出数据'}, status=403)
+    params = request.GET
+    fmt = params.get('format', 'csv')
+    try:
+        if fmt not in FORMATS:
+            raise ExportError(f'不支持的导出格式: {fmt}')
+        queryset = filter_queryset(queryset, params.get('status'), params.get('date_from'),
+                                   params.get('date_to'), statuses)
+    except ExportError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return streaming_response(queryset.order_by('pk'), columns, fmt, filename)
+
+
+class ExportCommand(BaseCommand):
+    """导出管理命令的基类，子类提供 columns 和 get_queryset()"""
+    columns = ()
+
+    def get_queryset(self):
+        """返回 (查询集, 合法状态)"""
+        raise NotImplementedError
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--status', help='只导出该状态')
+        parser.add_argument('--date-from', help='创建日期起（含），YYYY-MM-DD')
+        parser.add_argument('--date-to', help='创建日期止（含），YYYY-MM-DD')
+        parser.add_argument('-o', '--output', help='输出文件，默认写到标准输出')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        queryset, statuses = self.get_queryset()
+        try:
+            queryset = filter_queryset(queryset, options['status'], options['date_from'],
+                                       options['date_to'], statuses)
+        except ExportError as e:
+            raise CommandError(e)
+
+        started = time.perf_counter()
+        output = open(options['output'], 'w', encoding='utf-8', newline='') if options['output'] else sys.stdout
+        try:
+            for block in iter_export(queryset.order_by('pk'), self.columns, options['format'],
+                                     options['chunk_size']):
+                output.write(block)
+        finally:
+            if options['output']:
+                output.close()
+
+        elapsed = time.perf_counter() - started
+        self.stderr.write(f'导出完成，用时 {elapsed:.1f}s')
@@ -0,0 +1,131 @@
+"""车辆列表分面计数
+
+每个分面按“除自身以外的已选条件”计数（选了品牌后仍能看到其他品牌的数量），
+共 4 条分组聚合查询：
+
+1. 品牌 GROUP BY
+2. 车型 GROUP BY
+3. 价格区间：一条带条件 COUNT 的聚合
+4. 燃料类型、变速箱、年份：一条三列 GROUP BY，在 Python 中分别汇总
+
+结果按筛选条件缓存，缓存键带车辆、品牌、车型的版本号，任何一张表变化即失效。
+"""
+import hashlib
+from collections import Counter
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+from . import versioning
+from .filters import PRICE_RANGES, PRICE_RANGE_LABELS, apply_car_filters, feature_params
+from .models import Brand, Car, CarType
+from .search import search_cars
+
+FACET_CACHE_TIMEOUT = 60 * 10
+
+# 参与分面计算的请求参数
+FACET_PARAMS = ('q', 'brand', 'type', 'price_range', 'min_year', 'max_mileage', 'feature')
+
+
+def _base_queryset(params, exclude=None):
+    """已审核车辆并应用除 exclude 以外的筛选条件"""
+    params = {key: value for key, value in params.items() if key != exclude}
+    cars = apply_car_filters(Car.objects.filter(status='approved'), params)
+    query = params.get('q', '').strip()
+    if query:
+        results = search_cars(cars, query)
+        if results is not None:
+            cars = results
+    return cars.order_by()
+
+
+def _price_range_q(value):
+    low, high = PRICE_RANGES[value]
+    condition = Q()
+    if low is not None:
+        condition &= Q(current_price__gte=low)
+    if high is not None:
+        condition &= Q(current_price__lte=high)
+    return condition
+
+
+def compute_facets(params):
+    """执行分组聚合，返回分面计数"""
+    params = _facet_params(params)
+
+    brand_counts = dict(
+        _base_queryset(params, exclude='brand').values_list('brand').annotate(n=Count('id'))
+    )
+    type_counts = dict(
+        _base_queryset(params, exclude='type').values_list('car_type').annotate(n=Count('id'))
+    )
+    price_counts = _base_queryset(params, exclude='price_range').aggregate(**{
+        value: Count('id', filter=_price_range_q(value)) for value in PRICE_RANGES
+    })
+
+    fuel_counts, transmission_counts, year_counts = Counter(), Counter(), Counter()
+    total = 0
+    rows = _base_queryset(params).values_list('fuel_type', 'transmission', 'year').annotate(n=Count('id'))
+    for fuel_type, transmission, year, n in rows:
+        fuel_counts[fuel_type] += n
+        transmission_counts[transmission] += n
+        year_counts[year] += n
+        total += n
+
+    brand_names = dict(Brand.objects.filter(id__in=brand_counts).values_list('id', 'name'))
+    type_names = dict(CarType.objects.filter(id__in=type_counts).values_list('id', 'name'))
+
+    return {
+        'total': total,
+        'brand': [
+            {'id': brand_id, 'name': brand_names.get(brand_id, ''), 'count': n}
+            for brand_id, n in sorted(brand_counts.items(), key=lambda item: -item[1])
+        ],
+        'car_type': [
+            {'id': type_id, 'name': type_names.get(type_id, ''), 'count': n}
+            for type_id, n in sorted(type_counts.items(), key=lambda item: -item[1])
+        ],
+        'fuel_type': [
+            {'value': value, 'label': label, 'count': fuel_counts[value]}
+            for value, label in Car.FUEL_TYPE_CHOICES if fuel_counts[value]
+        ],
+        'transmission': [
+            {'value': value, 'label': label, 'count': transmission_counts[value]}
+            for value, label in Car.TRANSMISSION_CHOICES if transmission_counts[value]
+        ],
+        'year': [
+            {'value': year, 'count': n} for year, n in sorted(year_counts.items(), reverse=True)
+        ],
+        'price_range': [
+            {'value': value, 'label': PRICE_RANGE_LABELS[value], 'count': price_counts[value]}
+            for value in PRICE_RANGES
+        ],
+    }
+
+
+def _facet_params(params):
+    """只保留参与分面的参数；feature 可重复，保留为列表"""
+    values = {key: params.get(key, '') for key in FACET_PARAMS if key != 'feature'}
+    values['feature'] = feature_params(params)
+    return values
+
+
+def _cache_key(params):
+    versions = versioning.get_versions(versioning.CAR, versioning.BRAND, versioning.CAR_TYPE)
+    params = _facet_params(params)
+    filters = '&'.join(
+        f'{key}={",".join(value) if isinstance(value, list) else value.strip()}'
+        for key, value in params.items()
+    )
+    digest = hashlib.md5(filters.encode()).hexdigest()
+    return f'car_facets:{"-".join(str(v) for v in versions)}:{digest}'
+
+
+def get_facets(params):
+    """带缓存的分面计数"""
+    key = _cache_key(params)
+    facets = cache.get(key)
+    if facets is None:
+        facets = compute_facets(params)
+        cache.set(key, facets, FACET_CACHE_TIMEOUT)
+    return facets
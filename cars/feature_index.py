@@ -0,0 +1,168 @@
+"""车辆特性倒排索引
+
+CarFeature 是自由填写的名称/值对，按“天窗:全景”筛选车辆需要连接并扫描整张特性表。
+这里把特性名称、特性值归一化后收进字典表（FeatureName、FeatureValue，整数 id），
+每个取值保存一份具有该特性的车辆 id 列表（升序 int64 数组）。多个特性的 AND 条件
+按车辆数从少到多依次求交集，结果不多时交给列表查询集按 id 过滤，否则列表查询改用
+SQL 子查询（见 cars.filters.apply_car_filters）。
+
+维护方式：
+- 发布、编辑车辆时，视图在保存特性表单集后调用 update_car()，按前后差异增删；
+- 批量导入在写入特性后调用 add_features()；
+- 车辆删除后其 id 仍留在列表中，筛选结果会再经过列表查询集过滤，不影响正确性；
+  manage.py rebuild_feature_index 全量重建时清理。
+"""
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from .models import CarFeature, FeatureName, FeatureValue
+
+DTYPE = np.dtype('<i8')
+WRITE_BATCH_SIZE = 500
+
+
+def normalize(name, value):
+    return name.strip(), value.strip()
+
+
+def decode(data):
+    return np.frombuffer(bytes(data), dtype=DTYPE)
+
+
+def encode(car_ids):
+    return np.asarray(car_ids, dtype=DTYPE).tobytes()
+
+
+def parse_term(text):
+    """'名称:值' -> (名称, 值)；格式不对时返回 None"""
+    name, sep, value = text.partition(':')
+    if not sep:
+        return None
+    name, value = normalize(name, value)
+    return (name, value) if name else None
+
+
+def car_terms(car_id):
+    """车辆当前的 (名称, 值) 集合"""
+    return {
+        normalize(name, value)
+        for name, value in CarFeature.objects.filter(car_id=car_id).values_list('feature_name', 'feature_value')
+    }
+
+
+def _intern(terms, lock=False, load_ids=True):
+    """(名称, 值) -> FeatureValue，字典中没有的先批量创建
+
+    lock 时只锁定 terms 对应的取值行；load_ids=False 时不读取车辆列表（调用方整体覆盖）。
+    """
+    names = {name for name, _ in terms}
+    FeatureName.objects.bulk_create([FeatureName(name=name) for name in names], ignore_conflicts=True)
+    name_ids = dict(FeatureName.objects.filter(name__in=names).values_list('name', 'id'))
+    FeatureValue.objects.bulk_create(
+        [FeatureValue(feature_id=name_ids[name], value=value) for name, value in terms],
+        ignore_conflicts=True,
+    )
+    feature_names = {feature_id: name for name, feature_id in name_ids.items()}
+    ordered = sorted(terms)
+    found = {}
+    # 按批取出本次涉及的取值：名称 id、取值各一个 IN 条件，多出的组合在下面排除
+    for start in range(0, len(ordered), WRITE_BATCH_SIZE):
+        batch = ordered[start:start + WRITE_BATCH_SIZE]
+        queryset = FeatureValue.objects.filter(
+            feature_id__in={name_ids[name] for name, _ in batch},
+            value__in={value for _, value in batch},
+        )
+        if not load_ids:
+            queryset = queryset.defer('car_ids')
+        if lock:
+            queryset = queryset.select_for_update()
+        for item in queryset:
+            term = (feature_names[item.feature_id], item.value)
+            if term in terms:
+                found[term] = item
+    return found
+
+
+def _apply(added, removed):
+    """added / removed 为 {(名称, 值): 车辆 id 列表}"""
+    terms = set(added) | set(removed)
+    if not terms:
+        return
+    with transaction.atomic():
+        values = _intern(terms, lock=True)
+        for term, item in values.items():
+            car_ids = decode(item.car_ids)
+            if term in added:
+                car_ids = np.union1d(car_ids, np.asarray(added[term], dtype=DTYPE))
+            if term in removed:
+                car_ids = np.setdiff1d(car_ids, np.asarray(removed[term], dtype=DTYPE), assume_unique=True)
+            item.car_ids = encode(car_ids)
+            item.car_count = len(car_ids)
+        FeatureValue.objects.bulk_update(values.values(), ['car_ids', 'car_count'], batch_size=WRITE_BATCH_SIZE)
+
+
+def update_car(car_id, previous=()):
+    """特性表单集保存后调用；previous 为保存前的 car_terms()"""
+    previous = set(previous)
+    current = car_terms(car_id)
+    _apply(
+        {term: [car_id] for term in current - previous},
+        {term: [car_id] for term in previous - current},
+    )
+
+
+def add_features(rows):
+    """批量写入新车辆的特性后调用，rows 为 (车辆 id, 名称, 值)"""
+    added = defaultdict(list)
+    for car_id, name, value in rows:
+        added[normalize(name, value)].append(car_id)
+    _apply(added, {})
+
+
+def match(terms):
+    """同时具有全部 terms 的车辆 id（升序数组）"""
+    terms = set(terms)
+    if not terms:
+        return np.empty(0, dtype=DTYPE)
+    names = {name for name, _ in terms}
+    rows = FeatureValue.objects.filter(
+        feature__name__in=names, value__in={value for _, value in terms},
+    ).values_list('feature__name', 'value', 'car_ids', 'car_count')
+    postings = {(name, value): (count, car_ids) for name, value, car_ids, count in rows
+                if (name, value) in terms}
+    if len(postings) < len(terms):
+        return np.empty(0, dtype=DTYPE)
+    # 从最短的列表开始求交集，结果为空即可停止
+    ordered = sorted(postings.values(), key=lambda posting: posting[0])
+    result = decode(ordered[0][1])
+    for _, car_ids in ordered[1:]:
+        if not len(result):
+            break
+        result = np.intersect1d(result, decode(car_ids), assume_unique=True)
+    return result
+
+
+def popular_terms(limit=12):
+    """车辆数最多的特性取值，用于列表页筛选项"""
+    rows = FeatureValue.objects.filter(car_count__gt=0).order_by(
+        '-car_count', 'feature__name', 'value').values_list('feature__name', 'value', 'car_count')[:limit]
+    return [{'name': name, 'value': value, 'count': count} for name, value, count in rows]
+
+
+def rebuild(chunk_size=5000):
+    """按 CarFeature 全量重建；返回特性取值数"""
+    postings = defaultdict(list)
+    rows = CarFeature.objects.order_by('car_id').values_list('car_id', 'feature_name', 'feature_value')
+    for car_id, name, value in rows.iterator(chunk_size=chunk_size):
+        postings[normalize(name, value)].append(car_id)
+
+    with transaction.atomic():
+        FeatureValue.objects.update(car_ids=b'', car_count=0)
+        values = _intern(set(postings), load_ids=False) if postings else {}
+        for term, item in values.items():
+            item.car_ids = encode(np.unique(np.asarray(postings[term], dtype=DTYPE)))
+            item.car_count = len(item.car_ids) // DTYPE.itemsize
+        FeatureValue.objects.bulk_update(values.values(), ['car_ids', 'car_count'], batch_size=WRITE_BATCH_SIZE)
+    return len(values)
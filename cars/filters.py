@@ -0,0 +1,117 @@
+"""车辆列表筛选条件"""
+from decimal import ROUND_FLOOR, Decimal
+
+from django.db.models import Exists, OuterRef
+from django.db.models.functions import Trim
+
+from . import feature_index
+from .models import CarFeature
+
+# 价格区间（单位：元），与列表页下拉框取值一致
+PRICE_RANGES = {
+    '0-5': (None, 50000),
+    '5-10': (50000, 100000),
+    '10-20': (100000, 200000),
+    '20-50': (200000, 500000),
+    '50+': (500000, None),
+}
+
+PRICE_RANGE_LABELS = {
+    '0-5': '5万以下',
+    '5-10': '5-10万',
+    '10-20': '10-20万',
+    '20-50': '20-50万',
+    '50+': '50万以上',
+}
+
+# 特性交集不超过该数量时按 id 过滤，否则在 SQL 中逐项判断，避免超长的参数列表
+MAX_FEATURE_IDS = 1000
+
+# IntegerField 的取值范围、BigAutoField 主键的上限
+MIN_INTEGER, MAX_INTEGER = -2 ** 31, 2 ** 31 - 1
+MAX_ID = 2 ** 63 - 1
+# 里程字段（两位小数、共 10 位）的精度和上限
+MILEAGE_STEP = Decimal('0.01')
+MAX_MILEAGE = Decimal(10) ** 8
+
+
+def feature_params(params):
+    """特性筛选参数 feature=名称:值，可重复；params 为 QueryDict 或字典（值可为列表）"""
+    if hasattr(params, 'getlist'):
+        values = params.getlist('feature')
+    else:
+        values = params.get('feature') or []
+        if isinstance(values, str):
+            values = [values]
+    return sorted({value.strip() for value in values if value.strip()})
+
+
+def parse_number(value, cast):
+    """解析数值条件，空值、格式不对或不是有限值（nan、Infinity）时返回 None"""
+    try:
+        number = cast(value) if value not in (None, '') else None
+    except (TypeError, ValueError, ArithmeticError):
+        return None
+    if isinstance(number, Decimal) and not number.is_finite():
+        return None
+    return number
+
+
+def parse_integer(value, low=MIN_INTEGER, high=MAX_INTEGER):
+    """整数条件，超出字段范围的与格式不对的一样忽略（不限）"""
+    number = parse_number(value, int)
+    return number if number is not None and low <= number <= high else None
+
+
+def parse_id(value):
+    return parse_integer(value, low=1, high=MAX_ID)
+
+
+def parse_mileage(value):
+    """最大里程条件：向下取到两位小数（里程只有两位小数，不改变筛选结果），
+    超出字段上限的对任何车辆都成立，等同于不限
+    """
+    number = parse_number(value, Decimal)
+    if number is None or not -MAX_MILEAGE < number < MAX_MILEAGE:
+        return None
+    return number.quantize(MILEAGE_STEP, rounding=ROUND_FLOOR)
+
+
+def apply_car_filters(cars, params):
+    """按品牌、车型、价格区间、最早年份、最大里程、特性过滤车辆查询集
+
+    params 为 request.GET 或同结构的字典，未知或为空的条件直接忽略。
+    多个特性条件需同时满足：先用特性倒排索引求交集，结果较少时直接按 id 过滤；
+    结果较多时每个特性加一个对 CarFeature 的 EXISTS 子查询，由数据库按车辆逐一判断。
+    """
+    brand_filter = parse_id(params.get('brand'))
+    type_filter = parse_id(params.get('type'))
+    price_range = params.get('price_range')
+
+    if brand_filter:
+        cars = cars.filter(brand__id=brand_filter)
+    if type_filter:
+        cars = cars.filter(car_type__id=type_filter)
+    if price_range in PRICE_RANGES:
+        low, high = PRICE_RANGES[price_range]
+        if low is not None:
+            cars = cars.filter(current_price__gte=low)
+        if high is not None:
+            cars = cars.filter(current_price__lte=high)
+    min_year = parse_integer(params.get('min_year'))
+    if min_year is not None:
+        cars = cars.filter(year__gte=min_year)
+    max_mileage = parse_mileage(params.get('max_mileage'))
+    if max_mileage is not None:
+        cars = cars.filter(mileage__lte=max_mileage)
+    terms = [term for term in map(feature_index.parse_term, feature_params(params)) if term]
+    if terms:
+        car_ids = feature_index.match(terms)
+        if len(car_ids) <= MAX_FEATURE_IDS:
+            cars = cars.filter(id__in=car_ids.tolist())
+        else:
+            # 与倒排索引一致，按去掉首尾空格后的名称、值比较
+            features = CarFeature.objects.annotate(name=Trim('feature_name'), value=Trim('feature_value'))
+            for name, value in terms:
+                cars = cars.filter(Exists(features.filter(car=OuterRef('pk'), name=name, value=value)))
+    return cars
@@ -0,0 +1,46 @@
+"""基于数据版本号的 HTTP 条件请求与响应缓存"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import wraps
+
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+
+from . import versioning
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60
+
+
+def versioned_json(*tables):
+    """为只读 JSON 接口加上 ETag/Last-Modified 与服务端响应缓存
+
+    ETag 和 Last-Modified 只由 tables 的版本号与修改时间生成，客户端副本
+    仍然有效时直接返回 304，不访问数据库；序列化后的响应体按版本号缓存，
+    任意一张表变化后自然失效。
+    """
+    def decorator(view_func):
+        def etag(request, *args, **kwargs):
+            versions = '-'.join(str(version) for version in versioning.get_versions(*tables))
+            query = hashlib.md5(request.GET.urlencode().encode()).hexdigest()[:8]
+            return f'{view_func.__name__}-{versions}-{query}'
+
+        def last_modified(request, *args, **kwargs):
+            modified = max(versioning.get_last_modified(table) for table in tables)
+            return datetime.fromtimestamp(int(modified), tz=dt_timezone.utc)
+
+        @wraps(view_func)
+        @cache_control(no_cache=True)
+        @condition(etag_func=etag, last_modified_func=last_modified)
+        def wrapper(request, *args, **kwargs):
+            key = f'api_response:{etag(request, *args, **kwargs)}'
+            body = cache.get(key)
+            if body is not None:
+                return HttpResponse(body, content_type='application/json')
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.content, RESPONSE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,73 @@
+"""图片缩略图生成（进程池工作函数）
+
+本模块只依赖 Pillow，不导入 Django，可以在 spawn 方式启动的子进程中直接运行。
+Django 侧的调度、清单保存见 cars.thumbnails。
+"""
+import hashlib
+import os
+
+from PIL import Image, ImageOps
+
+# 生成的宽度（像素），原图更窄时不放大
+DERIVATIVE_WIDTHS = (160, 480, 1024)
+
+FORMATS = {
+    'webp': ('WEBP', '.webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', '.jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+HASH_LENGTH = 12
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:HASH_LENGTH]
+
+
+def _target_widths(original_width, widths):
+    targets = sorted({min(width, original_width) for width in widths})
+    return [width for width in targets if width > 0]
+
+
+def _save_atomic(image, path, fmt, options):
+    tmp_path = f'{path}.tmp'
+    image.save(tmp_path, fmt, **options)
+    os.replace(tmp_path, path)
+
+
+def render_derivatives(source_path, name, widths=DERIVATIVE_WIDTHS):
+    """为 source_path 生成各尺寸的 WebP 和 JPEG，写在原图旁边
+
+    name 为原图在存储中的相对路径，返回的清单中的文件名同样是相对路径：
+    {'source': name, 'hash': ..., 'width': 原图宽, 'sizes': {'160': {'webp': ..., 'jpeg': ...}}}
+    文件名包含原图内容哈希，内容变化后名字随之变化，可以放心长期缓存。
+    """
+    digest = content_hash(source_path)
+    stem, _ = os.path.splitext(name)
+    directory = os.path.dirname(source_path)
+    base = os.path.basename(stem)
+
+    with Image.open(source_path) as opened:
+        # JPEG 解码时直接按最大目标尺寸降采样，减少内存和耗时
+        opened.draft('RGB', (max(widths), max(widths)))
+        image = ImageOps.exif_transpose(opened)
+        original_width, original_height = image.size
+
+        sizes = {}
+        for width in _target_widths(original_width, widths):
+            height = max(1, round(original_height * width / original_width))
+            resized = image.resize((width, height), Image.LANCZOS, reducing_gap=3.0)
+            variants = {}
+            for key, (fmt, extension, options) in FORMATS.items():
+                filename = f'{base}.{digest}.{width}{extension}'
+                output = resized
+                if fmt == 'JPEG' and output.mode not in ('RGB', 'L'):
+                    output = output.convert('RGB')
+                _save_atomic(output, os.path.join(directory, filename), fmt, options)
+                variants[key] = f'{os.path.dirname(stem)}/{filename}' if os.path.dirname(stem) else filename
+            sizes[str(width)] = variants
+
+    return {'source': name, 'hash': digest, 'width': original_width, 'sizes': sizes}
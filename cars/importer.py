@@ -0,0 +1,259 @@
+"""经销商库存批量导入
+
+manage.py import_cars 的实现。输入为 CSV 或 JSON Lines，逐行流式读取，
+每 batch_size 行为一批：校验、并行复制图片，然后在一个事务内用 bulk_create
+依次写入 Car、CarFeature、CarImage。品牌、车型名称通过启动时加载的内存映射
+解析，不逐行查询。
+
+字段与 Car 模型一致，另有：
+    brand / car_type   名称
+    seller             用户名，缺省时使用命令行 --seller
+    features           JSONL 中为 {名称: 值} 或 [[名称, 值], ...]；CSV 中为 "名称:值;名称:值"
+    images             JSONL 中为路径列表；CSV 中为 "|" 分隔的路径。第一张作为主图
+
+bulk_create 不触发模型信号，每批写入后手动更新搜索索引、特性索引、价格记录、版本号和统计计数。
+"""
+import csv
+import json
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from ai_recommendation import result_cache
+from users import saved_searches
+
+from . import feature_index, price_history, search, stats, versioning
+from .models import Brand, Car, CarFeature, CarImage, CarType
+
+BATCH_SIZE = 1000
+IMAGE_WORKERS = 8
+
+# 导入时从输入读取的 Car 字段
+CAR_FIELDS = (
+    'model', 'year', 'mileage', 'color', 'transmission', 'fuel_type', 'engine_capacity',
+    'original_price', 'current_price', 'ai_suggested_price', 'status', 'description',
+)
+REQUIRED_FIELDS = ('brand', 'car_type', 'model', 'year', 'mileage', 'color', 'transmission',
+                   'fuel_type', 'engine_capacity', 'original_price', 'current_price')
+
+IMAGE_UPLOAD_TO = 'car_images/'
+
+
+class RowError(ValueError):
+    """单行数据不合法，写入拒绝文件后继续"""
+
+
+def detect_format(path):
+    return 'jsonl' if path.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_rows(f, fmt):
+    """逐行产出 (行号, 原始字典或解析错误)
+
+    JSON 中的小数按 Decimal 解析：float 经 DecimalField 转换会带出二进制误差的位数
+    （1.8 -> 1.800），小数位校验不通过。
+    """
+    if fmt == 'csv':
+        for line_no, row in enumerate(csv.DictReader(f), start=2):
+            yield line_no, row
+        return
+    for line_no, line in enumerate(f, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line, parse_float=Decimal)
+        except ValueError as e:
+            row = RowError(f'JSON 解析失败: {e}')
+        else:
+            if not isinstance(row, dict):
+                row = RowError('每行应为 JSON 对象')
+        yield line_no, row
+
+
+def _parse_features(value):
+    if not value:
+        return []
+    if isinstance(value, dict):
+        items = value.items()
+    elif isinstance(value, list):
+        items = value
+    else:
+        items = (item.split(':', 1) for item in str(value).split(';') if item.strip())
+    features = []
+    for item in items:
+        if len(item) != 2:
+            raise RowError(f'特性格式错误: {item}')
+        name, feature_value = (str(part).strip() for part in item)
+        if not name:
+            raise RowError('特性名称不能为空')
+        features.append((name, feature_value))
+    return features
+
+
+def _parse_images(value):
+    if not value:
+        return []
+    if isinstance(value, list):
+        return [str(path) for path in value if path]
+    return [path.strip() for path in str(value).split('|') if path.strip()]
+
+
+def _copy_image(source, image_root):
+    """复制到存储，返回存储中的文件名（线程池中执行）"""
+    path = source if os.path.isabs(source) else os.path.join(image_root, source)
+    name = f'{IMAGE_UPLOAD_TO}{uuid.uuid4().hex}{os.path.splitext(path)[1].lower()}'
+    with open(path, 'rb') as f:
+        return default_storage.save(name, File(f))
+
+
+class CarImporter:
+    """按批导入，进度和拒绝行通过回调报告"""
+
+    def __init__(self, seller=None, status='pending', image_root='.', batch_size=BATCH_SIZE,
+                 image_workers=IMAGE_WORKERS, on_reject=None):
+        self.default_seller = seller
+        self.default_status = status
+        self.image_root = image_root
+        self.batch_size = batch_size
+        self.on_reject = on_reject or (lambda line_no, row, error: None)
+        self.pool = ThreadPoolExecutor(max_workers=image_workers)
+        self.brands = {brand.name: brand.id for brand in Brand.objects.all()}
+        self.car_types = {car_type.name: car_type.id for car_type in CarType.objects.all()}
+        self.sellers = {}
+        self.imported = self.rejected = 0
+
+    def close(self):
+        self.pool.shutdown()
+
+    def _seller_id(self, username):
+        if username not in self.sellers:
+            user_id = get_user_model().objects.filter(username=username).values_list('id', flat=True).first()
+            self.sellers[username] = user_id
+        if self.sellers[username] is None:
+            raise RowError(f'卖家不存在: {username}')
+        return self.sellers[username]
+
+    def build(self, row):
+        """原始字典转换为未保存的 Car 及其特性、图片路径"""
+        if isinstance(row, RowError):
+            raise row
+        row = {key.strip(): value.strip() if isinstance(value, str) else value
+               for key, value in row.items() if key}
+        missing = [field for field in REQUIRED_FIELDS if row.get(field) in (None, '')]
+        if missing:
+            raise RowError(f'缺少字段: {", ".join(missing)}')
+
+        brand_id = self.brands.get(row['brand'])
+        if brand_id is None:
+            raise RowError(f'未知品牌: {row["brand"]}')
+        car_type_id = self.car_types.get(row['car_type'])
+        if car_type_id is None:
+            raise RowError(f'未知车型: {row["car_type"]}')
+        seller = row.get('seller') or self.default_seller
+        if not seller:
+            raise RowError('缺少卖家')
+
+        values = {field: row[field] for field in CAR_FIELDS if row.get(field) not in (None, '')}
+        values.setdefault('status', self.default_status)
+        values.setdefault('description', '')
+        car = Car(brand_id=brand_id, car_type_id=car_type_id, seller_id=self._seller_id(seller), **values)
+        try:
+            # 只做字段级校验（类型、长度、choices），不查数据库
+            car.clean_fields(exclude=['brand', 'car_type', 'seller', 'main_image', 'description'])
+        except ValidationError as e:
+            raise RowError('; '.join(f'{field}: {" ".join(messages)}'
+                                     for field, messages in e.message_dict.items()))
+        return car, _parse_features(row.get('features')), _parse_images(row.get('images'))
+
+    def import_rows(self, rows):
+        """rows 为 read_rows() 的输出；每写完一批产出一次 (已导入, 已拒绝)"""
+        batch = []
+        for line_no, row in rows:
+            try:
+                batch.append((line_no, row, *self.build(row)))
+            except RowError as e:
+                self.reject(line_no, row, e)
+            if len(batch) >= self.batch_size:
+                self._flush(batch)
+                batch = []
+                yield self.imported, self.rejected
+        if batch:
+            self._flush(batch)
+            yield self.imported, self.rejected
+
+    def reject(self, line_no, row, error):
+        self.rejected += 1
+        self.on_reject(line_no, None if isinstance(row, Exception) else row, str(error))
+
+    def _copy_images(self, batch):
+        """并行复制本批全部图片；任一图片失败则整行拒绝"""
+        futures = [[self.pool.submit(_copy_image, path, self.image_root) for path in images]
+                   for *_, images in batch]
+        accepted = []
+        for item, item_futures in zip(batch, futures):
+            names, error = [], None
+            for future in item_futures:
+                try:
+                    names.append(future.result())
+                except OSError as e:
+                    error = e
+            if error is None:
+                accepted.append((*item[:-1], names))
+                continue
+            for name in names:
+                default_storage.delete(name)
+            self.reject(item[0], item[1], RowError(f'图片复制失败: {error}'))
+        return accepted
+
+    def _flush(self, batch):
+        batch = self._copy_images(batch)
+        if not batch:
+            return
+        for _, _, car, _, images in batch:
+            if images:
+                car.main_image = images[0]
+
+        try:
+            cars = self._write(batch)
+        except Exception:
+            # 事务已回滚，删除本批已复制的图片
+            for *_, images in batch:
+                for name in images:
+                    default_storage.delete(name)
+            raise
+        self.imported += len(cars)
+
+    def _write(self, batch):
+        with transaction.atomic():
+            cars = Car.objects.bulk_create([car for _, _, car, _, _ in batch])
+            features = [
+                (car.pk, name, value)
+                for car, (_, _, _, car_features, _) in zip(cars, batch)
+                for name, value in car_features
+            ]
+            CarFeature.objects.bulk_create([
+                CarFeature(car_id=car_id, feature_name=name, feature_value=value)
+                for car_id, name, value in features
+            ])
+            CarImage.objects.bulk_create([
+                CarImage(car_id=car.pk, image=name, is_main=index == 0)
+                for car, (_, _, _, _, images) in zip(cars, batch)
+                for index, name in enumerate(images)
+            ])
+            # bulk_create 不触发信号，补做信号中的同步工作
+            search.index_cars([car.pk for car in cars])
+            feature_index.add_features(features)
+            price_history.record_initial_prices(cars)
+            stats.increment(approved_cars=sum(car.status == 'approved' for car in cars))
+            saved_searches.schedule_match([car.pk for car in cars if car.status == 'approved'])
+            result_cache.invalidate_for_cars(
+                (car.brand_id, car.car_type_id, car.current_price) for car in cars if car.status == 'approved')
+            transaction.on_commit(lambda: versioning.bump_version(versioning.CAR))
+        return cars
@@ -0,0 +1,109 @@
+"""车辆卡片缓存的页面渲染耗时对比
+
+在事务中生成指定数量的车辆（每辆一张图片），分别测量：
+  原写法   每张卡片在页面模板内直接渲染，逐张读取 car.images.first
+  未命中   car_cards 标签首次渲染（全部未命中，批量预取图片后渲染并写缓存）
+  命中     car_cards 标签再次渲染（一次 get_many 取回全部卡片）
+结束后回滚，不会留下数据：
+
+    python manage.py benchmark_car_cards --cards 500
+"""
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.template import Context, Engine
+from django.test.utils import CaptureQueriesContext
+
+from cars.cards import _cache_key
+from cars.models import Brand, Car, CarImage, CarType
+
+LEGACY_TEMPLATE = '''{% load image_tags %}{% for car in cars %}
+<div class="col-md-4 mb-4">
+    <div class="card h-100">
+        {% if car.images.first %}
+        {% with image=car.images.first %}{% responsive_image image.image image.image_variants width=480 alt=car.model class="card-img-top" %}{% endwith %}
+        {% else %}
+        <div class="card-img-top bg-light"><span class="text-muted">暂无图片</span></div>
+        {% endif %}
+        <div class="card-body d-flex flex-column">
+            <h5 class="card-title">{{ car.brand.name }} {{ car.model }}</h5>
+            <p class="card-text text-muted">{{ car.car_type.name }} · {{ car.year }}年 · {{ car.mileage }}万公里</p>
+            <div class="mt-auto">
+                <p class="card-text"><strong class="text-primary">¥{{ car.current_price }}</strong></p>
+                <a href="/cars/{{ car.id }}/" class="btn btn-primary btn-sm">查看详情</a>
+            </div>
+        </div>
+    </div>
+</div>
+{% endfor %}'''
+
+CARDS_TEMPLATE = '''{% load car_cards %}{% car_cards cars as cards %}{% for car in cars %}
+<div class="col-md-4 mb-4">
+    {% car_card cards car %}<a href="/cars/{{ car.id }}/" class="btn btn-primary btn-sm">查看详情</a>{% endcar_card %}
+</div>
+{% endfor %}'''
+
+
+class Command(BaseCommand):
+    help = '对比车辆卡片缓存前后的页面渲染耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self._run(options['cards'], options['repeat'])
+            transaction.set_rollback(True)
+
+    def _populate(self, count):
+        seller = get_user_model().objects.create(username='benchmark_seller', email='benchmark@example.com')
+        brand = Brand.objects.create(name='基准品牌')
+        car_type = CarType.objects.create(name='基准车型', category='sedan')
+        cars = Car.objects.bulk_create([
+            Car(brand=brand, car_type=car_type, model=f'基准车{i}', year=2020, mileage=Decimal(30000),
+                color='白色', transmission='automatic', fuel_type='gasoline', engine_capacity=Decimal('2.0'),
+                original_price=Decimal(200000), current_price=Decimal(150000 + i), status='approved',
+                seller=seller, description='')
+            for i in range(count)
+        ])
+        CarImage.objects.bulk_create([CarImage(car=car, image=f'car_images/benchmark_{car.pk}.jpg') for car in cars])
+        return [car.pk for car in cars]
+
+    def _measure(self, template, car_ids, repeat, before=None):
+        """返回 (耗时中位数 ms, 查询数)；每次都重新加载车辆，模拟一次页面请求"""
+        samples, queries = [], 0
+        for _ in range(repeat):
+            if before:
+                before()
+            start = time.perf_counter()
+            with CaptureQueriesContext(connection) as captured:
+                cars = list(Car.objects.filter(pk__in=car_ids).select_related('brand', 'car_type').order_by('pk'))
+                template.render(Context({'cars': cars}))
+            samples.append((time.perf_counter() - start) * 1000)
+            queries = len(captured)
+        return statistics.median(samples), queries
+
+    def _run(self, count, repeat):
+        car_ids = self._populate(count)
+        engine = Engine.get_default()
+        legacy = engine.from_string(LEGACY_TEMPLATE)
+        cached = engine.from_string(CARDS_TEMPLATE)
+        card_keys = [_cache_key('card', pk) for pk in car_ids]
+
+        results = [
+            ('原写法', self._measure(legacy, car_ids, repeat)),
+            ('未命中', self._measure(cached, car_ids, repeat, before=lambda: cache.delete_many(card_keys))),
+            ('命中', self._measure(cached, car_ids, repeat)),
+        ]
+        cache.delete_many(card_keys)
+
+        baseline = results[0][1][0]
+        self.stdout.write(f'{count} 张卡片：')
+        for name, (elapsed, queries) in results:
+            self.stdout.write(f'  {name:<6} {elapsed:9.1f} ms  {queries:4d} 次查询  {baseline / elapsed:5.1f}x')
@@ -0,0 +1,104 @@
+"""列式索引与 ORM 查询的性能对比
+
+在事务中批量生成指定数量的已审核车辆，分别用 ORM 和进程内列式索引执行
+相同的列表筛选，结束后回滚，不会留下数据：
+
+    python manage.py benchmark_catalog_index --sizes 10000 100000 1000000
+"""
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from cars.catalog_index import CatalogIndex
+from cars.models import Brand, Car, CarType
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _timed(func, repeat):
+    """返回多次执行耗时的中位数（毫秒）"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+class Command(BaseCommand):
+    help = '对比列式索引与 ORM 在不同数据量下的筛选耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000])
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            with transaction.atomic():
+                self._run(size, options['repeat'])
+                transaction.set_rollback(True)
+
+    def _populate(self, size):
+        seller = get_user_model().objects.create(username='benchmark_seller', email='benchmark@example.com')
+        brands = [Brand.objects.create(name=f'基准品牌{i}') for i in range(30)]
+        car_types = [CarType.objects.create(name=f'基准车型{i}', category='sedan') for i in range(7)]
+        rng = random.Random(size)
+        created = 0
+        while created < size:
+            batch = []
+            for _ in range(min(INSERT_BATCH_SIZE, size - created)):
+                price = rng.randint(20000, 800000)
+                batch.append(Car(
+                    brand=rng.choice(brands), car_type=rng.choice(car_types), model='基准车',
+                    year=rng.randint(2005, 2024), mileage=Decimal(rng.randint(0, 300000)),
+                    color='白色', transmission=rng.choice(['manual', 'automatic', 'semi_auto']),
+                    fuel_type=rng.choice(['gasoline', 'diesel', 'electric', 'hybrid']),
+                    engine_capacity=Decimal('2.0'), original_price=Decimal(price * 1.3),
+                    current_price=Decimal(price), status='approved', seller=seller, description='',
+                ))
+            Car.objects.bulk_create(batch)
+            created += len(batch)
+        return brands[0]
+
+    def _run(self, size, repeat):
+        self.stdout.write(f'生成 {size} 辆车...')
+        brand = self._populate(size)
+
+        start = time.perf_counter()
+        index = CatalogIndex()
+        index.load()
+        snapshot = index.snapshot()
+        build_ms = (time.perf_counter() - start) * 1000
+
+        approved = Car.objects.filter(status='approved')
+        cases = [
+            ('最新 24 辆',
+             lambda: list(approved.order_by('-created_at', '-id').values_list('id', flat=True)[:24]),
+             lambda: snapshot.query(order_by='-created_at', limit=24)),
+            ('品牌+价格区间 前 24',
+             lambda: list(approved.filter(brand=brand, current_price__gte=100000, current_price__lte=200000)
+                          .order_by('-created_at', '-id').values_list('id', flat=True)[:24]),
+             lambda: snapshot.query(brand_id=brand.id, current_price__gte=100000, current_price__lte=200000,
+                                    order_by='-created_at', limit=24)),
+            ('年份+里程+燃料 按价格前 24',
+             lambda: list(approved.filter(year__gte=2018, mileage__lte=60000, fuel_type='hybrid')
+                          .order_by('current_price', 'id').values_list('id', flat=True)[:24]),
+             lambda: snapshot.query(year__gte=2018, mileage__lte=60000, fuel_type='hybrid',
+                                    order_by='current_price', limit=24)),
+            ('价格区间计数',
+             lambda: approved.filter(current_price__gte=200000, current_price__lte=500000).count(),
+             lambda: snapshot.count(current_price__gte=200000, current_price__lte=500000)),
+        ]
+
+        self.stdout.write(f'索引构建耗时 {build_ms:.0f} ms')
+        for name, orm_query, index_query in cases:
+            orm_ms = _timed(orm_query, repeat)
+            index_ms = _timed(index_query, repeat)
+            self.stdout.write(
+                f'  {name:<20} ORM {orm_ms:8.3f} ms   索引 {index_ms:8.3f} ms   {orm_ms / index_ms:6.1f}x'
+            )
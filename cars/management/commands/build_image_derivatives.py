@@ -0,0 +1,67 @@
+"""为已有图片补生成缩略图
+
+    python manage.py build_image_derivatives            # 只处理缺少缩略图的图片
+    python manage.py build_image_derivatives --force    # 全部重新生成
+"""
+from concurrent.futures import FIRST_COMPLETED, wait
+
+from django.core.management.base import BaseCommand
+
+from cars import thumbnails
+from cars.imaging import render_derivatives
+from cars.models import Car, CarImage
+from users.models import CustomUser
+
+# (模型, 图片字段, 清单字段)
+TARGETS = (
+    (Car, 'main_image', 'main_image_variants'),
+    (CarImage, 'image', 'image_variants'),
+    (CustomUser, 'avatar', 'avatar_variants'),
+)
+
+
+class Command(BaseCommand):
+    help = '为车辆图片和用户头像补生成多尺寸 WebP/JPEG 缩略图'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='忽略已有清单，全部重新生成')
+        parser.add_argument('--max-pending', type=int, default=32, help='同时排队的任务数上限')
+
+    def handle(self, *args, **options):
+        executor = thumbnails.get_executor()
+        max_pending = options['max_pending']
+
+        for model, file_field, variants_field in TARGETS:
+            pending = {}
+            done = failed = 0
+
+            def collect(futures):
+                nonlocal done, failed
+                for future in futures:
+                    pk, name = pending.pop(future)
+                    try:
+                        thumbnails.save_variants(model, pk, file_field, variants_field, future.result())
+                        done += 1
+                    except Exception as e:
+                        failed += 1
+                        self.stderr.write(f'{model.__name__} #{pk} {name}: {e}')
+
+            rows = (model.objects.exclude(**{file_field: ''}).exclude(**{f'{file_field}__isnull': True})
+                    .order_by('pk').values_list('pk', file_field, variants_field))
+            for pk, name, variants in rows.iterator(chunk_size=500):
+                field_file = getattr(model(**{file_field: name}), file_field)
+                if not options['force'] and not thumbnails.needs_derivatives(field_file, variants):
+                    continue
+                path = thumbnails.source_path(field_file)
+                if path is None:
+                    continue
+                # 控制排队数量，避免一次把全部任务压进进程池
+                while len(pending) >= max_pending:
+                    finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(finished)
+                pending[executor.submit(render_derivatives, path, name)] = (pk, name)
+            collect(wait(pending).done)
+
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name}: 生成 {done} 个，失败 {failed} 个'
+            ))
@@ -0,0 +1,27 @@
+"""全量重建相似车辆列表
+
+首次部署、调整特征权重或批量导入后运行，并建议每天定时运行一次：日常的上架、
+下架由信号增量刷新，沿用本命令拟合的编码参数，全量构建后修改过的车辆越多，
+增量刷新要重新编码的行越多。
+
+    python manage.py build_similar_cars
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from cars import similarity
+
+
+class Command(BaseCommand):
+    help = '为全部已审核车辆重新计算相似车辆'
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def progress(done, total):
+            self.stdout.write(f'{done}/{total}')
+
+        total = similarity.rebuild(progress=progress)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'已为 {total} 辆车计算相似车辆，用时 {elapsed:.1f}s'))
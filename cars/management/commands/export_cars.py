@@ -0,0 +1,14 @@
+"""流式导出车辆数据
+
+    python manage.py export_cars --format jsonl --status approved --date-from 2024-01-01 -o cars.jsonl
+"""
+from cars import exports
+from cars.models import Car
+
+
+class Command(exports.ExportCommand):
+    help = '导出车辆数据为 CSV 或 JSON Lines'
+    columns = exports.CAR_COLUMNS
+
+    def get_queryset(self):
+        return Car.objects.all(), dict(Car.STATUS_CHOICES)
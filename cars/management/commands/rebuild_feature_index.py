@@ -0,0 +1,17 @@
+"""重建车辆特性倒排索引
+
+直接修改 CarFeature（后台、脚本）后索引与数据不一致，或需要清理已删除车辆时使用：
+
+    python manage.py rebuild_feature_index
+"""
+from django.core.management.base import BaseCommand
+
+from cars import feature_index
+
+
+class Command(BaseCommand):
+    help = '重建车辆特性倒排索引'
+
+    def handle(self, *args, **options):
+        total = feature_index.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'已索引 {total} 个特性取值'))
@@ -0,0 +1,21 @@
+"""从业务表重算平台统计计数器，修复增量更新产生的偏差
+
+    python manage.py rebuild_platform_stats
+"""
+from django.core.management.base import BaseCommand
+
+from cars import stats
+
+
+class Command(BaseCommand):
+    help = '重算平台统计计数器'
+
+    def handle(self, *args, **options):
+        before = stats.get_stats()
+        previous = {field: getattr(before, field) for field in stats.compute()}
+        after = stats.rebuild()
+        for field, old_value in previous.items():
+            new_value = getattr(after, field)
+            marker = '' if old_value == new_value else f'  (原值 {old_value})'
+            self.stdout.write(f'{field}: {new_value}{marker}')
+        self.stdout.write(self.style.SUCCESS('平台统计已重算'))
@@ -0,0 +1,39 @@
+"""重建车辆全文搜索索引
+
+批量导入（bulk_create 不触发信号）或索引与数据不一致时使用：
+
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from cars import search
+from cars.models import Car
+
+
+class Command(BaseCommand):
+    help = '重建车辆全文搜索索引'
+
+    def handle(self, *args, **options):
+        backend = search.get_backend()
+        if backend is None:
+            raise CommandError(f'数据库 {connection.vendor} 不支持全文搜索')
+
+        with connection.cursor() as cursor:
+            backend.drop_table(cursor)
+            backend.create_table(cursor)
+
+        car_ids = Car.objects.order_by('id').values_list('id', flat=True)
+        total = 0
+        batch = []
+        for car_id in car_ids.iterator(chunk_size=search.INDEX_BATCH_SIZE):
+            batch.append(car_id)
+            if len(batch) >= search.INDEX_BATCH_SIZE:
+                search.index_cars(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            search.index_cars(batch)
+            total += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'已索引 {total} 辆车'))
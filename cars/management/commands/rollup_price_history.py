@@ -0,0 +1,38 @@
+"""增量汇总车辆价格变动记录
+
+只处理上次运行之后的新记录，适合由 cron 定时执行：
+
+    python manage.py rollup_price_history
+    python manage.py rollup_price_history --backfill   # 先为没有记录的车辆补初始价格
+    python manage.py rollup_price_history --rebuild    # 清空汇总表后从头处理
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from cars import price_history
+
+
+class Command(BaseCommand):
+    help = '增量汇总车辆价格变动记录'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--backfill', action='store_true', help='为没有价格记录的车辆补一条初始价格')
+        parser.add_argument('--rebuild', action='store_true', help='清空汇总表和进度后从头处理')
+        parser.add_argument('--batch-size', type=int, default=price_history.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['backfill']:
+            self.stdout.write(f'补充初始价格 {price_history.backfill_initial_prices()} 条')
+        if options['rebuild']:
+            price_history.reset()
+        lag = price_history.ROLLUP_LAG
+        if options['backfill'] or options['rebuild']:
+            # 手动补数据时不需要等待未提交的事务
+            lag = timedelta(0)
+        processed = price_history.rollup(
+            batch_size=options['batch_size'],
+            lag=lag,
+            progress=lambda count: self.stdout.write(f'已处理 {count} 条'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'共汇总 {processed} 条价格记录'))
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0003_alter_car_main_image'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['status', '-created_at', '-id'], name='car_status_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['-created_at', '-id'], name='car_approved_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['brand', 'current_price'], name='car_approved_brand_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['car_type', 'current_price'], name='car_approved_type_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(condition=models.Q(('status', 'approved')), fields=['current_price'], name='car_approved_price_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+from django.db import migrations
+
+from cars.search import build_document, get_backend, INDEX_BATCH_SIZE
+
+
+def create_search_index(apps, schema_editor):
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    Car = apps.get_model('cars', 'Car')
+    car_ids = list(Car.objects.values_list('id', flat=True))
+    with schema_editor.connection.cursor() as cursor:
+        backend.create_table(cursor)
+        for start in range(0, len(car_ids), INDEX_BATCH_SIZE):
+            cars = Car.objects.filter(id__in=car_ids[start:start + INDEX_BATCH_SIZE]).select_related(
+                'brand', 'car_type').prefetch_related('features')
+            rows = [(car.id, build_document(car)) for car in cars]
+            if rows:
+                backend.insert(cursor, rows)
+
+
+def drop_search_index(apps, schema_editor):
+    backend = get_backend(schema_editor.connection)
+    if backend is None:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        backend.drop_table(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0004_car_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0005_car_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='car',
+            index=models.Index(fields=['updated_at'], name='car_updated_idx'),
+        ),
+    ]
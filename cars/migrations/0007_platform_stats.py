@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0006_car_updated_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PlatformStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('approved_cars', models.IntegerField(default=0, verbose_name='在售车辆数')),
+                ('total_users', models.IntegerField(default=0, verbose_name='用户数')),
+                ('completed_transactions', models.IntegerField(default=0, verbose_name='完成交易数')),
+                ('rating_total', models.IntegerField(default=0, verbose_name='评分总和')),
+                ('rating_count', models.IntegerField(default=0, verbose_name='评价数')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '平台统计',
+                'verbose_name_plural': '平台统计',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0007_platform_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='car',
+            name='main_image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='主图缩略图'),
+        ),
+        migrations.AddField(
+            model_name='carimage',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, verbose_name='缩略图'),
+        ),
+    ]
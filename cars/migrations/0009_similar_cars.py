@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SimilarCars',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='similar', serialize=False, to='cars.car', verbose_name='车辆')),
+                ('car_ids', models.JSONField(default=list, verbose_name='相似车辆')),
+                ('scores', models.JSONField(default=list, verbose_name='相似度')),
+                ('min_score', models.FloatField(default=-1.0, verbose_name='最低相似度')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '相似车辆',
+                'verbose_name_plural': '相似车辆',
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:20
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0009_similar_cars'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeatureName',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True, verbose_name='特性名称')),
+            ],
+            options={
+                'verbose_name': '特性名称',
+                'verbose_name_plural': '特性名称',
+            },
+        ),
+        migrations.CreateModel(
+            name='FeatureValue',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('value', models.CharField(max_length=200, verbose_name='特性值')),
+                ('car_ids', models.BinaryField(default=bytes, verbose_name='车辆列表')),
+                ('car_count', models.IntegerField(default=0, verbose_name='车辆数')),
+                ('feature', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='values', to='cars.featurename', verbose_name='特性名称')),
+            ],
+            options={
+                'verbose_name': '特性取值',
+                'verbose_name_plural': '特性取值',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='featurevalue',
+            constraint=models.UniqueConstraint(fields=('feature', 'value'), name='cars_feature_value_unique'),
+        ),
+    ]
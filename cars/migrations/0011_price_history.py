@@ -0,0 +1,109 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0010_feature_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceRollupState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_history_id', models.BigIntegerField(default=0, verbose_name='已处理记录')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='更新时间')),
+            ],
+            options={
+                'verbose_name': '价格汇总进度',
+                'verbose_name_plural': '价格汇总进度',
+            },
+        ),
+        migrations.CreateModel(
+            name='WeeklyPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(verbose_name='周期开始')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最低价')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最高价')),
+                ('price_total', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='价格合计')),
+                ('sample_count', models.IntegerField(verbose_name='记录数')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.brand', verbose_name='品牌')),
+                ('car_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.cartype', verbose_name='车型')),
+            ],
+            options={
+                'verbose_name': '每周价格汇总',
+                'verbose_name_plural': '每周价格汇总',
+            },
+        ),
+        migrations.CreateModel(
+            name='DailyPriceRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period_start', models.DateField(verbose_name='周期开始')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最低价')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最高价')),
+                ('price_total', models.DecimalField(decimal_places=2, max_digits=18, verbose_name='价格合计')),
+                ('sample_count', models.IntegerField(verbose_name='记录数')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.brand', verbose_name='品牌')),
+                ('car_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.cartype', verbose_name='车型')),
+            ],
+            options={
+                'verbose_name': '每日价格汇总',
+                'verbose_name_plural': '每日价格汇总',
+            },
+        ),
+        migrations.CreateModel(
+            name='CarPriceHistory',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='价格')),
+                ('previous_price', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='原价格')),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='变动时间')),
+                ('brand', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.brand', verbose_name='品牌')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='price_history', to='cars.car', verbose_name='车辆')),
+                ('car_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='cars.cartype', verbose_name='车型')),
+            ],
+            options={
+                'verbose_name': '价格变动记录',
+                'verbose_name_plural': '价格变动记录',
+            },
+        ),
+        migrations.CreateModel(
+            name='CarDailyPrice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='日期')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最低价')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='最高价')),
+                ('close_price', models.DecimalField(decimal_places=2, max_digits=12, verbose_name='收盘价')),
+                ('close_history_id', models.BigIntegerField(verbose_name='收盘记录')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_prices', to='cars.car', verbose_name='车辆')),
+            ],
+            options={
+                'verbose_name': '单车每日价格',
+                'verbose_name_plural': '单车每日价格',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='weeklypricerollup',
+            constraint=models.UniqueConstraint(fields=('brand', 'car_type', 'period_start'), name='cars_weekly_price_unique'),
+        ),
+        migrations.AddConstraint(
+            model_name='dailypricerollup',
+            constraint=models.UniqueConstraint(fields=('brand', 'car_type', 'period_start'), name='cars_daily_price_unique'),
+        ),
+        migrations.AddIndex(
+            model_name='carpricehistory',
+            index=models.Index(fields=['car', 'changed_at'], name='cars_price_history_car_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='cardailyprice',
+            constraint=models.UniqueConstraint(fields=('car', 'day'), name='cars_car_daily_price_unique'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('cars', '0011_price_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ModerationLease',
+            fields=[
+                ('car', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='moderation_lease', serialize=False, to='cars.car', verbose_name='车辆')),
+                ('token', models.CharField(db_index=True, max_length=32, verbose_name='令牌')),
+                ('leased_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='领取时间')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='过期时间')),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='moderation_leases', to=settings.AUTH_USER_MODEL, verbose_name='审核员')),
+            ],
+            options={
+                'verbose_name': '审核租约',
+                'verbose_name_plural': '审核租约',
+            },
+        ),
+    ]
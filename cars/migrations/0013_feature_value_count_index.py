@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_moderation_lease'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='featurevalue',
+            index=models.Index(fields=['-car_count'], name='feature_value_count_idx'),
+        ),
+    ]
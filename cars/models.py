@@ -1,6 +1,9 @@
+from decimal import Decimal
+
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 from django.conf import settings
+from django.utils import timezone
 
 class Brand(models.Model):
     """汽车品牌"""
@@ -96,6 +99,7 @@ class Car(models.Model):
     
     # 图片和描述
     main_image = models.ImageField(_('主图'), upload_to='car_images/', blank=True, null=True)
+    main_image_variants = models.JSONField(_('主图缩略图'), default=dict, blank=True, editable=False)
     description = models.TextField(_('车辆描述'))
     
     # 审核信息
@@ -112,6 +116,21 @@ class Car(models.Model):
         verbose_name = _('车辆')
         verbose_name_plural = _('车辆')
         ordering = ['-created_at']
+        indexes = [
+            # 按状态筛选并按发布时间倒序（列表、最新车辆、管理页）
+            models.Index(fields=['status', '-created_at', '-id'], name='car_status_created_idx'),
+            # 仅覆盖已审核车辆的部分索引，用于列表分页和价格区间筛选
+            models.Index(fields=['-created_at', '-id'], condition=models.Q(status='approved'),
+                         name='car_approved_recent_idx'),
+            models.Index(fields=['brand', 'current_price'], condition=models.Q(status='approved'),
+                         name='car_approved_brand_price_idx'),
+            models.Index(fields=['car_type', 'current_price'], condition=models.Q(status='approved'),
+                         name='car_approved_type_price_idx'),
+            models.Index(fields=['current_price'], condition=models.Q(status='approved'),
+                         name='car_approved_price_idx'),
+            # 进程内列式索引按 updated_at 增量同步
+            models.Index(fields=['updated_at'], name='car_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.brand.name} {self.model} ({self.year})"
@@ -120,6 +139,7 @@ class CarImage(models.Model):
     """车辆图片"""
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(_('图片'), upload_to='car_images/')
+    image_variants = models.JSONField(_('缩略图'), default=dict, blank=True, editable=False)
     is_main = models.BooleanField(_('是否主图'), default=False)
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     
@@ -141,4 +161,178 @@ class CarFeature(models.Model):
         verbose_name_plural = _('车辆特性')
     
     def __str__(self):
-        return f"{self.car.brand.name} {self.car.model} - {self.feature_name}"
\ No newline at end of file
+        return f"{self.car.brand.name} {self.car.model} - {self.feature_name}"
+
+class PlatformStats(models.Model):
+    """平台统计计数器（单行表，由 cars.signals 增量维护）"""
+    approved_cars = models.IntegerField(_('在售车辆数'), default=0)
+    total_users = models.IntegerField(_('用户数'), default=0)
+    completed_transactions = models.IntegerField(_('完成交易数'), default=0)
+    rating_total = models.IntegerField(_('评分总和'), default=0)
+    rating_count = models.IntegerField(_('评价数'), default=0)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('平台统计')
+        verbose_name_plural = _('平台统计')
+    
+    def __str__(self):
+        return f"平台统计 ({self.updated_at:%Y-%m-%d %H:%M})"
+
+class SimilarCars(models.Model):
+    """预计算的相似车辆（由 cars.similarity 批量生成、增量刷新）"""
+    car = models.OneToOneField(Car, on_delete=models.CASCADE, primary_key=True, related_name='similar',
+                               verbose_name=_('车辆'))
+    car_ids = models.JSONField(_('相似车辆'), default=list)
+    scores = models.JSONField(_('相似度'), default=list)
+    # 列表中最低的相似度，增量刷新时据此判断新车能否进入该列表
+    min_score = models.FloatField(_('最低相似度'), default=-1.0)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('相似车辆')
+        verbose_name_plural = _('相似车辆')
+    
+    def __str__(self):
+        return f"车辆 {self.car_id} 的相似车辆"
+
+class FeatureName(models.Model):
+    """特性名称字典，把自由填写的特性名称映射为整数 id"""
+    name = models.CharField(_('特性名称'), max_length=100, unique=True)
+    
+    class Meta:
+        verbose_name = _('特性名称')
+        verbose_name_plural = _('特性名称')
+    
+    def __str__(self):
+        return self.name
+
+class FeatureValue(models.Model):
+    """特性取值字典及倒排列表（由 cars.feature_index 维护）
+
+    每个 (特性名称, 特性值) 一行，car_ids 为具有该特性的车辆 id，
+    按升序存放的 int64 数组。
+    """
+    feature = models.ForeignKey(FeatureName, on_delete=models.CASCADE, related_name='values',
+                                verbose_name=_('特性名称'))
+    value = models.CharField(_('特性值'), max_length=200)
+    car_ids = models.BinaryField(_('车辆列表'), default=bytes)
+    car_count = models.IntegerField(_('车辆数'), default=0)
+    
+    class Meta:
+        verbose_name = _('特性取值')
+        verbose_name_plural = _('特性取值')
+        constraints = [
+            models.UniqueConstraint(fields=['feature', 'value'], name='cars_feature_value_unique'),
+        ]
+        indexes = [
+            # 列表页常用特性筛选项按车辆数倒序取前几项
+            models.Index(fields=['-car_count'], name='feature_value_count_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.feature.name}:{self.value}"
+
+class CarPriceHistory(models.Model):
+    """车辆价格变动记录，只追加不修改（上架时的初始价格也记一条）
+
+    品牌、车型在写入时冗余保存，汇总任务不需要再连接车辆表。
+    """
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='price_history',
+                            verbose_name=_('车辆'))
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='+', verbose_name=_('品牌'))
+    car_type = models.ForeignKey(CarType, on_delete=models.CASCADE, related_name='+', verbose_name=_('车型'))
+    price = models.DecimalField(_('价格'), max_digits=12, decimal_places=2)
+    previous_price = models.DecimalField(_('原价格'), max_digits=12, decimal_places=2, blank=True, null=True)
+    changed_at = models.DateTimeField(_('变动时间'), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('价格变动记录')
+        verbose_name_plural = _('价格变动记录')
+        indexes = [
+            models.Index(fields=['car', 'changed_at'], name='cars_price_history_car_idx'),
+        ]
+    
+    def __str__(self):
+        return f"车辆 {self.car_id} {self.previous_price} -> {self.price}"
+
+class PriceRollup(models.Model):
+    """按品牌、车型汇总的价格统计（由 cars.price_history 增量生成）"""
+    period_start = models.DateField(_('周期开始'))
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE, related_name='+', verbose_name=_('品牌'))
+    car_type = models.ForeignKey(CarType, on_delete=models.CASCADE, related_name='+', verbose_name=_('车型'))
+    min_price = models.DecimalField(_('最低价'), max_digits=12, decimal_places=2)
+    max_price = models.DecimalField(_('最高价'), max_digits=12, decimal_places=2)
+    price_total = models.DecimalField(_('价格合计'), max_digits=18, decimal_places=2)
+    sample_count = models.IntegerField(_('记录数'))
+    
+    class Meta:
+        abstract = True
+    
+    @property
+    def avg_price(self):
+        return (self.price_total / self.sample_count).quantize(Decimal('0.01'))
+
+class DailyPriceRollup(PriceRollup):
+    """每日价格汇总"""
+    
+    class Meta:
+        verbose_name = _('每日价格汇总')
+        verbose_name_plural = _('每日价格汇总')
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'car_type', 'period_start'], name='cars_daily_price_unique'),
+        ]
+
+class WeeklyPriceRollup(PriceRollup):
+    """每周价格汇总，周期从周一开始"""
+    
+    class Meta:
+        verbose_name = _('每周价格汇总')
+        verbose_name_plural = _('每周价格汇总')
+        constraints = [
+            models.UniqueConstraint(fields=['brand', 'car_type', 'period_start'], name='cars_weekly_price_unique'),
+        ]
+
+class CarDailyPrice(models.Model):
+    """单车每日价格（当天最低、最高、收盘价），用于车辆价格走势图"""
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='daily_prices', verbose_name=_('车辆'))
+    day = models.DateField(_('日期'))
+    min_price = models.DecimalField(_('最低价'), max_digits=12, decimal_places=2)
+    max_price = models.DecimalField(_('最高价'), max_digits=12, decimal_places=2)
+    close_price = models.DecimalField(_('收盘价'), max_digits=12, decimal_places=2)
+    # 收盘价对应的变动记录，合并不同批次时取较新的一条
+    close_history_id = models.BigIntegerField(_('收盘记录'))
+    
+    class Meta:
+        verbose_name = _('单车每日价格')
+        verbose_name_plural = _('单车每日价格')
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'day'], name='cars_car_daily_price_unique'),
+        ]
+
+class PriceRollupState(models.Model):
+    """价格汇总任务的进度（单行），记录已处理到的变动记录 id"""
+    last_history_id = models.BigIntegerField(_('已处理记录'), default=0)
+    updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
+    
+    class Meta:
+        verbose_name = _('价格汇总进度')
+        verbose_name_plural = _('价格汇总进度')
+
+class ModerationLease(models.Model):
+    """待审核车辆的租约，同一时间一辆车只分配给一位审核员（由 cars.moderation 维护）"""
+    car = models.OneToOneField(Car, on_delete=models.CASCADE, primary_key=True, related_name='moderation_lease',
+                               verbose_name=_('车辆'))
+    reviewer = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='moderation_leases',
+                                 verbose_name=_('审核员'))
+    # 同一次领取的车辆共用一个令牌，用于确认本次抢到了哪些车
+    token = models.CharField(_('令牌'), max_length=32, db_index=True)
+    leased_at = models.DateTimeField(_('领取时间'), default=timezone.now)
+    expires_at = models.DateTimeField(_('过期时间'), db_index=True)
+    
+    class Meta:
+        verbose_name = _('审核租约')
+        verbose_name_plural = _('审核租约')
+    
+    def __str__(self):
+        return f"车辆 {self.car_id} -> {self.reviewer_id}"
@@ -0,0 +1,156 @@
+"""车辆审核
+
+审核员通过队列接口按批领取待审核车辆（租约），租约到期前其他审核员领不到、
+也不能处理这些车，多人并行审核不会重复。领取不加行锁：先清理过期租约，再用
+INSERT ... ON CONFLICT DO NOTHING 插入带本次令牌的租约行，按令牌读回的就是
+本次实际抢到的车；被别人抢先的候选车辆在下一轮补足。
+
+通过、拒绝（单辆或批量）都是一条带 status='pending' 条件的 UPDATE，同时写入
+审核人、审核时间和拒绝原因，以 UPDATE 实际改动的行为准。QuerySet.update() 不触发
+模型信号，信号中的同步工作（版本号、统计计数、相似车辆、保存的搜索匹配、推荐缓存、
+列式索引）在事务提交后手动完成。
+"""
+import random
+import uuid
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ai_recommendation import result_cache
+from users import saved_searches
+
+from . import similarity, stats, versioning
+from .catalog_index import catalog_index
+from .models import Car, ModerationLease
+
+LEASE_SIZE = 20
+MAX_LEASE_SIZE = 100
+LEASE_TTL = timedelta(minutes=15)
+MAX_LEASE_TTL = timedelta(hours=2)
+
+# 候选车辆取所需数量的几倍后随机抽取，减少多名审核员同时领取时的冲突
+CANDIDATE_FACTOR = 3
+CLAIM_ATTEMPTS = 3
+
+DECISIONS = {
+    'approve': 'approved',
+    'reject': 'rejected',
+}
+
+
+class ModerationError(ValueError):
+    """审核请求不合法"""
+
+
+def can_moderate(user):
+    return user.is_authenticated and (user.is_staff or user.user_type == 'admin')
+
+
+def leased_cars(reviewer):
+    """审核员当前持有的未过期租约对应的待审核车辆"""
+    return Car.objects.filter(
+        status='pending',
+        moderation_lease__reviewer=reviewer,
+        moderation_lease__expires_at__gt=timezone.now(),
+    ).select_related('brand', 'car_type', 'seller', 'moderation_lease').order_by('created_at', 'id')
+
+
+def lease(reviewer, size=LEASE_SIZE, ttl=LEASE_TTL):
+    """领取最多 size 辆待审核车辆，已持有的租约一并续期；返回 (令牌, 过期时间)"""
+    if not 1 <= size <= MAX_LEASE_SIZE:
+        raise ModerationError(f'每次领取数量为 1-{MAX_LEASE_SIZE}')
+    if not timedelta(0) < ttl <= MAX_LEASE_TTL:
+        raise ModerationError(f'租约时长不能超过 {int(MAX_LEASE_TTL.total_seconds())} 秒')
+
+    now = timezone.now()
+    token = uuid.uuid4().hex
+    expires_at = now + ttl
+    ModerationLease.objects.filter(expires_at__lte=now).delete()
+    claimed = ModerationLease.objects.filter(reviewer=reviewer, car__status='pending').update(
+        token=token, expires_at=expires_at)
+
+    for _ in range(CLAIM_ATTEMPTS):
+        need = size - claimed
+        if need <= 0:
+            break
+        candidates = list(
+            Car.objects.filter(status='pending', moderation_lease__isnull=True)
+            .order_by('created_at', 'id').values_list('id', flat=True)[:need * CANDIDATE_FACTOR]
+        )
+        if not candidates:
+            break
+        ModerationLease.objects.bulk_create(
+            [ModerationLease(car_id=car_id, reviewer=reviewer, token=token, leased_at=now, expires_at=expires_at)
+             for car_id in random.sample(candidates, min(need, len(candidates)))],
+            ignore_conflicts=True,
+        )
+        claimed = ModerationLease.objects.filter(token=token).count()
+    return token, expires_at
+
+
+def release(reviewer, car_ids=None):
+    """交还租约（默认全部），返回交还数量"""
+    leases = ModerationLease.objects.filter(reviewer=reviewer)
+    if car_ids is not None:
+        leases = leases.filter(car_id__in=car_ids)
+    return leases.delete()[0]
+
+
+def _after_update(car_ids, status):
+    """事务提交后补做 Car 信号中的同步工作"""
+    versioning.bump_version(versioning.CAR)
+    for car_id in car_ids:
+        versioning.bump_object_version(versioning.CAR, car_id)
+    catalog_index.refresh()
+    if status == 'approved':
+        stats.increment(approved_cars=len(car_ids))
+        for car_id in car_ids:
+            similarity.schedule_refresh(car_id)
+        saved_searches.schedule_match(car_ids)
+        result_cache.invalidate_for_cars(
+            Car.objects.filter(id__in=car_ids).values_list('brand_id', 'car_type_id', 'current_price'))
+
+
+def decide(reviewer, car_ids, decision, reason=''):
+    """批量通过或拒绝，返回 (已处理 id 列表, 跳过的 id 列表)
+
+    只处理仍为待审核、且没有被其他审核员以未过期租约占用的车辆。
+    """
+    if decision not in DECISIONS:
+        raise ModerationError('decision 只能是 approve 或 reject')
+    reason = (reason or '').strip()
+    if decision == 'reject' and not reason:
+        raise ModerationError('请填写拒绝原因')
+    car_ids = sorted({int(car_id) for car_id in car_ids})
+    if not car_ids:
+        raise ModerationError('请选择车辆')
+
+    status = DECISIONS[decision]
+    now = timezone.now()
+    with transaction.atomic():
+        held_by_others = ModerationLease.objects.filter(
+            car_id__in=car_ids, expires_at__gt=now).exclude(reviewer=reviewer).values('car_id')
+        pending = Car.objects.filter(id__in=car_ids, status='pending').exclude(id__in=held_by_others)
+        if connection.features.has_select_for_update_skip_locked:
+            # 其他审核员正在处理的行直接跳过，不等待
+            pending = pending.select_for_update(skip_locked=True)
+        decided = list(pending.order_by('id').values_list('id', flat=True))
+        updated = Car.objects.filter(id__in=decided, status='pending').update(
+            status=status,
+            approved_by=reviewer,
+            approved_at=now,
+            rejection_reason=reason if status == 'rejected' else None,
+            updated_at=now,
+        )
+        if updated < len(decided):
+            # 没有 skip_locked 时（SQLite）读出的车辆可能已被其他审核员处理，
+            # 按本次写入的审核人和审核时间取回实际改动的车辆
+            decided = list(Car.objects.filter(
+                id__in=decided, status=status, approved_by=reviewer, approved_at=now,
+            ).order_by('id').values_list('id', flat=True))
+        ModerationLease.objects.filter(car_id__in=decided).delete()
+        if decided:
+            transaction.on_commit(lambda: _after_update(decided, status))
+    decided_set = set(decided)
+    return decided, [car_id for car_id in car_ids if car_id not in decided_set]
@@ -0,0 +1,167 @@
+"""车辆列表游标分页
+
+按 (排序键, id) 做键集分页：翻页条件直接走索引比较，不使用 OFFSET，
+因此第 N 页与第 1 页的查询代价相同。游标对客户端不透明。
+
+普通列表按 (created_at, id) 倒序；关键词搜索结果按 (search_rank, id) 正序，
+search_rank 越小越相关。
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+FORWARD = 'n'
+BACKWARD = 'p'
+
+
+class InvalidCursor(ValueError):
+    """游标格式错误或已损坏"""
+
+
+class KeysetOrdering:
+    """键集分页的排序键：字段名、方向以及游标中的序列化方式"""
+
+    def __init__(self, field, descending, dump, load):
+        self.field = field
+        self.descending = descending
+        self.dump = dump
+        self.load = load
+
+    def order_by(self, reverse=False):
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        return (f'{prefix}{self.field}', f'{prefix}id')
+
+    def after(self, value, car_id, reverse=False):
+        """排在 (value, car_id) 之后的行"""
+        op = 'lt' if self.descending != reverse else 'gt'
+        return Q(**{f'{self.field}__{op}': value}) | Q(**{self.field: value, f'id__{op}': car_id})
+
+
+def _load_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed
+
+
+BY_CREATED_AT = KeysetOrdering('created_at', True, lambda value: value.isoformat(), _load_datetime)
+BY_SEARCH_RANK = KeysetOrdering('search_rank', False, float, float)
+
+
+def encode_cursor(car, direction, ordering=BY_CREATED_AT):
+    """根据边界车辆生成游标"""
+    payload = json.dumps({
+        'k': ordering.field,
+        'v': ordering.dump(getattr(car, ordering.field)),
+        'i': car.id,
+        'd': direction,
+    }, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ordering=BY_CREATED_AT):
+    """解析游标，返回 (排序键取值, id, direction)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload['k'] != ordering.field:
+            raise ValueError(payload['k'])
+        value = ordering.load(payload['v'])
+        car_id = int(payload['i'])
+        direction = payload['d']
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+    if direction not in (FORWARD, BACKWARD):
+        raise InvalidCursor(cursor)
+    return value, car_id, direction
+
+
+def parse_page_size(value, default=DEFAULT_PAGE_SIZE):
+    """解析每页数量，限制在 1 到 MAX_PAGE_SIZE 之间"""
+    try:
+        size = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(size, MAX_PAGE_SIZE))
+
+
+class CursorPage:
+    """一页结果及前后游标"""
+
+    def __init__(self, items, next_cursor=None, prev_cursor=None):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.prev_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def paginate(cars, cursor=None, page_size=DEFAULT_PAGE_SIZE, ordering=BY_CREATED_AT):
+    """对车辆查询集做键集分页
+
+    cursor 无效时抛出 InvalidCursor。
+    """
+    if not cursor:
+        rows = list(cars.order_by(*ordering.order_by())[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], FORWARD, ordering) if has_more else None,
+        )
+
+    value, car_id, direction = decode_cursor(cursor, ordering)
+    if direction == FORWARD:
+        boundary = ordering.after(value, car_id)
+        rows = list(cars.filter(boundary).order_by(*ordering.order_by())[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if not rows:
+            return CursorPage(rows)
+        return CursorPage(
+            rows,
+            next_cursor=encode_cursor(rows[-1], FORWARD, ordering) if has_more else None,
+            prev_cursor=encode_cursor(rows[0], BACKWARD, ordering),
+        )
+
+    # 向前翻页：按相反顺序取数据后再反转，保持页面内顺序不变
+    boundary = ordering.after(value, car_id, reverse=True)
+    rows = list(cars.filter(boundary).order_by(*ordering.order_by(reverse=True))[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    rows.reverse()
+    if not rows:
+        return CursorPage(rows)
+    return CursorPage(
+        rows,
+        next_cursor=encode_cursor(rows[-1], FORWARD, ordering),
+        prev_cursor=encode_cursor(rows[0], BACKWARD, ordering) if has_more else None,
+    )
+
+
+def paginate_cars(cars, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """按发布时间倒序分页"""
+    return paginate(cars, cursor, page_size, BY_CREATED_AT)
+
+
+def paginate_search_results(cars, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """按相关度分页，cars 需带有 search_rank 注解（见 cars.search）"""
+    return paginate(cars, cursor, page_size, BY_SEARCH_RANK)
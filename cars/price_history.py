@@ -0,0 +1,246 @@
+"""车辆价格历史与汇总
+
+每次价格变动（包括上架时的初始价格）由 cars.signals 追加一条 CarPriceHistory。
+走势图不直接查询变动记录，而是读取汇总表：
+
+- DailyPriceRollup / WeeklyPriceRollup：按 (品牌, 车型, 日/周) 的最低、最高、合计、条数；
+- CarDailyPrice：单车每天的最低、最高、收盘价。
+
+汇总由 manage.py rollup_price_history 增量生成：PriceRollupState 记录已处理到的
+记录 id，每次只读取其后的新记录，按键合并进已有的汇总行。为避免漏掉尚未提交的
+事务中较早分配的 id，只处理 ROLLUP_LAG 之前写入的记录，遇到较新的即停止。
+"""
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from . import versioning
+from .models import (
+    Car, CarDailyPrice, CarPriceHistory, DailyPriceRollup, PriceRollupState, WeeklyPriceRollup,
+)
+
+BATCH_SIZE = 5000
+ROLLUP_LAG = timedelta(seconds=30)
+
+PERIODS = ('day', 'week')
+DEFAULT_DAYS = 180
+MAX_DAYS = 730
+CHART_CACHE_TIMEOUT = 60 * 60
+
+ROLLUP_FIELDS = ['min_price', 'max_price', 'price_total', 'sample_count']
+CAR_DAILY_FIELDS = ['min_price', 'max_price', 'close_price', 'close_history_id']
+
+
+def week_start(day):
+    return day - timedelta(days=day.weekday())
+
+
+def record_change(car, previous_price=None):
+    """追加一条价格变动记录"""
+    return CarPriceHistory.objects.create(
+        car=car, brand_id=car.brand_id, car_type_id=car.car_type_id,
+        price=car.current_price, previous_price=previous_price,
+    )
+
+
+def record_initial_prices(cars):
+    """批量写入新车辆的初始价格（bulk_create 不触发信号时使用）"""
+    now = timezone.now()
+    CarPriceHistory.objects.bulk_create([
+        CarPriceHistory(car_id=car.pk, brand_id=car.brand_id, car_type_id=car.car_type_id,
+                        price=car.current_price, changed_at=now)
+        for car in cars
+    ])
+
+
+def _merge_segments(model, aggregates):
+    """aggregates 为 {(brand_id, car_type_id, period_start): [min, max, total, count]}"""
+    if not aggregates:
+        return
+    existing = model.objects.filter(
+        period_start__in={key[2] for key in aggregates},
+        brand_id__in={key[0] for key in aggregates},
+        car_type_id__in={key[1] for key in aggregates},
+    )
+    for row in existing:
+        key = (row.brand_id, row.car_type_id, row.period_start)
+        if key in aggregates:
+            low, high, total, count = aggregates[key]
+            aggregates[key] = [min(low, row.min_price), max(high, row.max_price),
+                               total + row.price_total, count + row.sample_count]
+    model.objects.bulk_create(
+        [model(brand_id=brand_id, car_type_id=car_type_id, period_start=period_start,
+               min_price=low, max_price=high, price_total=total, sample_count=count)
+         for (brand_id, car_type_id, period_start), (low, high, total, count) in aggregates.items()],
+        update_conflicts=True,
+        unique_fields=['brand', 'car_type', 'period_start'],
+        update_fields=ROLLUP_FIELDS,
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _merge_car_days(days):
+    """days 为 {(car_id, day): [min, max, close, close_history_id]}"""
+    if not days:
+        return
+    existing = CarDailyPrice.objects.filter(
+        car_id__in={key[0] for key in days}, day__in={key[1] for key in days},
+    )
+    for row in existing:
+        key = (row.car_id, row.day)
+        if key in days:
+            low, high, close, close_id = days[key]
+            if row.close_history_id > close_id:
+                close, close_id = row.close_price, row.close_history_id
+            days[key] = [min(low, row.min_price), max(high, row.max_price), close, close_id]
+    CarDailyPrice.objects.bulk_create(
+        [CarDailyPrice(car_id=car_id, day=day, min_price=low, max_price=high,
+                       close_price=close, close_history_id=close_id)
+         for (car_id, day), (low, high, close, close_id) in days.items()],
+        update_conflicts=True,
+        unique_fields=['car', 'day'],
+        update_fields=CAR_DAILY_FIELDS,
+        batch_size=BATCH_SIZE,
+    )
+
+
+def _aggregate(rows):
+    daily, weekly, car_days = {}, {}, {}
+    for history_id, car_id, brand_id, car_type_id, price, changed_at in rows:
+        day = timezone.localtime(changed_at).date()
+        for aggregates, period_start in ((daily, day), (weekly, week_start(day))):
+            key = (brand_id, car_type_id, period_start)
+            if key in aggregates:
+                low, high, total, count = aggregates[key]
+                aggregates[key] = [min(low, price), max(high, price), total + price, count + 1]
+            else:
+                aggregates[key] = [price, price, price, 1]
+        key = (car_id, day)
+        if key in car_days:
+            low, high, _, _ = car_days[key]
+            # rows 按 id 升序，后出现的即为当天较新的价格
+            car_days[key] = [min(low, price), max(high, price), price, history_id]
+        else:
+            car_days[key] = [price, price, price, history_id]
+    return daily, weekly, car_days
+
+
+def rollup(batch_size=BATCH_SIZE, lag=ROLLUP_LAG, progress=None):
+    """处理上次之后的新变动记录，返回处理条数"""
+    state, _ = PriceRollupState.objects.get_or_create(pk=1)
+    cutoff = timezone.now() - lag
+    processed = 0
+    while True:
+        rows = list(
+            CarPriceHistory.objects.filter(id__gt=state.last_history_id).order_by('id').values_list(
+                'id', 'car_id', 'brand_id', 'car_type_id', 'price', 'changed_at')[:batch_size]
+        )
+        # 只处理足够早的记录，遇到较新的即停止，下次从这里继续
+        ready = []
+        for row in rows:
+            if row[5] >= cutoff:
+                break
+            ready.append(row)
+        if not ready:
+            break
+        daily, weekly, car_days = _aggregate(ready)
+        with transaction.atomic():
+            _merge_segments(DailyPriceRollup, daily)
+            _merge_segments(WeeklyPriceRollup, weekly)
+            _merge_car_days(car_days)
+            state.last_history_id = ready[-1][0]
+            state.save()
+        processed += len(ready)
+        if progress:
+            progress(processed)
+        if len(ready) < len(rows) or len(rows) < batch_size:
+            break
+    if processed:
+        versioning.bump_version(versioning.PRICE_HISTORY)
+    return processed
+
+
+def reset():
+    """清空汇总表和进度，下次 rollup() 从头处理"""
+    with transaction.atomic():
+        DailyPriceRollup.objects.all().delete()
+        WeeklyPriceRollup.objects.all().delete()
+        CarDailyPrice.objects.all().delete()
+        PriceRollupState.objects.update_or_create(pk=1, defaults={'last_history_id': 0})
+
+
+def backfill_initial_prices():
+    """为还没有任何变动记录的车辆补一条初始价格（时间取上架时间），返回条数"""
+    cars = Car.objects.filter(price_history__isnull=True).values_list(
+        'id', 'brand_id', 'car_type_id', 'current_price', 'created_at')
+    rows = [
+        CarPriceHistory(car_id=car_id, brand_id=brand_id, car_type_id=car_type_id,
+                        price=price, changed_at=created_at)
+        for car_id, brand_id, car_type_id, price, created_at in cars.iterator(chunk_size=BATCH_SIZE)
+    ]
+    CarPriceHistory.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def _car_series(car_id, since, period):
+    days = CarDailyPrice.objects.filter(car_id=car_id, day__gte=since).order_by('day').values_list(
+        'day', 'min_price', 'max_price', 'close_price')
+    if period == 'day':
+        return [{'date': day, 'min': low, 'max': high, 'close': close} for day, low, high, close in days]
+    # 单车每天最多一行，按周合并
+    weeks = {}
+    for day, low, high, close in days:
+        start = week_start(day)
+        if start in weeks:
+            point = weeks[start]
+            point.update(min=min(point['min'], low), max=max(point['max'], high), close=close)
+        else:
+            weeks[start] = {'date': start, 'min': low, 'max': high, 'close': close}
+    return list(weeks.values())
+
+
+def _segment_series(brand_id, car_type_id, since, period):
+    model = DailyPriceRollup if period == 'day' else WeeklyPriceRollup
+    rows = model.objects.filter(
+        brand_id=brand_id, car_type_id=car_type_id,
+        period_start__gte=since if period == 'day' else week_start(since),
+    ).order_by('period_start')
+    return [{
+        'date': row.period_start,
+        'min': row.min_price,
+        'max': row.max_price,
+        'avg': row.avg_price,
+        'count': row.sample_count,
+    } for row in rows]
+
+
+def price_chart(car, period='day', days=DEFAULT_DAYS):
+    """车辆价格走势及同品牌同车型的价格趋势，只读取汇总表
+
+    结果按汇总表版本号和单车版本号缓存，汇总任务处理新记录后失效。
+    """
+    today = timezone.localdate()
+    version = versioning.get_version(versioning.PRICE_HISTORY)
+    car_version = versioning.get_object_version(versioning.CAR, car.id)
+    key = f'price_chart:{car.id}:{period}:{days}:{today}:{version}:{car_version}'
+    chart = cache.get(key)
+    if chart is None:
+        chart = _build_chart(car, period, today - timedelta(days=days))
+        cache.set(key, chart, CHART_CACHE_TIMEOUT)
+    return chart
+
+
+def _build_chart(car, period, since):
+    return {
+        'car_id': car.id,
+        'period': period,
+        'current_price': car.current_price,
+        'points': _car_series(car.id, since, period),
+        'segment': {
+            'brand': car.brand.name,
+            'car_type': car.car_type.name,
+            'points': _segment_series(car.brand_id, car.car_type_id, since, period),
+        },
+    }
@@ -0,0 +1,42 @@
+"""查询计划检查
+
+各应用的 tests.py 在测试客户端中请求真实视图，用 CaptureQueriesContext 记录视图
+实际执行的 SQL，再对其中的 SELECT 执行 EXPLAIN QUERY PLAN，只要有查询退化为
+全表扫描测试就失败。查询来自视图本身，分页、分面、筛选条件改动后检查随之更新：
+
+    python manage.py test cars chat transactions
+"""
+from django.db import connection
+
+
+def explain(sql, params=()):
+    """返回查询计划的 detail 列"""
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+def is_table_scan(detail):
+    """SCAN 且未使用索引即视为全表扫描（FTS5 虚拟表的 MATCH 查询走自身索引）"""
+    if not detail.startswith('SCAN') or 'VIRTUAL TABLE' in detail:
+        return False
+    return 'USING' not in detail and 'SUBQUERY' not in detail
+
+
+def table_scans(queries, allowed=()):
+    """CaptureQueriesContext 记录的查询中出现全表扫描的 [(SQL, 扫描步骤)]
+
+    allowed 为允许整表读取的小字典表（如品牌、车型），其扫描步骤不计。
+    """
+    failures = []
+    for query in queries:
+        sql = query['sql']
+        if not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        scans = [
+            detail for detail in explain(sql)
+            if is_table_scan(detail) and detail.split()[1] not in allowed
+        ]
+        if scans:
+            failures.append((sql, scans))
+    return failures
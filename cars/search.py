@@ -0,0 +1,203 @@
+"""车辆全文搜索
+
+索引 Car.model、Car.description、Brand.name、CarType.name 以及
+CarFeature.feature_name/feature_value，按数据库选择后端：
+
+- SQLite：FTS5 虚拟表，bm25() 排序
+- PostgreSQL：tsvector 列 + GIN 索引，ts_rank_cd() 排序
+
+中文没有空格分词，入库前先切成单字和相邻双字（bigram），查询时用双字匹配，
+两种后端都只需要按空格切分的简单分词器。索引通过 cars.signals 中的模型信号
+保持同步，批量导入后可以运行 manage.py rebuild_search_index 重建。
+"""
+import re
+
+from django.db import connection
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'cars_car_search'
+
+# 列顺序与权重：车型 > 品牌 > 类型 > 特性 > 描述
+SEARCH_COLUMNS = ('model', 'brand', 'car_type', 'features', 'description')
+SQLITE_WEIGHTS = (5.0, 3.0, 2.0, 1.5, 1.0)
+POSTGRES_WEIGHTS = ('A', 'A', 'B', 'C', 'D')
+
+INDEX_BATCH_SIZE = 500
+
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+_TOKEN_RE = re.compile(rf'[{_CJK}]+|[^\W{_CJK}_]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+
+def _ngrams(run, for_query):
+    if len(run) == 1:
+        return [run]
+    bigrams = [run[i:i + 2] for i in range(len(run) - 1)]
+    if for_query:
+        return bigrams
+    return list(run) + bigrams
+
+
+def tokenize(text, for_query=False):
+    """切分文本：中文按单字+双字，其他按单词，统一小写"""
+    tokens = []
+    for run in _TOKEN_RE.findall((text or '').lower()):
+        if _CJK_RE.match(run):
+            tokens.extend(_ngrams(run, for_query))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def build_document(car):
+    """车辆的各列索引文本（已分词，空格分隔）
+
+    car 需预取 brand、car_type、features。
+    """
+    features = ' '.join(
+        f'{feature.feature_name} {feature.feature_value}' for feature in car.features.all()
+    )
+    values = {
+        'model': car.model,
+        'brand': car.brand.name,
+        'car_type': car.car_type.name,
+        'features': features,
+        'description': car.description,
+    }
+    return [' '.join(tokenize(values[column])) for column in SEARCH_COLUMNS]
+
+
+class SqliteSearchBackend:
+    """SQLite FTS5 后端"""
+
+    rank_sql = f"bm25({SEARCH_TABLE}, {', '.join(str(w) for w in SQLITE_WEIGHTS)})"
+
+    def create_table(self, cursor):
+        columns = ', '.join(SEARCH_COLUMNS)
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} "
+            f"USING fts5({columns}, tokenize='unicode61')"
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def match_expression(self, tokens):
+        # 每个词项加引号，空格连接即 AND
+        return ' '.join(f'"{token}"' for token in tokens)
+
+    def delete(self, cursor, car_ids):
+        placeholders = ', '.join(['%s'] * len(car_ids))
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid IN ({placeholders})', list(car_ids))
+
+    def insert(self, cursor, rows):
+        columns = ', '.join(SEARCH_COLUMNS)
+        placeholders = ', '.join(['%s'] * (len(SEARCH_COLUMNS) + 1))
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE}(rowid, {columns}) VALUES ({placeholders})',
+            [[car_id, *document] for car_id, document in rows],
+        )
+
+    def search(self, cars, expression):
+        table = cars.model._meta.db_table
+        return cars.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.rowid = {table}.id', f'{SEARCH_TABLE} MATCH %s'],
+            params=[expression],
+        ).annotate(search_rank=RawSQL(self.rank_sql, []))
+
+
+class PostgresSearchBackend:
+    """PostgreSQL tsvector 后端（可选）"""
+
+    def create_table(self, cursor):
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS {SEARCH_TABLE} ('
+            f'car_id bigint PRIMARY KEY REFERENCES cars_car(id) ON DELETE CASCADE, '
+            f'document tsvector NOT NULL)'
+        )
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS {SEARCH_TABLE}_document_idx '
+            f'ON {SEARCH_TABLE} USING GIN (document)'
+        )
+
+    def drop_table(self, cursor):
+        cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+
+    def match_expression(self, tokens):
+        return ' '.join(tokens)
+
+    def delete(self, cursor, car_ids):
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE car_id = ANY(%s)', [list(car_ids)])
+
+    def insert(self, cursor, rows):
+        vector = ' || '.join(
+            f"setweight(to_tsvector('simple', %s), '{weight}')" for weight in POSTGRES_WEIGHTS
+        )
+        cursor.executemany(
+            f'INSERT INTO {SEARCH_TABLE} (car_id, document) VALUES (%s, {vector})',
+            [[car_id, *document] for car_id, document in rows],
+        )
+
+    def search(self, cars, expression):
+        table = cars.model._meta.db_table
+        query = "plainto_tsquery('simple', %s)"
+        # 取负值，使 search_rank 与 bm25 一样越小越相关
+        return cars.extra(
+            tables=[SEARCH_TABLE],
+            where=[f'{SEARCH_TABLE}.car_id = {table}.id', f'{SEARCH_TABLE}.document @@ {query}'],
+            params=[expression],
+        ).annotate(search_rank=RawSQL(f'-ts_rank_cd({SEARCH_TABLE}.document, {query})', [expression]))
+
+
+_BACKENDS = {
+    'sqlite': SqliteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_backend(using=None):
+    """当前数据库对应的搜索后端，不支持的数据库返回 None"""
+    vendor = (using or connection).vendor
+    backend_class = _BACKENDS.get(vendor)
+    return backend_class() if backend_class else None
+
+
+def search_cars(cars, query):
+    """在车辆查询集上做关键词搜索，附加 search_rank 注解
+
+    数据库不支持全文搜索或关键词中没有可检索的词时返回 None。
+    """
+    backend = get_backend()
+    tokens = tokenize(query, for_query=True)
+    if backend is None or not tokens:
+        return None
+    return backend.search(cars, backend.match_expression(tokens))
+
+
+def index_cars(car_ids):
+    """重建指定车辆的索引，已删除的车辆会从索引中移除"""
+    from .models import Car
+
+    backend = get_backend()
+    car_ids = list(car_ids)
+    if backend is None or not car_ids:
+        return
+    for start in range(0, len(car_ids), INDEX_BATCH_SIZE):
+        batch = car_ids[start:start + INDEX_BATCH_SIZE]
+        cars = Car.objects.filter(id__in=batch).select_related('brand', 'car_type').prefetch_related('features')
+        rows = [(car.id, build_document(car)) for car in cars]
+        with connection.cursor() as cursor:
+            backend.delete(cursor, batch)
+            if rows:
+                backend.insert(cursor, rows)
+
+
+def remove_cars(car_ids):
+    """从索引中移除车辆"""
+    backend = get_backend()
+    car_ids = list(car_ids)
+    if backend is None or not car_ids:
+        return
+    with connection.cursor() as cursor:
+        backend.delete(cursor, car_ids)
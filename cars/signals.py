@@ -0,0 +1,232 @@
+"""车辆相关模型信号"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from transactions.models import Review, Transaction
+from users import saved_searches
+
+from . import price_history, search, similarity, stats, thumbnails, versioning
+from .catalog_index import catalog_index
+from .models import Brand, Car, CarFeature, CarImage, CarType
+
+
+@receiver(post_save, sender=Car)
+def index_saved_car(sender, instance, raw=False, **kwargs):
+    """车辆保存后更新搜索索引"""
+    if not raw:
+        search.index_cars([instance.pk])
+
+
+@receiver(post_delete, sender=Car)
+def unindex_deleted_car(sender, instance, **kwargs):
+    """车辆删除后移出搜索索引"""
+    search.remove_cars([instance.pk])
+
+
+@receiver(post_save, sender=CarFeature)
+@receiver(post_delete, sender=CarFeature)
+def index_feature_car(sender, instance, raw=False, **kwargs):
+    """车辆特性变化后重建所属车辆的索引"""
+    if not raw:
+        search.index_cars([instance.car_id])
+
+
+@receiver(post_save, sender=Brand)
+def index_brand_cars(sender, instance, created=False, raw=False, **kwargs):
+    """品牌改名后重建该品牌下车辆的索引"""
+    if not raw and not created:
+        search.index_cars(Car.objects.filter(brand=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=CarType)
+def index_car_type_cars(sender, instance, created=False, raw=False, **kwargs):
+    """类型改名后重建该类型下车辆的索引"""
+    if not raw and not created:
+        search.index_cars(Car.objects.filter(car_type=instance).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+def bump_car_version(sender, **kwargs):
+    """车辆变化后递增版本号，使分面计数等缓存失效"""
+    versioning.bump_version(versioning.CAR)
+
+
+@receiver(post_save, sender=Car)
+@receiver(post_delete, sender=Car)
+def bump_car_object_version(sender, instance, **kwargs):
+    """单车版本号，使该车的详情缓存失效"""
+    versioning.bump_object_version(versioning.CAR, instance.pk)
+
+
+@receiver(post_save, sender=CarImage)
+@receiver(post_delete, sender=CarImage)
+@receiver(post_save, sender=CarFeature)
+@receiver(post_delete, sender=CarFeature)
+def bump_parent_car_version(sender, instance, **kwargs):
+    versioning.bump_object_version(versioning.CAR, instance.car_id)
+
+
+@receiver(post_save, sender=get_user_model())
+def bump_seller_car_versions(sender, instance, created=False, raw=False, update_fields=None, **kwargs):
+    """卖家资料显示在车辆详情中，资料变化后使其名下车辆的详情缓存失效"""
+    if raw or created or (update_fields and set(update_fields) <= {'last_login'}):
+        return
+    for car_id in Car.objects.filter(seller=instance).values_list('id', flat=True):
+        versioning.bump_object_version(versioning.CAR, car_id)
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_delete, sender=Brand)
+def bump_brand_version(sender, **kwargs):
+    versioning.bump_version(versioning.BRAND)
+
+
+@receiver(post_save, sender=CarType)
+@receiver(post_delete, sender=CarType)
+def bump_car_type_version(sender, **kwargs):
+    versioning.bump_version(versioning.CAR_TYPE)
+
+
+@receiver(post_save, sender=Car)
+def update_catalog_index(sender, instance, raw=False, **kwargs):
+    """把本进程内的车辆修改增量应用到列式索引"""
+    if not raw:
+        catalog_index.apply(instance)
+
+
+@receiver(post_delete, sender=Car)
+def remove_from_catalog_index(sender, instance, **kwargs):
+    catalog_index.remove(instance.pk)
+
+
+def _previous_values(sender, instance, *fields):
+    """保存前从数据库读取旧值，新建对象返回 None"""
+    if instance.pk is None:
+        return None
+    return sender.objects.filter(pk=instance.pk).values(*fields).first()
+
+
+@receiver(pre_save, sender=Car)
+def remember_previous_car(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._previous = _previous_values(sender, instance, 'status', 'current_price')
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_status(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._previous = _previous_values(sender, instance, 'status')
+
+
+@receiver(pre_save, sender=Review)
+def remember_previous_rating(sender, instance, raw=False, **kwargs):
+    if not raw:
+        instance._previous = _previous_values(sender, instance, 'rating')
+
+
+def _status_delta(instance, status):
+    """本次保存使处于 status 的记录数变化了多少（-1、0、1）"""
+    previous = getattr(instance, '_previous', None)
+    was = previous is not None and previous['status'] == status
+    return int(instance.status == status) - int(was)
+
+
+@receiver(post_save, sender=Car)
+def count_approved_car(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stats.increment(approved_cars=_status_delta(instance, 'approved'))
+
+
+@receiver(post_delete, sender=Car)
+def uncount_approved_car(sender, instance, **kwargs):
+    if instance.status == 'approved':
+        stats.increment(approved_cars=-1)
+
+
+@receiver(post_save, sender=Car)
+def refresh_similar_cars(sender, instance, raw=False, **kwargs):
+    """在售车辆上架、下架或属性修改后，后台增量刷新相似车辆"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if instance.status == 'approved' or (previous is not None and previous['status'] == 'approved'):
+        similarity.schedule_refresh(instance.pk)
+
+
+@receiver(post_save, sender=Car)
+def match_saved_searches(sender, instance, raw=False, **kwargs):
+    """车辆进入审核通过状态后，后台匹配保存的搜索并通知"""
+    if not raw and _status_delta(instance, 'approved') > 0:
+        saved_searches.schedule_match([instance.pk])
+
+
+@receiver(post_save, sender=Car)
+def record_price_change(sender, instance, raw=False, **kwargs):
+    """上架或价格变动时追加价格记录"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous is None:
+        price_history.record_change(instance)
+    elif previous['current_price'] != instance.current_price:
+        price_history.record_change(instance, previous['current_price'])
+
+
+@receiver(post_save, sender=Transaction)
+def count_completed_transaction(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stats.increment(completed_transactions=_status_delta(instance, 'completed'))
+
+
+@receiver(post_delete, sender=Transaction)
+def uncount_completed_transaction(sender, instance, **kwargs):
+    if instance.status == 'completed':
+        stats.increment(completed_transactions=-1)
+
+
+@receiver(post_save, sender=Review)
+def count_review_rating(sender, instance, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous', None)
+    if previous is None:
+        stats.increment(rating_total=instance.rating, rating_count=1)
+    else:
+        stats.increment(rating_total=instance.rating - previous['rating'])
+
+
+@receiver(post_delete, sender=Review)
+def uncount_review_rating(sender, instance, **kwargs):
+    stats.increment(rating_total=-instance.rating, rating_count=-1)
+
+
+@receiver(post_save, sender=get_user_model())
+def count_user(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        stats.increment(total_users=1)
+
+
+@receiver(post_delete, sender=get_user_model())
+def uncount_user(sender, instance, **kwargs):
+    stats.increment(total_users=-1)
+
+
+@receiver(post_save, sender=Car)
+def generate_car_image_derivatives(sender, instance, raw=False, **kwargs):
+    """主图上传后异步生成缩略图"""
+    if not raw:
+        thumbnails.schedule(instance, 'main_image', 'main_image_variants')
+
+
+@receiver(post_save, sender=CarImage)
+def generate_gallery_image_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        thumbnails.schedule(instance, 'image', 'image_variants')
+
+
+@receiver(post_save, sender=get_user_model())
+def generate_avatar_derivatives(sender, instance, raw=False, **kwargs):
+    if not raw:
+        thumbnails.schedule(instance, 'avatar', 'avatar_variants')
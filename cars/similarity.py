@@ -0,0 +1,377 @@
+"""相似车辆
+
+把已审核车辆的品牌、类型、年份、里程、价格、燃料、变速箱、排量编码为
+加权、L2 归一化的 NumPy 向量，余弦相似度即向量点积。每辆车预先算好最相似的
+STORED_NEIGHBORS 辆存入 SimilarCars，详情页和 /cars/api/<id>/similar/ 按主键
+读取一行即可；读取时再过滤掉已不在售的车辆，所以多存几辆作为余量。
+
+- 全量：manage.py build_similar_cars 拟合编码参数，分块矩阵乘法 + argpartition
+  取前 K，并把编码参数和向量矩阵发布到模型存储（ai_recommendation.artifacts）；
+- 增量：车辆进入或离开审核通过状态时，cars.signals 调用 schedule_refresh()，
+  事务提交后调用 refresh()（cars.debounce，Web 进程中由后台线程合并短时间内的变化）：沿用全量构建时的编码参数，只对
+  全量构建后修改过的车辆重新编码，重算变化车辆自己的列表，并更新可能因此变化的
+  其他车辆的列表（借助 min_score 列筛选候选）。编码参数只在全量重建时重新拟合，
+  增量结果与全量结果使用同一套编码，可比较。
+"""
+import copy
+import logging
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from ai_recommendation import artifacts
+
+from . import debounce
+from .models import Car, SimilarCars
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_NAME = 'similar_cars'
+
+# 接口返回的数量
+SIMILAR_LIMIT = 8
+# 每辆车存储的数量，多出的部分用于补位已售出的车辆
+STORED_NEIGHBORS = 16
+
+NUMERIC_FIELDS = ('year', 'mileage', 'current_price', 'engine_capacity')
+CATEGORICAL_FIELDS = ('brand_id', 'car_type_id', 'fuel_type', 'transmission')
+FIELDS = ('id', *NUMERIC_FIELDS, *CATEGORICAL_FIELDS)
+
+# 各特征在相似度中的权重
+WEIGHTS = {
+    'year': 1.0,
+    'mileage': 0.8,
+    'current_price': 1.5,
+    'engine_capacity': 0.5,
+    'brand_id': 1.0,
+    'car_type_id': 1.0,
+    'fuel_type': 0.5,
+    'transmission': 0.3,
+}
+
+# 每次参与矩阵乘法的查询行数，控制临时相似度矩阵的大小
+QUERY_CHUNK_SIZE = 256
+# 候选列筛选使用的列样本大小
+SAMPLE_COLUMNS = 2048
+WRITE_BATCH_SIZE = 1000
+LOAD_CHUNK_SIZE = 5000
+
+# 存储的相似度保留 6 位小数，比较时留出误差
+SCORE_TOLERANCE = 1e-5
+
+# 增量刷新的合并等待时间（秒）
+REFRESH_DELAY = 2.0
+
+
+class Encoder:
+    """特征编码参数（数值列的均值/标准差、分类列的取值表）"""
+
+    def __init__(self, stats, categories):
+        self.stats = stats
+        self.categories = categories
+
+    @classmethod
+    def fit(cls, rows):
+        """由已审核车辆拟合，只在全量重建时调用"""
+        columns = list(zip(*rows)) if rows else [()] * len(FIELDS)
+        values = dict(zip(FIELDS, columns))
+        stats = {}
+        for field in NUMERIC_FIELDS:
+            column = cls._numeric(field, values[field])
+            std = column.std() if len(column) else 0.0
+            stats[field] = (float(column.mean()) if len(column) else 0.0, float(std) if std > 0 else 1.0)
+        categories = {
+            field: {value: index for index, value in enumerate(sorted(set(values[field]), key=str))}
+            for field in CATEGORICAL_FIELDS
+        }
+        return cls(stats, categories)
+
+    def to_metadata(self):
+        return {
+            'stats': {field: list(value) for field, value in self.stats.items()},
+            'categories': {field: list(categories) for field, categories in self.categories.items()},
+        }
+
+    @classmethod
+    def from_metadata(cls, metadata):
+        return cls(
+            {field: tuple(value) for field, value in metadata['stats'].items()},
+            {field: {value: index for index, value in enumerate(values)}
+             for field, values in metadata['categories'].items()},
+        )
+
+    @staticmethod
+    def _numeric(field, column):
+        column = np.asarray([float(value or 0) for value in column], dtype=np.float64)
+        # 价格、里程跨度大，取对数后按比例比较
+        if field in ('current_price', 'mileage'):
+            column = np.log1p(np.maximum(column, 0))
+        return column
+
+    @property
+    def dimensions(self):
+        return len(NUMERIC_FIELDS) + sum(len(categories) for categories in self.categories.values())
+
+    def transform(self, rows):
+        """行 -> 归一化向量矩阵 (n, d)，float32；取值表中没有的分类值编码为全零"""
+        columns = list(zip(*rows)) if rows else [()] * len(FIELDS)
+        values = dict(zip(FIELDS, columns))
+        n = len(rows)
+        parts = []
+        for field in NUMERIC_FIELDS:
+            mean, std = self.stats[field]
+            parts.append(((self._numeric(field, values[field]) - mean) / std * WEIGHTS[field])[:, None])
+        for field in CATEGORICAL_FIELDS:
+            categories = self.categories[field]
+            one_hot = np.zeros((n, len(categories)), dtype=np.float64)
+            codes = np.array([categories.get(value, -1) for value in values[field]], dtype=np.int64)
+            known = codes >= 0
+            one_hot[np.flatnonzero(known), codes[known]] = WEIGHTS[field]
+            parts.append(one_hot)
+        matrix = np.hstack(parts)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (matrix / norms).astype(np.float32)
+
+
+class CarVectors:
+    """已审核车辆的向量：全量构建的基础矩阵，加上之后修改过的车辆的向量
+
+    相似度矩阵的列依次为基础矩阵各行和 extra 各行，column_ids 为各列对应的车辆 id；
+    基础矩阵中已修改或已下架的行由 alive 掩码屏蔽，基础矩阵本身不复制。
+    """
+
+    def __init__(self, encoder, ids, matrix, built_at=None):
+        self.encoder = encoder
+        self.built_at = built_at
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.matrix = matrix
+        self.positions = {car_id: position for position, car_id in enumerate(self.ids.tolist())}
+        self.alive = None
+        self.extra = np.empty((0, matrix.shape[1]), dtype=np.float32)
+        self.extra_positions = {}
+        self.column_ids = self.ids
+        self._sample = None
+
+    @classmethod
+    def build(cls):
+        """读取全部已审核车辆并重新拟合编码参数"""
+        queryset = Car.objects.filter(status='approved').order_by('id').values_list(*FIELDS)
+        rows = list(queryset.iterator(chunk_size=LOAD_CHUNK_SIZE))
+        encoder = Encoder.fit(rows)
+        return cls(encoder, [row[0] for row in rows], encoder.transform(rows))
+
+    @classmethod
+    def from_artifact(cls, artifact):
+        metadata = artifact.metadata
+        return cls(Encoder.from_metadata(metadata), artifact['ids'], artifact['matrix'], parse_datetime(metadata['built_at']))
+
+    def publish(self, built_at):
+        """发布为新版本；built_at 之后修改的车辆由增量刷新重新编码"""
+        version = artifacts.publish(
+            ARTIFACT_NAME,
+            {'ids': self.ids, 'matrix': self.matrix},
+            metadata={**self.encoder.to_metadata(), 'built_at': built_at.isoformat()},
+        )
+        artifacts.prune(ARTIFACT_NAME)
+        return version
+
+    def with_rows(self, rows, removed_ids=()):
+        """返回应用了修改后的副本：rows 为已审核车辆的新属性，removed_ids 为已下架的车辆"""
+        vectors = copy.copy(self)
+        touched = [row[0] for row in rows] + list(removed_ids)
+        hits = [self.positions[car_id] for car_id in touched if car_id in self.positions]
+        alive = np.ones(len(self.ids), dtype=bool) if self.alive is None else self.alive.copy()
+        alive[hits] = False
+        vectors.alive = alive
+        vectors.extra = self.encoder.transform(rows) if rows else self.extra[:0]
+        vectors.extra_positions = {row[0]: len(self.ids) + index for index, row in enumerate(rows)}
+        vectors.column_ids = np.concatenate([self.ids, np.array([row[0] for row in rows], dtype=np.int64)])
+        vectors._sample = None
+        return vectors
+
+    def position(self, car_id):
+        """车辆所在的列，不在已审核车辆中时为 None"""
+        position = self.extra_positions.get(car_id)
+        if position is not None:
+            return position
+        position = self.positions.get(car_id)
+        if position is None or (self.alive is not None and not self.alive[position]):
+            return None
+        return position
+
+    def vectors_for(self, car_ids):
+        """已审核车辆的向量，按 car_ids 顺序"""
+        rows = []
+        for car_id in car_ids:
+            position = self.position(car_id)
+            rows.append(self.extra[position - len(self.ids)] if position >= len(self.ids) else self.matrix[position])
+        return np.array(rows, dtype=np.float32).reshape(len(rows), self.matrix.shape[1])
+
+    def similarities(self, query):
+        """query 各行与全部列的相似度，已失效的列为 -inf"""
+        sims = query @ self.matrix.T
+        if len(self.extra):
+            sims = np.hstack([sims, query @ self.extra.T])
+        if self.alive is not None:
+            sims[:, np.flatnonzero(~self.alive)] = -np.inf
+        return sims
+
+    def neighbors(self, query, exclude_ids, k=STORED_NEIGHBORS):
+        """对 query 的每一行返回 (ids, scores)，按相似度降序，排除 exclude_ids 中对应的车"""
+        total = len(self.ids) + len(self.extra) - (0 if self.alive is None else int(np.count_nonzero(~self.alive)))
+        count = min(k, max(total - 1, 0))
+        if count == 0:
+            return [([], []) for _ in range(len(query))]
+        results = []
+        for start in range(0, len(query), QUERY_CHUNK_SIZE):
+            sims = self.similarities(query[start:start + QUERY_CHUNK_SIZE])
+            for offset, own_id in enumerate(exclude_ids[start:start + QUERY_CHUNK_SIZE]):
+                position = self.position(own_id)
+                if position is not None:
+                    sims[offset, position] = -np.inf
+            for top, top_sims in self._top(sims, count):
+                valid = np.isfinite(top_sims)
+                results.append((self.column_ids[top[valid]].tolist(), np.round(top_sims[valid], 6).tolist()))
+        return results
+
+    def _top(self, sims, count):
+        """逐行取相似度最高的 count 列，按相似度降序
+
+        全量 argpartition 在列数很多时是主要开销。先在固定的列样本上求第 count 大的值，
+        它不会超过整行第 count 大的值，所以大于等于它的列一定包含真正的前 count 个；
+        只对这些候选列排序即可，结果与全量排序一致。
+        """
+        if sims.shape[1] <= SAMPLE_COLUMNS * 2:
+            candidates = np.argpartition(sims, -count, axis=1)[:, -count:]
+            for row, columns in zip(sims, candidates):
+                yield self._sorted(row, columns, count)
+            return
+        sample = np.partition(sims[:, self._sample_columns()], -count, axis=1)[:, -count]
+        rows, columns = np.nonzero(sims >= sample[:, None])
+        bounds = np.searchsorted(rows, np.arange(len(sims) + 1))
+        for index, row in enumerate(sims):
+            yield self._sorted(row, columns[bounds[index]:bounds[index + 1]], count)
+
+    @staticmethod
+    def _sorted(row, columns, count):
+        values = row[columns]
+        order = np.argsort(-values, kind='stable')[:count]
+        return columns[order], values[order]
+
+    def _sample_columns(self):
+        if self._sample is None:
+            rng = np.random.default_rng(0)
+            self._sample = np.sort(rng.choice(len(self.column_ids), SAMPLE_COLUMNS, replace=False))
+        return self._sample
+
+
+def _row(car_id, ids, scores):
+    min_score = scores[-1] if len(scores) >= STORED_NEIGHBORS else -1.0
+    return SimilarCars(car_id=car_id, car_ids=ids, scores=scores, min_score=min_score)
+
+
+def _save(rows):
+    for start in range(0, len(rows), WRITE_BATCH_SIZE):
+        SimilarCars.objects.bulk_create(
+            rows[start:start + WRITE_BATCH_SIZE],
+            update_conflicts=True,
+            unique_fields=['car'],
+            update_fields=['car_ids', 'scores', 'min_score', 'updated_at'],
+        )
+
+
+def _compute(vectors, car_ids):
+    neighbors = vectors.neighbors(vectors.vectors_for(car_ids), car_ids)
+    return [_row(car_id, ids, scores) for car_id, (ids, scores) in zip(car_ids, neighbors)]
+
+
+def rebuild(progress=None):
+    """全量重建：重新拟合编码参数，计算所有已审核车辆的相似列表，删除其余车辆的列表"""
+    built_at = timezone.now()
+    vectors = CarVectors.build()
+    car_ids = vectors.ids.tolist()
+    batch_size = QUERY_CHUNK_SIZE * 8
+    for start in range(0, len(car_ids), batch_size):
+        _save(_compute(vectors, car_ids[start:start + batch_size]))
+        if progress:
+            progress(min(start + batch_size, len(car_ids)), len(car_ids))
+    SimilarCars.objects.exclude(car__status='approved').delete()
+    vectors.publish(built_at)
+    return len(car_ids)
+
+
+def current_vectors(car_ids=()):
+    """全量构建的向量加上之后修改过的车辆（以及 car_ids）的最新向量；还没有全量构建过时返回 None"""
+    base = _vectors.get()
+    if base is None:
+        return None
+    changed = (
+        Car.objects.filter(Q(updated_at__gte=base.built_at) | Q(id__in=list(car_ids)))
+        .order_by('id').values_list('status', *FIELDS)
+    )
+    rows, removed = [], []
+    for status, *values in changed.iterator(chunk_size=LOAD_CHUNK_SIZE):
+        if status == 'approved':
+            rows.append(tuple(values))
+        else:
+            removed.append(values[0])
+    # 已删除的车辆不在查询结果中，按下架处理
+    removed += sorted(set(car_ids) - {row[0] for row in rows} - set(removed))
+    return base.with_rows(rows, removed)
+
+
+def refresh(car_ids):
+    """增量刷新：car_ids 为状态或属性发生变化的车辆"""
+    car_ids = sorted(set(car_ids))
+    vectors = current_vectors(car_ids)
+    if vectors is None:
+        logger.warning('还没有运行 build_similar_cars，跳过相似车辆增量刷新')
+        return
+    entered = [car_id for car_id in car_ids if vectors.position(car_id) is not None]
+    left = [car_id for car_id in car_ids if vectors.position(car_id) is None]
+    if not car_ids or not len(vectors.column_ids):
+        SimilarCars.objects.filter(car_id__in=left).delete()
+        return
+
+    # 列表未满的车 min_score 为 -1，任何车都可能进入；还没有列表的车留给全量重建
+    thresholds = dict(SimilarCars.objects.values_list('car_id', 'min_score'))
+    floor = np.array([thresholds.get(car_id, np.inf) for car_id in vectors.column_ids.tolist()])
+    # 与变化车辆的相似度不低于自身列表最低分的车，其列表可能要加入或移出这些车
+    left_rows = list(Car.objects.filter(id__in=left).values_list(*FIELDS))
+    changed = np.vstack([vectors.vectors_for(entered), vectors.encoder.transform(left_rows)])
+    affected = set()
+    for start in range(0, len(changed), QUERY_CHUNK_SIZE):
+        best = vectors.similarities(changed[start:start + QUERY_CHUNK_SIZE]).max(axis=0)
+        affected.update(vectors.column_ids[best >= floor - SCORE_TOLERANCE].tolist())
+    affected.difference_update(entered)
+
+    rows = _compute(vectors, entered + sorted(affected))
+    with transaction.atomic():
+        _save(rows)
+        SimilarCars.objects.filter(car_id__in=left).delete()
+
+
+def similar_cars(car_id, limit=SIMILAR_LIMIT):
+    """读取预计算的相似车辆（预取品牌、类型），过滤掉已不在售的车
+
+    车辆还没有相似列表时返回 None。
+    """
+    ids = SimilarCars.objects.filter(car_id=car_id).values_list('car_ids', flat=True).first()
+    if ids is None:
+        return None
+    cars = Car.objects.filter(id__in=ids, status='approved').select_related('brand', 'car_type').in_bulk()
+    return [cars[similar_id] for similar_id in ids if similar_id in cars][:limit]
+
+
+_vectors = artifacts.Handle(ARTIFACT_NAME, CarVectors.from_artifact)
+
+_refresher = debounce.Debounced(refresh, REFRESH_DELAY, '刷新相似车辆')
+
+
+def schedule_refresh(car_id):
+    """事务提交后把车辆加入待刷新集合，Web 进程中 REFRESH_DELAY 秒内的变化合并为一次刷新"""
+    _refresher.schedule([car_id])
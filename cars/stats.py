@@ -0,0 +1,63 @@
+"""平台统计计数器
+
+statistics_api 只读取 PlatformStats 单行，计数由模型信号增量更新：
+车辆进入/离开审核通过状态、用户创建/删除、交易进入/离开已完成状态、
+评价创建/修改/删除。bulk_create、QuerySet.update() 不触发信号，
+出现偏差时用 manage.py rebuild_platform_stats 从头重算。
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Sum
+from django.utils import timezone
+
+from .models import Car, PlatformStats
+
+STATS_ID = 1
+
+# 没有任何评价时的默认满意度
+DEFAULT_SATISFACTION_RATE = 95
+
+
+def increment(**deltas):
+    """原子地累加计数，deltas 为 字段名=增量"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    if not PlatformStats.objects.filter(pk=STATS_ID).update(updated_at=timezone.now(), **updates):
+        # 计数行还不存在时先全量计算，结果已包含本次变化
+        rebuild()
+
+
+def compute():
+    """从业务表重新计算全部计数"""
+    from transactions.models import Review, Transaction
+
+    ratings = Review.objects.aggregate(total=Sum('rating'), count=Count('id'))
+    return {
+        'approved_cars': Car.objects.filter(status='approved').count(),
+        'total_users': get_user_model().objects.count(),
+        'completed_transactions': Transaction.objects.filter(status='completed').count(),
+        'rating_total': ratings['total'] or 0,
+        'rating_count': ratings['count'],
+    }
+
+
+def rebuild():
+    """全量重算并写入计数行"""
+    stats, _ = PlatformStats.objects.update_or_create(pk=STATS_ID, defaults=compute())
+    return stats
+
+
+def get_stats():
+    """读取计数行（单次主键查询），不存在时全量计算"""
+    try:
+        return PlatformStats.objects.get(pk=STATS_ID)
+    except PlatformStats.DoesNotExist:
+        return rebuild()
+
+
+def satisfaction_rate(stats):
+    """平均评分（5 星制）换算为百分比"""
+    if not stats.rating_count:
+        return DEFAULT_SATISFACTION_RATE
+    return min(100, int(stats.rating_total / stats.rating_count * 20))
@@ -0,0 +1,45 @@
+"""车辆卡片模板标签
+
+    {% load car_cards %}
+    {% car_cards cars as cards %}
+    {% for car in cars %}
+        {% car_card cards car %}<a href="...">查看详情</a>{% endcar_card %}
+    {% endfor %}
+
+car_cards 一次取回整页卡片（见 cars.cards），car_card 把标签内的内容填入卡片。
+"""
+from django import template
+from django.utils.safestring import mark_safe
+
+from cars.cards import fill_slot, render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def car_cards(items, variant='card', attr=None):
+    """批量取卡片；items 不是车辆时用 attr 指定车辆属性，如收藏记录的 car"""
+    cars = [getattr(item, attr) for item in items] if attr else items
+    return render_cards(cars, variant)
+
+
+class CarCardNode(template.Node):
+    def __init__(self, cards, car, nodelist):
+        self.cards = cards
+        self.car = car
+        self.nodelist = nodelist
+
+    def render(self, context):
+        cards = self.cards.resolve(context)
+        car = self.car.resolve(context)
+        return mark_safe(fill_slot(cards.get_card(car), self.nodelist.render(context)))
+
+
+@register.tag
+def car_card(parser, token):
+    bits = token.split_contents()
+    if len(bits) != 3:
+        raise template.TemplateSyntaxError(f'{bits[0]} 需要两个参数：卡片集合和车辆')
+    nodelist = parser.parse(('endcar_card',))
+    parser.delete_first_token()
+    return CarCardNode(parser.compile_filter(bits[1]), parser.compile_filter(bits[2]), nodelist)
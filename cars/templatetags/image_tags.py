@@ -0,0 +1,37 @@
+"""响应式图片模板标签
+
+    {% load image_tags %}
+    {% responsive_image car.main_image car.main_image_variants width=480 sizes="(max-width: 768px) 100vw, 33vw" alt=car.model class="card-img-top" %}
+    <img src="{% thumbnail_url user.avatar user.avatar_variants 160 %}">
+"""
+from django import template
+from django.utils.html import format_html
+
+from cars.thumbnails import image_url, image_urls
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(field_file, variants, width=480, default=''):
+    """最接近 width 的 JPEG 缩略图地址"""
+    return image_url(field_file, variants, width, default)
+
+
+@register.simple_tag
+def responsive_image(field_file, variants, width=480, sizes='100vw', alt='', style='', **attrs):
+    """输出带 WebP/JPEG srcset 的 <picture>，没有缩略图时输出原图 <img>"""
+    urls = image_urls(field_file, variants, width)
+    if urls is None:
+        return ''
+    css_class = attrs.get('class', '')
+    if not urls['srcset']:
+        return format_html('<img src="{}" class="{}" alt="{}" style="{}" loading="lazy">',
+                           urls['url'], css_class, alt, style)
+    return format_html(
+        '<picture>'
+        '<source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" style="{}" loading="lazy">'
+        '</picture>',
+        urls['webp_srcset'], sizes, urls['url'], urls['srcset'], sizes, css_class, alt, style,
+    )
@@ -0,0 +1,146 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from users.models import CustomUser
+
+from . import feature_index
+from .catalog_index import catalog_index
+from .models import Brand, Car, CarFeature, CarType
+from .query_plans import table_scans
+
+
+def create_car(seller, brand, car_type, **fields):
+    values = {
+        'brand': brand, 'car_type': car_type, 'model': '卡罗拉', 'year': 2020, 'mileage': 30000,
+        'color': '白色', 'transmission': 'automatic', 'fuel_type': 'gasoline', 'engine_capacity': '1.80',
+        'original_price': 150000, 'current_price': 90000, 'status': 'approved', 'seller': seller,
+        'description': '一手车，保养记录齐全',
+    }
+    values.update(fields)
+    return Car.objects.create(**values)
+
+
+class QueryPlanTestCase(TestCase):
+    """请求视图并检查其执行的查询没有全表扫描"""
+
+    # 品牌、车型是整表读取的小字典表
+    allowed_scans = ('cars_brand', 'cars_cartype')
+
+    def assertNoTableScans(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertLess(response.status_code, 400, url)
+        self.assertTrue(queries.captured_queries, url)
+        failures = table_scans(queries.captured_queries, self.allowed_scans)
+        self.assertFalse(failures, '\n'.join(f'{"; ".join(scans)}\n    {sql}' for sql, scans in failures))
+        return response
+
+
+class CarQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'password')
+        cls.brand = Brand.objects.create(name='丰田')
+        cls.car_type = CarType.objects.create(name='轿车', category='sedan')
+        cls.cars = [create_car(cls.seller, cls.brand, cls.car_type, current_price=price)
+                    for price in (40000, 90000, 150000, 600000)]
+        # 脚本写入的特性可能带首尾空格，索引按去掉空格后的名称、值收录
+        features = [(cls.cars[0].id, '天窗', '全景'), (cls.cars[1].id, ' 天窗', '全景 ')]
+        CarFeature.objects.bulk_create([
+            CarFeature(car_id=car_id, feature_name=name, feature_value=value) for car_id, name, value in features
+        ])
+        feature_index.add_features(features)
+
+    def setUp(self):
+        # 分面计数按筛选条件缓存，清空后才会执行聚合查询
+        cache.clear()
+
+    def test_list_pages(self):
+        url = reverse('car_list_api')
+        response = self.assertNoTableScans(url, {'page_size': 2})
+        next_cursor = response.json()['next_cursor']
+        self.assertTrue(next_cursor)
+        response = self.assertNoTableScans(url, {'page_size': 2, 'cursor': next_cursor})
+        self.assertNoTableScans(url, {'page_size': 2, 'cursor': response.json()['prev_cursor']})
+
+    def test_list_filters(self):
+        url = reverse('car_list_api')
+        for params in (
+            {'brand': self.brand.id, 'price_range': '5-10'},
+            {'type': self.car_type.id, 'price_range': '10-20'},
+            {'price_range': '50+'},
+            {'min_year': 2018, 'max_mileage': 50000},
+            {'q': '卡罗拉'},
+        ):
+            with self.subTest(params=params):
+                self.assertNoTableScans(url, params)
+
+    def test_feature_filter(self):
+        url = reverse('car_list_api')
+        params = {'feature': '天窗:全景'}
+        self.assertEqual(len(self.assertNoTableScans(url, params).json()['cars']), 2)
+        # 特性交集较大时改为逐项 EXISTS 子查询，结果与按索引过滤一致
+        with mock.patch('cars.filters.MAX_FEATURE_IDS', 0):
+            self.assertEqual(len(self.assertNoTableScans(url, params).json()['cars']), 2)
+
+    def test_facets(self):
+        url = reverse('car_facets_api')
+        for params in (
+            {},
+            {'brand': self.brand.id, 'price_range': '5-10'},
+            {'q': '卡罗拉', 'feature': '天窗:全景'},
+        ):
+            with self.subTest(params=params):
+                self.assertNoTableScans(url, params)
+
+    def test_car_list_page(self):
+        self.assertNoTableScans(reverse('car_list'), {'brand': self.brand.id})
+
+    def test_latest_cars(self):
+        self.assertNoTableScans(reverse('latest_cars_api'))
+
+    def test_car_management(self):
+        self.client.force_login(self.seller)
+        self.assertNoTableScans(reverse('car_management'))
+
+
+class CatalogIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'password')
+        cls.brand = Brand.objects.create(name='丰田')
+        cls.car_type = CarType.objects.create(name='轿车', category='sedan')
+
+    def setUp(self):
+        catalog_index.load()
+        self.addCleanup(catalog_index.clear)
+
+    def latest_ids(self):
+        return catalog_index.snapshot().query(order_by='-created_at', limit=6).tolist()
+
+    def test_rolled_back_save_not_applied(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            car = create_car(self.seller, self.brand, self.car_type)
+        self.assertIn(car.id, self.latest_ids())
+
+        class Rollback(Exception):
+            pass
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    rolled_back = create_car(self.seller, self.brand, self.car_type)
+                    car.status = 'sold'
+                    car.save()
+                    raise Rollback
+            except Rollback:
+                pass
+        self.assertEqual(self.latest_ids(), [car.id])
+        self.assertNotIn(rolled_back.id, self.latest_ids())
@@ -0,0 +1,136 @@
+"""Car、CarImage 主图与用户头像的多尺寸缩略图
+
+上传后由模型信号把生成任务投递到进程池（cars.imaging.render_derivatives），
+请求线程不等待；生成完成后把清单写回模型的 *_variants 字段。模板标签
+（cars.templatetags.image_tags）和 API 通过 image_urls() 取合适尺寸与 srcset，
+清单缺失时退回原图。
+
+已有图片用 manage.py build_image_derivatives 补生成。
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import versioning
+from .imaging import render_derivatives
+from .models import Car
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WORKERS = 2
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """进程池单例；使用 spawn 启动，避免在多线程服务器中 fork"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ProcessPoolExecutor(
+                max_workers=getattr(settings, 'IMAGE_DERIVATIVE_WORKERS', DEFAULT_WORKERS),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _executor
+
+
+def reset_executor():
+    """丢弃已损坏的进程池（子进程异常退出后池不可再用），下次使用时重建"""
+    global _executor
+    with _executor_lock:
+        broken, _executor = _executor, None
+    if broken is not None:
+        broken.shutdown(wait=False, cancel_futures=True)
+
+
+def source_path(field_file):
+    """文件在本地磁盘上的路径，非本地存储返回 None"""
+    try:
+        return field_file.storage.path(field_file.name)
+    except NotImplementedError:
+        return None
+
+
+def needs_derivatives(field_file, variants):
+    return bool(field_file) and (variants or {}).get('source') != field_file.name
+
+
+def save_variants(model, pk, file_field, variants_field, manifest):
+    """写回清单；只有原图未再次更换时才写入"""
+    updated = model.objects.filter(pk=pk, **{file_field: manifest['source']}).update(
+        **{variants_field: manifest}
+    )
+    if updated and model._meta.app_label == 'cars':
+        # QuerySet.update() 不触发信号，手动使车辆相关缓存失效
+        versioning.bump_version(versioning.CAR)
+        car_id = pk if model is Car else model.objects.filter(pk=pk).values_list('car_id', flat=True).first()
+        if car_id is not None:
+            versioning.bump_object_version(versioning.CAR, car_id)
+    return updated
+
+
+def schedule(instance, file_field, variants_field):
+    """事务提交后把生成任务投递到进程池"""
+    field_file = getattr(instance, file_field)
+    if not needs_derivatives(field_file, getattr(instance, variants_field)):
+        return
+    path = source_path(field_file)
+    if path is None:
+        return
+    model, pk, name = type(instance), instance.pk, field_file.name
+
+    def on_done(future):
+        try:
+            save_variants(model, pk, file_field, variants_field, future.result())
+        except BrokenProcessPool:
+            logger.exception('缩略图进程池异常退出: %s', name)
+            reset_executor()
+        except Exception:
+            logger.exception('生成缩略图失败: %s', name)
+        finally:
+            # 回调运行在进程池的管理线程中，释放该线程的数据库连接
+            close_old_connections()
+
+    def submit():
+        get_executor().submit(render_derivatives, path, name).add_done_callback(on_done)
+
+    transaction.on_commit(submit)
+
+
+def _url(name):
+    return default_storage.url(name)
+
+
+def image_urls(field_file, variants, width=480):
+    """取最接近 width 的缩略图地址及 srcset
+
+    返回 {'url', 'webp', 'srcset', 'webp_srcset'}；没有清单时全部退回原图。
+    """
+    if not field_file:
+        return None
+    sizes = (variants or {}).get('sizes') if (variants or {}).get('source') == field_file.name else None
+    if not sizes:
+        url = field_file.url
+        return {'url': url, 'webp': None, 'srcset': '', 'webp_srcset': ''}
+
+    widths = sorted(int(size) for size in sizes)
+    chosen = next((size for size in widths if size >= width), widths[-1])
+    return {
+        'url': _url(sizes[str(chosen)]['jpeg']),
+        'webp': _url(sizes[str(chosen)]['webp']),
+        'srcset': ', '.join(f"{_url(sizes[str(size)]['jpeg'])} {size}w" for size in widths),
+        'webp_srcset': ', '.join(f"{_url(sizes[str(size)]['webp'])} {size}w" for size in widths),
+    }
+
+
+def image_url(field_file, variants, width=480, default=None):
+    """单个 JPEG 缩略图地址，没有图片时返回 default"""
+    urls = image_urls(field_file, variants, width)
+    return urls['url'] if urls else default
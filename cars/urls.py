@@ -5,13 +5,24 @@ urlpatterns = [
     path('', views.car_list, name='car_list'),
     path('add/', views.CarCreateView.as_view(), name='car_add'),
     path('management/', views.car_management, name='car_management'),
+    path('export/', views.car_export, name='car_export'),
     path('<int:pk>/edit/', views.CarUpdateView.as_view(), name='car_edit'),
     path('<int:car_id>/', views.car_detail, name='car_detail'),
+    path('<int:car_id>/approve/', views.car_approve, name='car_approve'),
+    path('<int:car_id>/reject/', views.car_reject, name='car_reject'),
+    path('moderation/queue/', views.moderation_queue_api, name='moderation_queue_api'),
+    path('moderation/release/', views.moderation_release_api, name='moderation_release_api'),
+    path('moderation/approve/', views.moderation_decide_api, {'decision': 'approve'}, name='moderation_approve_api'),
+    path('moderation/reject/', views.moderation_decide_api, {'decision': 'reject'}, name='moderation_reject_api'),
 
     # API接口
+    path('api/list/', views.car_list_api, name='car_list_api'),
+    path('api/facets/', views.car_facets_api, name='car_facets_api'),
+    path('api/<int:car_id>/', views.car_detail_api, name='car_detail_api'),
+    path('api/<int:car_id>/similar/', views.similar_cars_api, name='similar_cars_api'),
+    path('api/<int:car_id>/price-history/', views.car_price_history_api, name='car_price_history_api'),
     path('api/latest/', views.latest_cars_api, name='latest_cars_api'),
     path('api/brands/', views.brands_api, name='brands_api'),
     path('api/car-types/', views.car_types_api, name='car_types_api'),
     path('api/statistics/', views.statistics_api, name='statistics_api'),
-    path('api/statistics/', views.statistics_api, name='statistics_api'),
 ]
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""数据版本号
+
+每张表维护一个单调递增的版本号，存放在 Django 缓存中。缓存键带上版本号后，
+数据变化时只需递增版本号，旧缓存自然失效，无需逐个删除。版本号由
+cars.signals 在模型保存、删除时递增。
+
+多进程部署时应配置 Redis 等共享缓存（设置 REDIS_URL），否则各进程的版本号互相
+独立；依赖其他进程读取版本号的管理命令用 is_shared() 检查。
+"""
+import time
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+CAR = 'car'
+BRAND = 'brand'
+CAR_TYPE = 'car_type'
+# 价格汇总表，由 cars.price_history.rollup() 递增
+PRICE_HISTORY = 'price_history'
+# 保存的搜索，由 users.signals 递增
+SAVED_SEARCH = 'saved_search'
+# 用户推荐偏好（按用户），由 ai_recommendation.signals 递增
+USER_PREFERENCE = 'user_preference'
+# 推荐结果失效分桶（按品牌/车型/预算），由 ai_recommendation.result_cache 递增
+RECOMMENDATION_BUCKET = 'recommendation_bucket'
+# 协同过滤相似车辆（全量重建递增表版本号，增量刷新递增单车版本号），由 ai_recommendation.collaborative 递增
+COLLABORATIVE = 'collaborative'
+
+
+def is_shared():
+    """版本号所在的缓存是否由各进程共享（进程内缓存、空缓存不是）"""
+    return not isinstance(caches['default'], (LocMemCache, DummyCache))
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def _modified_key(name):
+    return f'modified:{name}'
+
+
+def _read(key):
+    """读取版本号；首次读取时以当前时间初始化，避免重启后与旧缓存撞键"""
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, None)
+        version = cache.get(key)
+    return version
+
+
+def read_versions(keys):
+    """按版本号键批量读取，返回 {键: 版本号}，一次缓存往返；缺失的逐个初始化"""
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            found[key] = _read(key)
+    return found
+
+
+def get_version(name):
+    return _read(version_key(name))
+
+
+def get_versions(*names):
+    """一次读取多个版本号，返回与 names 顺序一致的元组"""
+    keys = [version_key(name) for name in names]
+    found = read_versions(keys)
+    return tuple(found[key] for key in keys)
+
+
+def get_last_modified(name):
+    """最后修改时间（Unix 时间戳）；未记录时以当前时间初始化"""
+    key = _modified_key(name)
+    modified = cache.get(key)
+    if modified is None:
+        cache.add(key, time.time(), None)
+        modified = cache.get(key)
+    return modified
+
+
+def bump_version(name):
+    """递增版本号并记录修改时间"""
+    cache.set(_modified_key(name), time.time(), None)
+    try:
+        return cache.incr(version_key(name))
+    except ValueError:
+        get_version(name)
+        return cache.incr(version_key(name))
+
+
+def object_version_key(name, pk):
+    return f'version:{name}:{pk}'
+
+
+def get_object_version(name, pk):
+    """单个对象的版本号，用于按对象缓存（如车辆详情）"""
+    return _read(object_version_key(name, pk))
+
+
+def get_object_versions(name, pks):
+    """批量读取对象版本号，返回 {pk: 版本号}，一次缓存往返"""
+    keys = {object_version_key(name, pk): pk for pk in pks}
+    return {keys[key]: version for key, version in read_versions(list(keys)).items()}
+
+
+def bump_object_version(name, pk):
+    key = object_version_key(name, pk)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        get_object_version(name, pk)
+        return cache.incr(key)
@@ -1,51 +1,212 @@
+import json
+from datetime import timedelta
+
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import JsonResponse
+from django.http import Http404, JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_http_methods
 from django.views.generic import CreateView, UpdateView
 from django.urls import reverse_lazy
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from ai_recommendation import events, pricing
+from users.models import FavoriteCar
 from .models import Car, Brand, CarType
 from .forms import CarForm, CarImageFormSet, CarFeatureFormSet
+from .filters import apply_car_filters, feature_params
+from .pagination import (
+    DEFAULT_PAGE_SIZE, InvalidCursor, paginate_cars, paginate_search_results, parse_page_size,
+)
+from .search import search_cars
+from .facets import get_facets
+from .detail_cache import get_car_detail, stitch
+from .similarity import similar_cars
+from .catalog_index import catalog_index
+from .http_cache import versioned_json
+from . import exports, feature_index, moderation, price_history, thumbnails, versioning
+from .stats import get_stats, satisfaction_rate
+
+DEFAULT_CAR_IMAGE = '/static/images/default-car.svg'
+
+def _approved_cars(params):
+    """已审核车辆查询集，并应用列表筛选条件"""
+    cars = Car.objects.filter(status='approved').select_related('brand', 'car_type')
+    return apply_car_filters(cars, params)
+
+def _main_image_url(car, width=480):
+    """车辆主图缩略图地址，没有主图时使用默认图片"""
+    return thumbnails.image_url(car.main_image, car.main_image_variants, width, DEFAULT_CAR_IMAGE)
+
+def _paginate_listing(request, cursor, page_size=DEFAULT_PAGE_SIZE):
+    """列表分页：带关键词 q 时按相关度排序，否则按发布时间倒序"""
+    cars = _approved_cars(request.GET)
+    query = request.GET.get('q', '').strip()
+    results = search_cars(cars, query) if query else None
+    if results is not None:
+        return paginate_search_results(results, cursor, page_size)
+    return paginate_cars(cars, cursor, page_size)
+
+def _record_search(request):
+    """登录用户在第一页的关键词搜索记入行为日志"""
+    query = request.GET.get('q', '').strip()
+    if query and request.user.is_authenticated and not request.GET.get('cursor'):
+        events.record(request.user.id, 'search', query=query)
+
+def _page_url(request, cursor):
+    """保留当前筛选条件，替换分页游标"""
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f"?{params.urlencode()}"
 
 def car_list(request):
     """车辆列表页面"""
-    cars = Car.objects.filter(status='approved').select_related('brand', 'car_type')
+    try:
+        page = _paginate_listing(request, request.GET.get('cursor'))
+    except InvalidCursor:
+        # 游标损坏时回到第一页
+        page = _paginate_listing(request, None)
+    _record_search(request)
     
-    # 过滤条件
-    brand_filter = request.GET.get('brand')
-    type_filter = request.GET.get('type')
-    price_range = request.GET.get('price_range')
-    
-    if brand_filter:
-        cars = cars.filter(brand__id=brand_filter)
-    if type_filter:
-        cars = cars.filter(car_type__id=type_filter)
-    if price_range:
-        if price_range == '0-5':
-            cars = cars.filter(current_price__lte=50000)
-        elif price_range == '5-10':
-            cars = cars.filter(current_price__gte=50000, current_price__lte=100000)
-        elif price_range == '10-20':
-            cars = cars.filter(current_price__gte=100000, current_price__lte=200000)
-        elif price_range == '20-50':
-            cars = cars.filter(current_price__gte=200000, current_price__lte=500000)
-        elif price_range == '50+':
-            cars = cars.filter(current_price__gte=500000)
+    # 筛选项旁显示的数量来自缓存的分面计数
+    facets = get_facets(request.GET)
+    brand_counts = {item['id']: item['count'] for item in facets['brand']}
+    type_counts = {item['id']: item['count'] for item in facets['car_type']}
     
-    brands = Brand.objects.all()
-    car_types = CarType.objects.all()
+    brands = list(Brand.objects.all())
+    for brand in brands:
+        brand.car_count = brand_counts.get(brand.id, 0)
+    car_types = list(CarType.objects.all())
+    for car_type in car_types:
+        car_type.car_count = type_counts.get(car_type.id, 0)
+    
+    # 常用特性筛选项，已选中但不在其中的也列出来
+    selected_features = feature_params(request.GET)
+    features = [
+        {'param': f"{term['name']}:{term['value']}", 'label': f"{term['name']} {term['value']}"}
+        for term in feature_index.popular_terms()
+    ]
+    listed = {feature['param'] for feature in features}
+    features += [{'param': param, 'label': param.replace(':', ' ', 1)}
+                 for param in selected_features if param not in listed]
+    for feature in features:
+        feature['selected'] = feature['param'] in selected_features
     
     return render(request, 'cars/car_list.html', {
-        'cars': cars,
+        'cars': page,
+        'page': page,
+        'next_url': _page_url(request, page.next_cursor) if page.has_next else None,
+        'prev_url': _page_url(request, page.prev_cursor) if page.has_previous else None,
+        'price_ranges': facets['price_range'],
         'brands': brands,
-        'car_types': car_types
+        'car_types': car_types,
+        'features': features,
     })
 
+def car_facets_api(request):
+    """车辆列表分面计数API接口"""
+    return JsonResponse({'facets': get_facets(request.GET)})
+
+def car_list_api(request):
+    """车辆列表API接口（游标分页）"""
+    page_size = parse_page_size(request.GET.get('page_size'))
+    
+    try:
+        page = _paginate_listing(request, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        return JsonResponse({'error': '无效的分页游标'}, status=400)
+    _record_search(request)
+    
+    cars_data = [{
+        'id': car.id,
+        'brand': car.brand.name,
+        'car_type': car.car_type.name,
+        'model': car.model,
+        'year': car.year,
+        'mileage': car.mileage,
+        'current_price': car.current_price,
+        'main_image': _main_image_url(car),
+        'created_at': car.created_at.isoformat(),
+    } for car in page]
+    
+    return JsonResponse({
+        'cars': cars_data,
+        'next_cursor': page.next_cursor,
+        'prev_cursor': page.prev_cursor,
+    })
+
+def _is_favorite(user, car_id):
+    return user.is_authenticated and FavoriteCar.objects.filter(user=user, car_id=car_id).exists()
+
 def car_detail(request, car_id):
     """车辆详情页面"""
-    car = get_object_or_404(Car.objects.select_related('brand', 'car_type', 'seller').prefetch_related('images'), id=car_id)
-    return render(request, 'cars/car_detail.html', {'car': car})
+    # 车辆信息来自按车缓存的片段，收藏状态等访问者相关部分单独渲染后拼入
+    detail = get_car_detail(car_id)
+    car = detail['data']
+    if request.user.is_authenticated:
+        events.record(request.user.id, 'click', car_id=car_id)
+    actions_html = render_to_string('cars/car_detail_actions.html', {
+        'car': car,
+        'is_favorite': _is_favorite(request.user, car_id),
+    }, request=request)
+    return render(request, 'cars/car_detail.html', {
+        'car': car,
+        'detail_html': mark_safe(stitch(detail['html'], actions_html)),
+        'similar_cars': similar_cars(car_id) or [],
+    })
+
+def car_detail_api(request, car_id):
+    """车辆详情API接口"""
+    try:
+        detail = get_car_detail(car_id)
+    except Http404:
+        return JsonResponse({'error': '车辆不存在'}, status=404)
+    return JsonResponse({
+        'car': detail['data'],
+        'is_favorite': _is_favorite(request.user, car_id),
+    })
+
+def similar_cars_api(request, car_id):
+    """相似车辆API接口"""
+    cars = similar_cars(car_id)
+    if cars is None:
+        if not Car.objects.filter(id=car_id).exists():
+            return JsonResponse({'error': '车辆不存在'}, status=404)
+        cars = []
+    
+    cars_data = [{
+        'id': car.id,
+        'brand': car.brand.name,
+        'car_type': car.car_type.name,
+        'model': car.model,
+        'year': car.year,
+        'mileage': car.mileage,
+        'current_price': car.current_price,
+        'main_image': _main_image_url(car),
+    } for car in cars]
+    return JsonResponse({'cars': cars_data})
+
+def car_price_history_api(request, car_id):
+    """车辆价格走势API接口
+
+    参数 period 为 day 或 week，days 为回看天数。数据来自价格汇总表，
+    包含本车价格和同品牌同车型的价格区间、均价。
+    """
+    period = request.GET.get('period', 'day')
+    if period not in price_history.PERIODS:
+        return JsonResponse({'error': 'period 只能是 day 或 week'}, status=400)
+    try:
+        days = int(request.GET.get('days', price_history.DEFAULT_DAYS))
+    except ValueError:
+        return JsonResponse({'error': 'days 必须是整数'}, status=400)
+    if not 1 <= days <= price_history.MAX_DAYS:
+        return JsonResponse({'error': f'days 取值范围为 1-{price_history.MAX_DAYS}'}, status=400)
+    
+    car = Car.objects.select_related('brand', 'car_type').filter(id=car_id).first()
+    if car is None:
+        return JsonResponse({'error': '车辆不存在'}, status=404)
+    return JsonResponse(price_history.price_chart(car, period, days))
 
 @method_decorator(login_required, name='dispatch')
 class CarCreateView(CreateView):
@@ -81,14 +242,17 @@ class CarCreateView(CreateView):
                 form.instance.status = 'approved'  # 普通卖家上架的车辆也直接通过审核
             
             self.object = form.save()
+            # 在进程内用已训练的价格模型写入 AI 建议价格（未训练时跳过）
+            pricing.record(self.object)
             
             # 保存图片
             image_formset.instance = self.object
             image_formset.save()
             
-            # 保存特性
+            # 保存特性并写入特性索引
             feature_formset.instance = self.object
             feature_formset.save()
+            feature_index.update_car(self.object.pk)
             
             messages.success(self.request, '车辆上架成功！')
             return redirect(self.success_url)
@@ -123,9 +287,12 @@ class CarUpdateView(UpdateView):
         feature_formset = context['feature_formset']
         
         if image_formset.is_valid() and feature_formset.is_valid():
+            # 保存前的特性，用于增量更新特性索引
+            previous_terms = feature_index.car_terms(self.object.pk)
             self.object = form.save()
             image_formset.save()
             feature_formset.save()
+            feature_index.update_car(self.object.pk, previous_terms)
             messages.success(self.request, '车辆信息更新成功！')
             return redirect(self.success_url)
         else:
@@ -143,17 +310,18 @@ def car_management(request):
 
 
 
+@versioned_json(versioning.CAR, versioning.BRAND)
 def latest_cars_api(request):
     """获取最新车辆API接口"""
-    latest_cars = Car.objects.filter(status='approved').order_by('-created_at')[:6]
+    # 从进程内列式索引取最新 6 辆的 id，再按主键批量加载
+    latest_ids = catalog_index.snapshot().query(order_by='-created_at', limit=6).tolist()
+    cars_by_id = Car.objects.select_related('brand').in_bulk(latest_ids)
+    latest_cars = [cars_by_id[car_id] for car_id in latest_ids if car_id in cars_by_id]
     
     cars_data = []
     for car in latest_cars:
         # 检查是否有主图片，如果没有则使用默认图片
-        if car.main_image and hasattr(car.main_image, 'url'):
-            main_image_url = car.main_image.url
-        else:
-            main_image_url = '/static/images/default-car.svg'
+        main_image_url = _main_image_url(car)
         
         car_data = {
             'id': car.id,
@@ -168,12 +336,14 @@ def latest_cars_api(request):
     
     return JsonResponse({'cars': cars_data})
 
+@versioned_json(versioning.BRAND)
 def brands_api(request):
     """获取品牌数据API接口"""
     brands = Brand.objects.all()
     brands_data = [{'id': brand.id, 'name': brand.name} for brand in brands]
     return JsonResponse({'brands': brands_data})
 
+@versioned_json(versioning.CAR_TYPE)
 def car_types_api(request):
     """获取车辆类型数据API接口"""
     car_types = CarType.objects.all()
@@ -182,55 +352,129 @@ def car_types_api(request):
 
 def statistics_api(request):
     """获取统计数据API接口"""
-    from django.contrib.auth import get_user_model
-    from transactions.models import Transaction
-    
-    # 获取真实统计数据
-    total_cars = Car.objects.filter(status='approved').count()
-    User = get_user_model()
-    total_users = User.objects.count()
-    total_transactions = Transaction.objects.filter(status='completed').count()
-    
-    # 计算满意度（基于交易评价）
-    completed_transactions = Transaction.objects.filter(status='completed')
-    if completed_transactions.exists():
-        total_rating = sum(t.rating or 0 for t in completed_transactions if t.rating)
-        avg_rating = total_rating / completed_transactions.count()
-        satisfaction_rate = min(100, int(avg_rating * 20))  # 5星制转换为百分比
-    else:
-        satisfaction_rate = 95  # 默认满意度
+    stats = get_stats()
     
     return JsonResponse({
-        'total_cars': total_cars,
-        'total_users': total_users,
-        'total_transactions': total_transactions,
-        'satisfaction_rate': satisfaction_rate
+        'total_cars': stats.approved_cars,
+        'total_users': stats.total_users,
+        'total_transactions': stats.completed_transactions,
+        'satisfaction_rate': satisfaction_rate(stats)
     })
 
-def statistics_api(request):
-    """获取统计数据API接口"""
-    from django.contrib.auth import get_user_model
-    from transactions.models import Transaction
-    
-    # 获取真实统计数据
-    total_cars = Car.objects.filter(status='approved').count()
-    User = get_user_model()
-    total_users = User.objects.count()
-    total_transactions = Transaction.objects.filter(status='completed').count()
-    
-    # 计算满意度（基于交易评价）
-    completed_transactions = Transaction.objects.filter(status='completed')
-    if completed_transactions.exists():
-        total_rating = sum(t.rating or 0 for t in completed_transactions if t.rating)
-        avg_rating = total_rating / completed_transactions.count()
-        satisfaction_rate = min(100, int(avg_rating * 20))  # 5星制转换为百分比
-    else:
-        satisfaction_rate = 95  # 默认满意度
-    
+@login_required
+def car_export(request):
+    """导出车辆数据（管理员），支持 CSV / JSON Lines"""
+    cars = Car.objects.all()
+    statuses = dict(Car.STATUS_CHOICES)
+    return exports.export_response(request, cars, exports.CAR_COLUMNS, statuses, 'cars')
+
+
+def _request_data(request):
+    """JSON 请求体或表单数据"""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise moderation.ModerationError('请求体不是合法的 JSON')
+        if not isinstance(data, dict):
+            raise moderation.ModerationError('请求体应为 JSON 对象')
+        return data
+    return request.POST
+
+def _moderate_car(request, car_id, decision):
+    """单辆车审核，返回格式与车辆管理页面的脚本一致"""
+    if not moderation.can_moderate(request.user):
+        return JsonResponse({'success': False, 'message': '没有审核权限'}, status=403)
+    get_object_or_404(Car, id=car_id)
+    try:
+        reason = _request_data(request).get('rejection_reason', '')
+        decided, _ = moderation.decide(request.user, [car_id], decision, reason)
+    except moderation.ModerationError as e:
+        return JsonResponse({'success': False, 'message': str(e)}, status=400)
+    if not decided:
+        return JsonResponse({'success': False, 'message': '车辆已审核或正由其他审核员处理'}, status=409)
+    return JsonResponse({'success': True})
+
+@login_required
+@require_http_methods(["POST"])
+def car_approve(request, car_id):
+    """审核通过"""
+    return _moderate_car(request, car_id, 'approve')
+
+@login_required
+@require_http_methods(["POST"])
+def car_reject(request, car_id):
+    """审核不通过，需填写拒绝原因"""
+    return _moderate_car(request, car_id, 'reject')
+
+def _queue_item(car):
+    return {
+        'id': car.id,
+        'brand': car.brand.name,
+        'car_type': car.car_type.name,
+        'model': car.model,
+        'year': car.year,
+        'mileage': car.mileage,
+        'current_price': car.current_price,
+        'seller': car.seller.username,
+        'main_image': _main_image_url(car),
+        'created_at': car.created_at.isoformat(),
+        'lease_expires_at': car.moderation_lease.expires_at.isoformat(),
+    }
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def moderation_queue_api(request):
+    """审核队列API接口
+
+    GET 返回当前审核员持有的车辆；POST 领取一批待审核车辆（size、ttl 秒），
+    已持有的租约一并续期。
+    """
+    if not moderation.can_moderate(request.user):
+        return JsonResponse({'error': '没有审核权限'}, status=403)
+    if request.method == 'POST':
+        try:
+            data = _request_data(request)
+            size = int(data.get('size', moderation.LEASE_SIZE))
+            ttl = timedelta(seconds=int(data.get('ttl', moderation.LEASE_TTL.total_seconds())))
+            moderation.lease(request.user, size, ttl)
+        except ValueError as e:
+            # ModerationError 也是 ValueError
+            message = str(e) if isinstance(e, moderation.ModerationError) else 'size、ttl 必须是整数'
+            return JsonResponse({'error': message}, status=400)
+    cars = [_queue_item(car) for car in moderation.leased_cars(request.user)]
     return JsonResponse({
-        'total_cars': total_cars,
-        'total_users': total_users,
-        'total_transactions': total_transactions,
-        'satisfaction_rate': satisfaction_rate
+        'cars': cars,
+        'pending_total': Car.objects.filter(status='pending').count(),
     })
 
+@login_required
+@require_http_methods(["POST"])
+def moderation_release_api(request):
+    """交还租约，car_ids 缺省时交还全部"""
+    if not moderation.can_moderate(request.user):
+        return JsonResponse({'error': '没有审核权限'}, status=403)
+    try:
+        car_ids = _request_data(request).get('car_ids')
+        released = moderation.release(request.user, None if car_ids is None else [int(i) for i in car_ids])
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'car_ids 必须是车辆 id 列表'}, status=400)
+    return JsonResponse({'released': released})
+
+@login_required
+@require_http_methods(["POST"])
+def moderation_decide_api(request, decision):
+    """批量审核：car_ids 为车辆 id 列表，拒绝时需 rejection_reason"""
+    if not moderation.can_moderate(request.user):
+        return JsonResponse({'error': '没有审核权限'}, status=403)
+    try:
+        data = _request_data(request)
+        car_ids = data.get('car_ids') or []
+        if not isinstance(car_ids, (list, tuple)):
+            raise moderation.ModerationError('car_ids 必须是车辆 id 列表')
+        decided, skipped = moderation.decide(request.user, car_ids, decision, data.get('rejection_reason', ''))
+    except moderation.ModerationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except (TypeError, ValueError):
+        return JsonResponse({'error': 'car_ids 必须是车辆 id 列表'}, status=400)
+    return JsonResponse({'decided': decided, 'skipped': skipped})
@@ -63,6 +63,13 @@ class Message(models.Model):
         verbose_name = _('聊天消息')
         verbose_name_plural = _('聊天消息')
         ordering = ['created_at']
+        indexes = [
+            # 按聊天室读取消息并按时间排序
+            models.Index(fields=['room', 'created_at'], name='message_room_created_idx'),
+            # 仅覆盖未读消息的部分索引，用于未读计数和标记已读
+            models.Index(fields=['room', 'sender'], condition=models.Q(is_read=False),
+                         name='message_room_unread_idx'),
+        ]
     
     def __str__(self):
         return f"{self.sender.username}: {self.content[:50]}"
\ No newline at end of file
@@ -0,0 +1,28 @@
+from django.urls import reverse
+
+from cars.tests import QueryPlanTestCase
+from users.models import CustomUser
+
+from .models import ChatParticipant, ChatRoom, Message
+
+
+class ChatQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        cls.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'password')
+        cls.room = ChatRoom.objects.create(room_id='room-1', room_type='customer_service')
+        for user in (cls.buyer, cls.seller):
+            ChatParticipant.objects.create(room=cls.room, user=user)
+        Message.objects.create(room=cls.room, sender=cls.seller, content='您好，车还在')
+
+    def setUp(self):
+        self.client.force_login(self.buyer)
+
+    def test_rooms(self):
+        response = self.assertNoTableScans(reverse('chat:get_chat_rooms_api'))
+        self.assertEqual(response.json()['rooms'][0]['unread_count'], 1)
+
+    def test_messages(self):
+        self.assertNoTableScans(reverse('chat:get_messages_api', args=[self.room.room_id]))
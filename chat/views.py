@@ -7,9 +7,12 @@ from django.utils import timezone
 from .models import ChatRoom, ChatParticipant, Message
 from users.models import CustomUser
 from cars.models import Car
+from cars.thumbnails import image_url
 from transactions.models import Transaction
 import json
 
+DEFAULT_AVATAR = '/static/images/default-avatar.png'
+
 @login_required
 def chat_rooms(request):
     """聊天室列表页面"""
@@ -44,10 +47,10 @@ def get_chat_rooms_api(request):
             'room_name': f"与{other_user.username}的聊天" if other_user else "客服聊天",
             'other_user': {
                 'username': other_user.username if other_user else "客服",
-                'avatar': other_user.avatar.url if other_user and other_user.avatar else '/static/images/default-avatar.png'
+                'avatar': image_url(other_user.avatar, other_user.avatar_variants, 160, DEFAULT_AVATAR)
             } if other_user else {
                 'username': "客服",
-                'avatar': '/static/images/default-avatar.png'
+                'avatar': DEFAULT_AVATAR
             },
             'last_message': {
                 'content': last_message.content[:50] + '...' if last_message else '暂无消息',
@@ -78,7 +81,7 @@ def get_messages_api(request, room_id):
             'sender': {
                 'id': message.sender.id,
                 'username': message.sender.username,
-                'avatar': message.sender.avatar.url if message.sender.avatar else '/static/images/default-avatar.png'
+                'avatar': image_url(message.sender.avatar, message.sender.avatar_variants, 160, DEFAULT_AVATAR)
             },
             'message_type': message.message_type,
             'content': message.content,
@@ -0,0 +1,19 @@
+"""交易订单导出的列定义（导出逻辑见 cars.exports）"""
+
+# (列名, 查询字段)，关联字段用 __ 访问，导出时以 JOIN 一并取出
+TRANSACTION_COLUMNS = (
+    ('id', 'id'),
+    ('order_number', 'order_number'),
+    ('car_id', 'car_id'),
+    ('car', 'car__model'),
+    ('buyer', 'buyer__username'),
+    ('seller', 'seller__username'),
+    ('final_price', 'final_price'),
+    ('deposit', 'deposit'),
+    ('status', 'status'),
+    ('payment_method', 'payment_method'),
+    ('created_at', 'created_at'),
+    ('paid_at', 'paid_at'),
+    ('completed_at', 'completed_at'),
+    ('cancelled_at', 'cancelled_at'),
+)
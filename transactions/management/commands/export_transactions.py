@@ -0,0 +1,15 @@
+"""流式导出交易订单
+
+    python manage.py export_transactions --status completed --date-from 2024-01-01 -o orders.csv
+"""
+from cars.exports import ExportCommand
+from transactions.exports import TRANSACTION_COLUMNS
+from transactions.models import Transaction
+
+
+class Command(ExportCommand):
+    help = '导出交易订单为 CSV 或 JSON Lines'
+    columns = TRANSACTION_COLUMNS
+
+    def get_queryset(self):
+        return Transaction.objects.all(), dict(Transaction.STATUS_CHOICES)
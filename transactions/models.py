@@ -60,6 +60,12 @@ class Transaction(models.Model):
         verbose_name = _('交易订单')
         verbose_name_plural = _('交易订单')
         ordering = ['-created_at']
+        indexes = [
+            # 买家/卖家的订单列表按创建时间倒序
+            models.Index(fields=['buyer', '-created_at'], name='transaction_buyer_created_idx'),
+            models.Index(fields=['seller', '-created_at'], name='transaction_seller_created_idx'),
+            models.Index(fields=['status'], name='transaction_status_idx'),
+        ]
     
     def __str__(self):
         return f"订单 {self.order_number} - {self.car.brand.name} {self.car.model}"
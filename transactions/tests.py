@@ -0,0 +1,38 @@
+from unittest import mock
+
+from django.http import HttpResponse
+from django.urls import reverse
+
+from cars.models import Brand, CarType
+from cars.tests import QueryPlanTestCase, create_car
+from users.models import CustomUser
+
+from .models import Transaction
+
+
+def evaluate_context(request, template_name, context):
+    """代替模板渲染：取出上下文中的查询集（交易列表模板不在仓库中）"""
+    for value in context.values():
+        list(value)
+    return HttpResponse()
+
+
+class TransactionQueryPlanTests(QueryPlanTestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.buyer = CustomUser.objects.create_user('buyer', 'buyer@example.com', 'password')
+        cls.seller = CustomUser.objects.create_user('seller', 'seller@example.com', 'password')
+        car = create_car(cls.seller, Brand.objects.create(name='丰田'),
+                         CarType.objects.create(name='轿车', category='sedan'))
+        Transaction.objects.create(
+            order_number='T0001', car=car, buyer=cls.buyer, seller=cls.seller, final_price=90000,
+            payment_method='bank', shipping_address='北京市朝阳区',
+        )
+
+    @mock.patch('transactions.views.render', evaluate_context)
+    def test_transaction_list(self):
+        for user in (self.buyer, self.seller):
+            with self.subTest(user=user.username):
+                self.client.force_login(user)
+                self.assertNoTableScans(reverse('transaction_list'))
@@ -4,4 +4,5 @@ from . import views
 urlpatterns = [
     path('', views.transaction_list, name='transaction_list'),
     path('<int:transaction_id>/', views.transaction_detail, name='transaction_detail'),
+    path('export/', views.transaction_export, name='transaction_export'),
 ]
\ No newline at end of file
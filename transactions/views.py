@@ -1,5 +1,7 @@
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from cars import exports
+from .exports import TRANSACTION_COLUMNS
 from .models import Transaction
 
 @login_required
@@ -27,4 +29,11 @@ def transaction_detail(request, transaction_id):
     
     return render(request, 'transactions/transaction_detail.html', {
         'transaction': transaction
-    })
\ No newline at end of file
+    })
+
+@login_required
+def transaction_export(request):
+    """导出交易订单（管理员），支持 CSV / JSON Lines"""
+    transactions = Transaction.objects.all()
+    statuses = dict(Transaction.STATUS_CHOICES)
+    return exports.export_response(request, transactions, TRANSACTION_COLUMNS, statuses, 'transactions')
@@ -5,6 +5,11 @@ ASGI config for used_car_system project.
 import os
 from django.core.asgi import get_asgi_application
 
+from cars import debounce
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'used_car_system.settings')
 
-application = get_asgi_application()
\ No newline at end of file
+application = get_asgi_application()
+
+# Web 进程中信号触发的增量任务在后台线程合并执行，不阻塞请求
+debounce.run_in_background()
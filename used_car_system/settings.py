@@ -130,9 +130,22 @@ AI_RECOMMENDATION_API = os.getenv('AI_RECOMMENDATION_API', 'http://localhost:800
 ASGI_APPLICATION = 'used_car_system.asgi.application'
 
 # Cache for AI recommendations
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# 数据版本号（cars.versioning）和推荐结果缓存需要在 Web 进程和管理命令之间共享：
+# 配置了 REDIS_URL 时使用 Redis，否则使用进程内缓存，只适合单进程的开发环境
+REDIS_URL = os.getenv('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
     }
-}
\ No newline at end of file
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            # 车辆详情、卡片和单车版本号按车缓存，默认的 300 条上限会频繁淘汰
+            'OPTIONS': {'MAX_ENTRIES': 20000},
+        }
+    }
\ No newline at end of file
@@ -6,6 +6,11 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from cars import debounce
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'used_car_system.settings')
 
-application = get_wsgi_application()
\ No newline at end of file
+application = get_wsgi_application()
+
+# Web 进程中信号触发的增量任务在后台线程合并执行，不阻塞请求
+debounce.run_in_background()
@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class UsersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'users'
-    verbose_name = '用户管理'
\ No newline at end of file
+    verbose_name = '用户管理'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-18 06:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cars', '0012_moderation_lease'),
+        ('users', '0002_image_variants'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SavedSearch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, verbose_name='名称')),
+                ('price_range', models.CharField(blank=True, max_length=10, verbose_name='价格区间')),
+                ('price_min', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='最低价格')),
+                ('price_max', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True, verbose_name='最高价格')),
+                ('min_year', models.IntegerField(blank=True, null=True, verbose_name='最早年份')),
+                ('max_mileage', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True, verbose_name='最大里程')),
+                ('is_active', models.BooleanField(default=True, verbose_name='是否启用')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='创建时间')),
+                ('brand', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cars.brand', verbose_name='品牌')),
+                ('car_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='cars.cartype', verbose_name='车型')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saved_searches', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '保存的搜索',
+                'verbose_name_plural': '保存的搜索',
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SearchNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False, verbose_name='是否已读')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='通知时间')),
+                ('car', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cars.car')),
+                ('saved_search', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='users.savedsearch')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': '搜索通知',
+                'verbose_name_plural': '搜索通知',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['user', 'is_read', '-created_at'], name='users_notification_unread_idx')],
+                'unique_together': {('saved_search', 'car')},
+            },
+        ),
+    ]
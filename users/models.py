@@ -15,6 +15,7 @@ class CustomUser(AbstractUser):
     email = models.EmailField(_('邮箱地址'), unique=True)
     user_type = models.CharField(_('用户类型'), max_length=10, choices=USER_TYPE_CHOICES, default='buyer')
     avatar = models.ImageField(_('头像'), upload_to='avatars/', blank=True, null=True)
+    avatar_variants = models.JSONField(_('头像缩略图'), default=dict, blank=True, editable=False)
     is_verified = models.BooleanField(_('是否验证'), default=False)
     created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
     updated_at = models.DateTimeField(_('更新时间'), auto_now=True)
@@ -57,4 +58,50 @@ class FavoriteCar(models.Model):
         unique_together = ('user', 'car')
     
     def __str__(self):
-        return f"{self.user.username}收藏的{self.car.brand} {self.car.model}"
\ No newline at end of file
+        return f"{self.user.username}收藏的{self.car.brand} {self.car.model}"
+
+class SavedSearch(models.Model):
+    """保存的车辆搜索条件，新车审核通过时匹配并通知（由 users.saved_searches 维护索引）
+
+    条件为空表示不限；价格区间保存时换算为 price_min/price_max，便于建立索引。
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='saved_searches')
+    name = models.CharField(_('名称'), max_length=100)
+    brand = models.ForeignKey('cars.Brand', on_delete=models.CASCADE, null=True, blank=True, verbose_name=_('品牌'))
+    car_type = models.ForeignKey('cars.CarType', on_delete=models.CASCADE, null=True, blank=True,
+                                 verbose_name=_('车型'))
+    price_range = models.CharField(_('价格区间'), max_length=10, blank=True)
+    price_min = models.DecimalField(_('最低价格'), max_digits=12, decimal_places=2, null=True, blank=True)
+    price_max = models.DecimalField(_('最高价格'), max_digits=12, decimal_places=2, null=True, blank=True)
+    min_year = models.IntegerField(_('最早年份'), null=True, blank=True)
+    max_mileage = models.DecimalField(_('最大里程'), max_digits=10, decimal_places=2, null=True, blank=True)
+    is_active = models.BooleanField(_('是否启用'), default=True)
+    created_at = models.DateTimeField(_('创建时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('保存的搜索')
+        verbose_name_plural = _('保存的搜索')
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.user.username}: {self.name}"
+
+class SearchNotification(models.Model):
+    """保存的搜索匹配到的新车通知"""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='search_notifications')
+    saved_search = models.ForeignKey(SavedSearch, on_delete=models.CASCADE, related_name='notifications')
+    car = models.ForeignKey('cars.Car', on_delete=models.CASCADE)
+    is_read = models.BooleanField(_('是否已读'), default=False)
+    created_at = models.DateTimeField(_('通知时间'), auto_now_add=True)
+    
+    class Meta:
+        verbose_name = _('搜索通知')
+        verbose_name_plural = _('搜索通知')
+        ordering = ['-created_at']
+        unique_together = ('saved_search', 'car')
+        indexes = [
+            models.Index(fields=['user', 'is_read', '-created_at'], name='users_notification_unread_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.username} - 车辆 {self.car_id}"
@@ -0,0 +1,188 @@
+"""保存的搜索与新车匹配
+
+车辆进入审核通过状态时，只评估它可能满足的搜索，而不是逐条执行全部保存的查询：
+
+- 进程内索引按 (品牌, 车型) 分桶，不限品牌/车型的条件记为 0，一辆车只需查看
+  (品牌, 车型)、(品牌, 0)、(0, 车型)、(0, 0) 四个桶；
+- 桶内的价格上下限、最早年份、最大里程保存为 NumPy 数组，一次向量化比较得到
+  命中的搜索，10 万条保存的搜索下单车匹配在毫秒级；
+- 索引带保存的搜索的版本号，搜索增删改后（users.signals）下次匹配前重建。
+
+cars.signals、cars.moderation 在车辆审核通过后调用 schedule_match()，事务提交后
+把车辆加入待匹配集合（cars.debounce：Web 进程中由后台线程合并短时间内的车辆，
+管理命令中提交后直接匹配），匹配结果按批写入 SearchNotification。
+"""
+import threading
+
+import numpy as np
+
+from cars import debounce, versioning
+from cars.filters import PRICE_RANGES, PRICE_RANGE_LABELS, parse_id, parse_integer, parse_mileage
+from cars.models import Car
+
+from .models import SavedSearch, SearchNotification
+
+# 每个用户最多保存的搜索数
+MAX_SAVED_SEARCHES = 20
+NOTIFY_BATCH_SIZE = 1000
+LOAD_CHUNK_SIZE = 5000
+
+# 合并等待时间（秒）
+MATCH_DELAY = 2.0
+
+# 保存的搜索对应的列表筛选参数
+SEARCH_PARAMS = ('brand', 'type', 'price_range', 'min_year', 'max_mileage')
+
+INDEX_FIELDS = ('id', 'user_id', 'brand_id', 'car_type_id', 'price_min', 'price_max', 'min_year', 'max_mileage')
+CAR_FIELDS = ('id', 'brand_id', 'car_type_id', 'current_price', 'year', 'mileage', 'seller_id')
+
+
+def _column(values, missing):
+    return np.array([missing if value is None else float(value) for value in values], dtype=np.float64)
+
+
+class SearchIndex:
+    """已启用的保存的搜索，按 (品牌, 车型) 分桶的列式索引（构建后不再修改）"""
+
+    def __init__(self, rows, version=None):
+        self.version = version
+        self.size = len(rows)
+        groups = {}
+        for row in rows:
+            groups.setdefault((row[2] or 0, row[3] or 0), []).append(row)
+        self.buckets = {}
+        for key, group in groups.items():
+            columns = dict(zip(INDEX_FIELDS, zip(*group)))
+            self.buckets[key] = {
+                'id': np.array(columns['id'], dtype=np.int64),
+                'user_id': np.array(columns['user_id'], dtype=np.int64),
+                'price_min': _column(columns['price_min'], -np.inf),
+                'price_max': _column(columns['price_max'], np.inf),
+                'min_year': _column(columns['min_year'], -np.inf),
+                'max_mileage': _column(columns['max_mileage'], np.inf),
+            }
+
+    @classmethod
+    def load(cls, version=None):
+        queryset = SavedSearch.objects.filter(is_active=True).order_by('id').values_list(*INDEX_FIELDS)
+        return cls(list(queryset.iterator(chunk_size=LOAD_CHUNK_SIZE)), version)
+
+    def match(self, brand_id, car_type_id, price, year, mileage, seller_id=None):
+        """返回车辆满足的搜索 (搜索 id 数组, 用户 id 数组)，排除卖家自己的搜索"""
+        price, year, mileage = float(price), float(year), float(mileage)
+        ids, user_ids = [], []
+        for key in {(brand_id, car_type_id), (brand_id, 0), (0, car_type_id), (0, 0)}:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                continue
+            mask = (
+                (bucket['price_min'] <= price) & (price <= bucket['price_max'])
+                & (bucket['min_year'] <= year) & (mileage <= bucket['max_mileage'])
+            )
+            if seller_id is not None:
+                mask &= bucket['user_id'] != seller_id
+            ids.append(bucket['id'][mask])
+            user_ids.append(bucket['user_id'][mask])
+        if not ids:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        return np.concatenate(ids), np.concatenate(user_ids)
+
+
+class SearchIndexHolder:
+    """每个进程一份，版本号变化时重建"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+
+    def get(self):
+        version = versioning.get_version(versioning.SAVED_SEARCH)
+        index = self._index
+        if index is None or index.version != version:
+            with self._lock:
+                if self._index is None or self._index.version != version:
+                    self._index = SearchIndex.load(version)
+                index = self._index
+        return index
+
+
+search_index = SearchIndexHolder()
+
+
+def criteria_from_params(params):
+    """列表筛选参数 -> SavedSearch 字段，不合法的条件忽略"""
+    # 与列表筛选（cars.filters）同样解析，超出字段范围的条件等同于不限
+    criteria = {
+        'brand_id': parse_id(params.get('brand')),
+        'car_type_id': parse_id(params.get('type')),
+        'price_range': '',
+        'price_min': None,
+        'price_max': None,
+        'min_year': parse_integer(params.get('min_year')),
+        'max_mileage': parse_mileage(params.get('max_mileage')),
+    }
+    price_range = params.get('price_range')
+    if price_range in PRICE_RANGES:
+        criteria['price_range'] = price_range
+        criteria['price_min'], criteria['price_max'] = PRICE_RANGES[price_range]
+    return criteria
+
+
+def describe(search):
+    """搜索条件的中文描述，作为默认名称"""
+    parts = [
+        search.brand.name if search.brand_id else '不限品牌',
+        search.car_type.name if search.car_type_id else '不限车型',
+    ]
+    if search.price_range:
+        parts.append(PRICE_RANGE_LABELS[search.price_range])
+    if search.min_year:
+        parts.append(f'{search.min_year}年及以后')
+    if search.max_mileage is not None:
+        parts.append(f'里程不超过{search.max_mileage:g}')
+    return ' · '.join(parts)
+
+
+def list_params(search):
+    """保存的搜索对应的车辆列表查询参数"""
+    values = {
+        'brand': search.brand_id,
+        'type': search.car_type_id,
+        'price_range': search.price_range,
+        'min_year': search.min_year,
+        'max_mileage': None if search.max_mileage is None else f'{search.max_mileage:g}',
+    }
+    return {key: value for key, value in values.items() if value not in (None, '')}
+
+
+def match_cars(car_ids):
+    """为已审核车辆匹配保存的搜索并写入通知，返回通知条数"""
+    index = search_index.get()
+    if not index.size:
+        return 0
+    cars = Car.objects.filter(id__in=car_ids, status='approved').values_list(*CAR_FIELDS)
+    notifications, created = [], 0
+    for car_id, brand_id, car_type_id, price, year, mileage, seller_id in cars:
+        search_ids, user_ids = index.match(brand_id, car_type_id, price, year, mileage, seller_id)
+        notifications.extend(
+            SearchNotification(user_id=user_id, saved_search_id=search_id, car_id=car_id)
+            for search_id, user_id in zip(search_ids.tolist(), user_ids.tolist())
+        )
+        if len(notifications) >= NOTIFY_BATCH_SIZE:
+            created += _notify(notifications)
+            notifications = []
+    return created + _notify(notifications)
+
+
+def _notify(notifications):
+    # 同一搜索、同一车辆只通知一次（车辆下架后再次上架不会重复通知）
+    SearchNotification.objects.bulk_create(notifications, batch_size=NOTIFY_BATCH_SIZE, ignore_conflicts=True)
+    return len(notifications)
+
+
+_matcher = debounce.Debounced(match_cars, MATCH_DELAY, '匹配保存的搜索')
+
+
+def schedule_match(car_ids):
+    """事务提交后把车辆加入待匹配集合，Web 进程中 MATCH_DELAY 秒内的车辆合并为一批"""
+    _matcher.schedule(car_ids)
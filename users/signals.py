@@ -0,0 +1,14 @@
+"""用户相关模型信号"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from cars import versioning
+
+from .models import SavedSearch
+
+
+@receiver(post_save, sender=SavedSearch)
+@receiver(post_delete, sender=SavedSearch)
+def bump_saved_search_version(sender, **kwargs):
+    """保存的搜索变化后递增版本号，各进程的匹配索引下次使用前重建"""
+    versioning.bump_version(versioning.SAVED_SEARCH)
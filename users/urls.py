@@ -15,6 +15,12 @@ urlpatterns = [
     path('favorites/', views.favorite_cars, name='favorites'),
     path('favorites/toggle/<int:car_id>/', views.toggle_favorite, name='toggle_favorite'),
     
+    # 保存的搜索
+    path('saved-searches/', views.saved_searches, name='saved_searches'),
+    path('saved-searches/save/', views.save_search, name='save_search'),
+    path('saved-searches/<int:search_id>/delete/', views.delete_saved_search, name='delete_saved_search'),
+    path('notifications/', views.search_notifications_api, name='search_notifications_api'),
+    
     # 交易历史
     path('transactions/', views.transaction_history, name='transaction_history'),
 ]
\ No newline at end of file
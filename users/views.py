@@ -2,11 +2,15 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db.models import Count, Q
 from django.http import JsonResponse
 from django.views.generic import CreateView, UpdateView, DetailView
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.utils.decorators import method_decorator
-from .models import CustomUser, UserProfile, FavoriteCar
+from django.utils.http import urlencode
+from django.views.decorators.http import require_http_methods
+from .models import CustomUser, UserProfile, FavoriteCar, SavedSearch, SearchNotification
+from . import saved_searches as saved_search_index
 from .forms import UserRegistrationForm, UserLoginForm, UserProfileForm
 
 class UserRegistrationView(CreateView):
@@ -85,7 +89,7 @@ class UserProfileUpdateView(UpdateView):
 @login_required
 def favorite_cars(request):
     """用户收藏车辆列表"""
-    favorites = FavoriteCar.objects.filter(user=request.user).select_related('car__brand', 'car__car_type').prefetch_related('car__images')
+    favorites = FavoriteCar.objects.filter(user=request.user).select_related('car__brand', 'car__car_type')
     return render(request, 'users/favorites.html', {'favorites': favorites, 'user': request.user})
 
 @login_required
@@ -113,4 +117,83 @@ def transaction_history(request):
     return render(request, 'users/transaction_history.html', {
         'purchases': purchases,
         'sales': sales
-    })
\ No newline at end of file
+    })
+
+@login_required
+def saved_searches(request):
+    """保存的搜索及匹配到的新车通知"""
+    searches = list(
+        SavedSearch.objects.filter(user=request.user).select_related('brand', 'car_type')
+        .annotate(unread_count=Count('notifications', filter=Q(notifications__is_read=False)))
+    )
+    for search in searches:
+        search.list_url = f"{reverse('car_list')}?{urlencode(saved_search_index.list_params(search))}"
+    notifications = SearchNotification.objects.filter(user=request.user).select_related(
+        'car__brand', 'car__car_type', 'saved_search')[:50]
+    return render(request, 'users/saved_searches.html', {
+        'searches': searches,
+        'notifications': notifications,
+        'max_saved_searches': saved_search_index.MAX_SAVED_SEARCHES,
+    })
+
+@login_required
+@require_http_methods(["POST"])
+def save_search(request):
+    """把车辆列表当前的筛选条件保存为搜索"""
+    from cars.models import Brand, CarType
+    
+    if SavedSearch.objects.filter(user=request.user).count() >= saved_search_index.MAX_SAVED_SEARCHES:
+        messages.error(request, f'最多保存 {saved_search_index.MAX_SAVED_SEARCHES} 个搜索，请先删除不需要的')
+        return redirect('saved_searches')
+    
+    criteria = saved_search_index.criteria_from_params(request.POST)
+    # 不存在的品牌、车型按不限处理
+    if criteria['brand_id'] and not Brand.objects.filter(id=criteria['brand_id']).exists():
+        criteria['brand_id'] = None
+    if criteria['car_type_id'] and not CarType.objects.filter(id=criteria['car_type_id']).exists():
+        criteria['car_type_id'] = None
+    search = SavedSearch(user=request.user, **criteria)
+    search.name = request.POST.get('name', '').strip()[:100] or saved_search_index.describe(search)
+    search.save()
+    messages.success(request, '搜索已保存，有符合条件的新车上架时会通知您')
+    return redirect('saved_searches')
+
+@login_required
+@require_http_methods(["POST"])
+def delete_saved_search(request, search_id):
+    """删除保存的搜索"""
+    search = get_object_or_404(SavedSearch, id=search_id, user=request.user)
+    search.delete()
+    messages.success(request, '已删除保存的搜索')
+    return redirect('saved_searches')
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def search_notifications_api(request):
+    """新车通知API接口：GET 返回未读通知，POST 标记已读（ids 缺省为全部）"""
+    unread = SearchNotification.objects.filter(user=request.user, is_read=False)
+    if request.method == 'POST':
+        ids = request.POST.getlist('ids')
+        if ids:
+            try:
+                unread = unread.filter(id__in=[int(notification_id) for notification_id in ids])
+            except ValueError:
+                return JsonResponse({'error': 'ids 必须是整数'}, status=400)
+        return JsonResponse({'marked': unread.update(is_read=True)})
+    
+    notifications = unread.select_related('car__brand', 'saved_search')[:100]
+    return JsonResponse({
+        'count': unread.count(),
+        'notifications': [{
+            'id': notification.id,
+            'search': notification.saved_search.name,
+            'car': {
+                'id': notification.car_id,
+                'brand': notification.car.brand.name,
+                'model': notification.car.model,
+                'year': notification.car.year,
+                'current_price': notification.car.current_price,
+            },
+            'created_at': notification.created_at.isoformat(),
+        } for notification in notifications],
+    })